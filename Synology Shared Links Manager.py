@@ -1,77 +1,312 @@
-import paramiko
-import json
+import threading
+import queue
+import time
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog, Listbox, MULTIPLE
 import os
 from tkinter.font import Font
-import webbrowser
 import sys
+from concurrent.futures import ThreadPoolExecutor
 import ttkbootstrap as tb
 from ttkbootstrap.constants import *
+from ttkbootstrap.tooltip import ToolTip
 
-# Funzione per caricare la configurazione da Synology Shared Links Manager.json
-def load_config():
-    """Carica la configurazione dal file Synology Shared Links Manager.json nella stessa cartella dell'eseguibile."""
-    try:
-        # Determina il percorso della cartella dell'eseguibile o dello script
-        if getattr(sys, 'frozen', False):
-            # Se è un eseguibile .exe
-            application_path = os.path.dirname(sys.executable)
-        else:
-            # Se è uno script Python
-            application_path = os.path.dirname(os.path.abspath(__file__))
-        
-        config_path = os.path.join(application_path, 'Synology Shared Links Manager.json')
-        
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
-        
-        # Estrai i valori con valori di default se non presenti
-        hostname = config.get('hostname', "server01.com")
-        port = config.get('port', 22)
-        username = config.get('username', "admin")
-        password = config.get('password', "password")
-        base_url = config.get('BASE_URL', "https://server02.it/sharing/")
-        
-        return hostname, port, username, password, base_url
-        
-    except FileNotFoundError:
-        messagebox.showerror(
-            "Errore Configurazione", 
-            f"File Synology Shared Links Manager.json non trovato in: {application_path}\n\n"
-            "Crea un file Synology Shared Links Manager.json con i parametri di connessione."
-        )
-        sys.exit(1)
-    except json.JSONDecodeError as e:
-        messagebox.showerror(
-            "Errore Configurazione", 
-            f"Errore nel parsing del file Synology Shared Links Manager.json: {e}"
-        )
-        sys.exit(1)
-    except Exception as e:
-        messagebox.showerror(
-            "Errore Configurazione", 
-            f"Errore nel caricamento della configurazione: {e}"
-        )
-        sys.exit(1)
+from sslm.batch import PermissionBatch
+from sslm.config import ConfigError, get_application_path, load_config
+from sslm.engine import SharingEngine
+from sslm.records import RecordStore
 
-# Carica la configurazione
-hostname, port, username, password, BASE_URL = load_config()
+# Attesa dopo l'ultimo tasto prima della ricerca automatica e intervallo di polling della UI (ms)
+SEARCH_DEBOUNCE_MS = 250
+UI_POLL_MS = 30
 
-# Comando base sqlite (rimane invariato)
-sqlite_cmd = 'sqlite3 /usr/syno/etc/private/session/sharing/sharing.db "SELECT rowid, data FROM entry;"'
-command_sqlite = f"sudo -S {sqlite_cmd}"
+# Record vicini alla selezione da precaricare
+DETAILS_PREFETCH_ROWS = 5
 
-# Dizionari per la mappatura ID -> nome
-group_map = {}
-user_map = {}
+# Righe presenti nella tabella dei risultati (finestra visibile più margine)
+RESULTS_WINDOW_ROWS = 300
 
 # Variabile globale per tenere traccia della finestra di dettaglio corrente
 current_detail_window = None
 current_detail_record_id = None
 
+class Job:
+    """Operazione da eseguire in background con avanzamento e annullamento.
+
+    func riceve il job stesso: può chiamare report() per l'avanzamento e deve
+    controllare cancelled tra un passo e l'altro. on_done riceve il risultato,
+    solo se func è stata eseguita (started).
+    """
+
+    def __init__(self, title, func, on_done=None):
+        self.title = title
+        self.func = func
+        self.on_done = on_done
+        self.cancelled = threading.Event()
+        # Diventa True quando func parte; un job annullato mentre era in coda resta False
+        self.started = False
+        self._executor = None
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def report(self, done, total, message=""):
+        """Segnala l'avanzamento (chiamato dal thread di lavoro)."""
+        if self._executor is not None:
+            self._executor.on_progress(self, done, total, message)
+
+class JobExecutor:
+    """Esegue i Job uno alla volta, in ordine, su un thread dedicato.
+
+    on_progress(job, done, total, message) e on_finished(job, result, error)
+    vengono chiamati dal thread di lavoro.
+    """
+
+    def __init__(self, on_progress, on_finished):
+        self.on_progress = on_progress
+        self.on_finished = on_finished
+        self.current = None
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="sslm-jobs", daemon=True)
+        self._thread.start()
+
+    def submit(self, job):
+        job._executor = self
+        self._queue.put(job)
+        return job
+
+    def pending(self):
+        """Numero di job in attesa (escluso quello in esecuzione)."""
+        return self._queue.qsize()
+
+    def cancel_all(self):
+        """Annulla il job corrente e quelli in coda."""
+        if self.current is not None:
+            self.current.cancel()
+        for job in list(self._queue.queue):
+            if job is not None:
+                job.cancel()
+
+    def shutdown(self):
+        self.cancel_all()
+        self._queue.put(None)
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            self.current = job
+            result, error = None, None
+            if not job.cancelled.is_set():
+                job.started = True
+                try:
+                    result = job.func(job)
+                except Exception as e:
+                    error = e
+            self.current = None
+            self.on_finished(job, result, error)
+
+class ResultsView:
+    """Tabella dei risultati virtualizzata.
+
+    Il modello (RecordStore nell'ordine mostrato e selezione per rowid)
+    resta in Python; la Treeview contiene solo una finestra di righe attorno
+    a quelle visibili, che scorre insieme alla vista. Le righe vengono
+    formattate solo quando entrano nella finestra e l'ordinamento avviene sul
+    modello, con la chiave sort_key(colonna)(record) calcolata sui campi del
+    record. L'iid di ogni riga è il rowid del record, quindi item_id() e
+    rowid_of() convertono in O(1) senza chiedere nulla alla Treeview.
+    """
+
+    def __init__(self, tree, scrollbar, format_row, sort_key, window=RESULTS_WINDOW_ROWS):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.format_row = format_row
+        self.sort_key = sort_key
+        self.window = window
+        self.store = RecordStore()
+        self.selected = set()
+        self.start = self.end = 0
+        self.sort_column = None
+        self.sort_reverse = False
+        self._headings = {}
+        self._rows = {}
+        self._shift_pending = False
+        tree.configure(yscrollcommand=self._on_tree_scroll)
+        scrollbar.configure(command=self.yview)
+        tree.bind("<<TreeviewSelect>>", self._on_select, add="+")
+        for col in tree["columns"]:
+            self._headings[col] = tree.heading(col, "text")
+            tree.heading(col, command=lambda c=col: self.sort(c))
+
+    @staticmethod
+    def item_id(rowid):
+        return str(rowid)
+
+    @staticmethod
+    def rowid_of(item_id):
+        return int(item_id)
+
+    def set_store(self, store):
+        """Sostituisce il modello (riordinato se è attivo un ordinamento)."""
+        self.store = store
+        self._rows = {}
+        self.selected = set()
+        if self.sort_column:
+            self._sort_model()
+        self._render(0)
+
+    def row(self, rec):
+        """Valori della riga, formattati alla prima richiesta."""
+        values = self._rows.get(rec.rowid)
+        if values is None:
+            values = self._rows[rec.rowid] = self.format_row(rec)
+        return values
+
+    def _in_window(self, rowid):
+        return self.start <= self.store.index_of.get(rowid, -1) < self.end
+
+    def _render(self, start, first=None):
+        """Ricostruisce la finestra a partire dall'indice start; first è la prima riga da mostrare."""
+        start = max(0, min(start, len(self.store) - self.window))
+        end = min(len(self.store), start + self.window)
+        # L'elemento con il focus va ripristinato, altrimenti le frecce su/giù smettono di funzionare
+        focus = self.tree.focus()
+        focus_visible = bool(focus) and bool(self.tree.bbox(focus))
+        self.tree.delete(*self.tree.get_children())
+        self.start, self.end = start, end
+        for rec in self.store.slice(start, end):
+            self.tree.insert("", "end", iid=self.item_id(rec.rowid), values=self.row(rec))
+        
+        visible = [self.item_id(rowid) for rowid in self.selected if self._in_window(rowid)]
+        if visible:
+            self.tree.selection_set(visible)
+        if first is not None and end > start:
+            self.tree.yview_moveto((first - start) / (end - start))
+        if focus and self._in_window(self.rowid_of(focus)):
+            self.tree.focus(focus)
+            # Riporta in vista la riga con il focus solo se lo era già (non contrasta lo scorrimento)
+            if focus_visible:
+                self.tree.see(focus)
+
+    def _on_tree_scroll(self, first, last):
+        first, last = float(first), float(last)
+        count = self.end - self.start
+        total = len(self.store)
+        # La scrollbar rappresenta l'intero modello, non solo la finestra
+        if total and count:
+            self.scrollbar.set((self.start + first * count) / total, (self.start + last * count) / total)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        
+        # Vicino ai bordi della finestra: la sposta appena la UI è libera
+        near_end = last > 0.9 and self.end < total
+        near_start = first < 0.1 and self.start > 0
+        if (near_end or near_start) and not self._shift_pending:
+            self._shift_pending = True
+            self.tree.after_idle(self._recenter)
+
+    def _recenter(self):
+        self._shift_pending = False
+        count = self.end - self.start
+        if not count:
+            return
+        first = self.start + round(self.tree.yview()[0] * count)
+        self._render(first - self.window // 3, first)
+
+    def yview(self, *args):
+        """Comando della scrollbar: le posizioni sono relative all'intero modello."""
+        if args and args[0] == "moveto":
+            target = int(float(args[1]) * len(self.store))
+            visible = int(self.tree["height"])
+            if self.start <= target and target + visible <= self.end:
+                self.tree.yview_moveto((target - self.start) / (self.end - self.start))
+            else:
+                self._render(target - self.window // 3, target)
+        else:
+            self.tree.yview(*args)
+
+    def _on_select(self, event=None):
+        # Sostituisce nel modello solo la parte di selezione che cade nella finestra
+        in_window = {rowid for rowid in self.selected if self._in_window(rowid)}
+        current = {self.rowid_of(item_id) for item_id in self.tree.selection()}
+        self.selected = (self.selected - in_window) | current
+
+    def append_records(self, records):
+        """Aggiunge record in coda al modello; entrano nella tabella solo se la finestra non è piena."""
+        self.store.extend(records)
+        end = min(len(self.store), self.start + self.window)
+        for rec in self.store.slice(self.end, end):
+            self.tree.insert("", "end", iid=self.item_id(rec.rowid), values=self.row(rec))
+        self.end = max(self.end, end)
+
+    def update_records(self, records):
+        """Sostituisce nel modello i record indicati e ridisegna solo quelli nella finestra."""
+        for rec in records:
+            rowid = rec.rowid
+            if not self.store.update(rec):
+                continue
+            self._rows.pop(rowid, None)
+            if self._in_window(rowid):
+                self.tree.item(self.item_id(rowid), values=self.row(rec))
+
+    def refresh_rows(self):
+        """Riformatta le righe nella finestra (es. dopo il ricaricamento dei nomi)."""
+        self._rows = {}
+        for rec in self.store.slice(self.start, self.end):
+            self.tree.item(self.item_id(rec.rowid), values=self.row(rec))
+
+    def sort(self, column):
+        """Ordina il modello per colonna (clic ripetuto: ordine inverso), mantenendo la selezione."""
+        if self.sort_column == column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column, self.sort_reverse = column, False
+        self._sort_model()
+        for col, text in self._headings.items():
+            arrow = (" \u25bc" if self.sort_reverse else " \u25b2") if col == self.sort_column else ""
+            self.tree.heading(col, text=text + arrow)
+        
+        selected = self.selected_indexes()
+        first = selected[0] if selected else 0
+        self._render(first - self.window // 3, first)
+
+    def _sort_model(self):
+        # Nessuna riga viene formattata: la chiave usa direttamente i campi del record
+        self.store.sort(self.sort_key(self.sort_column), reverse=self.sort_reverse)
+
+    def selected_indexes(self):
+        index_of = self.store.index_of
+        return sorted(index_of[rowid] for rowid in self.selected if rowid in index_of)
+
+    def selected_records(self):
+        """Record selezionati nell'ordine della tabella, anche fuori dalla finestra."""
+        return [self.store.at(i) for i in self.selected_indexes()]
+
+    def select_rowids(self, rowids):
+        """Seleziona i record indicati e porta in vista il primo."""
+        self.selected = {rowid for rowid in rowids if rowid in self.store}
+        indexes = self.selected_indexes()
+        if not indexes:
+            return
+        first = indexes[0]
+        if self.start <= first < self.end:
+            self.tree.selection_set([self.item_id(rowid) for rowid in self.selected if self._in_window(rowid)])
+            self.tree.see(self.item_id(self.store.order[first]))
+        else:
+            self._render(first - self.window // 3, first)
+
+
 class ModernSSLM:
     def __init__(self):
+        # Carica configurazione
+        try:
+            config = load_config()
+        except ConfigError as e:
+            messagebox.showerror("Errore Configurazione", str(e))
+            sys.exit(1)
+        
         self.root = tb.Window(themename="cosmo")
         self.root.title("SSLM - Synology Shared Links Manager")
         self.root.geometry("1600x880")
@@ -79,25 +314,44 @@ class ModernSSLM:
         # Imposta l'icona
         self.set_window_icon(self.root)
         
-        # Variabili per i dati
-        self.current_records = []
+        # Accesso ai dati del NAS (connessione SSH, cache, mirror), condiviso con la riga di comando
+        self.engine = SharingEngine(config, log=self.log_message)
         
-        # Carica configurazione
-        self.hostname, self.port, self.username, self.password, self.BASE_URL = load_config()
+        # Modalità di ricerca predefinita: "mirror" (locale) o "server" (filtro sul NAS)
+        self.search_mode = config.get('search_mode', 'mirror')
+        
+        # Ricerca in background: un solo thread, le ricerche superate vengono scartate
+        self.search_executor = ThreadPoolExecutor(max_workers=1)
+        self._search_future = None
+        self._search_generation = 0
+        self._search_after_id = None
+        self._last_search_text = None
+        
+        # Coda delle chiamate che i thread di lavoro inoltrano alla UI
+        self._ui_queue = queue.Queue()
+        
+        # Operazioni SSH/SQL (modifiche, ricerche di account) eseguite in background
+        self.jobs = JobExecutor(
+            on_progress=lambda *args: self.call_in_ui(self.on_job_progress, *args),
+            on_finished=lambda *args: self.call_in_ui(self.on_job_finished, *args)
+        )
+        
+        # Caricamento dei dettagli del record selezionato in background
+        self.details_executor = ThreadPoolExecutor(max_workers=1)
+        self._details_generation = 0
         
         self.setup_ui()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after(UI_POLL_MS, self.process_ui_queue)
+        
+        # Preriscaldamento delle cache appena la finestra è visibile (disattivabile con "warmup": false)
+        if config.get('warmup', True):
+            self.root.after_idle(self.start_warmup)
         
     def set_window_icon(self, window):
         """Imposta l'icona per la finestra"""
         try:
-            if getattr(sys, 'frozen', False):
-                # Se è un eseguibile .exe
-                application_path = os.path.dirname(sys.executable)
-            else:
-                # Se è uno script Python
-                application_path = os.path.dirname(os.path.abspath(__file__))
-            
-            icon_path = os.path.join(application_path, 'sslm.ico')
+            icon_path = os.path.join(get_application_path(), 'sslm.ico')
             if os.path.exists(icon_path):
                 window.iconbitmap(icon_path)
         except Exception as e:
@@ -148,6 +402,7 @@ class ModernSSLM:
         )
         self.entry_file.pack(side=LEFT, padx=(0, 10))
         self.entry_file.bind('<Return>', lambda e: self.search_files())
+        self.entry_file.bind('<KeyRelease>', self.on_search_key)
         
         tb.Button(
             search_frame, 
@@ -165,6 +420,21 @@ class ModernSSLM:
             width=15
         ).pack(side=LEFT, padx=5)
         
+        # Ricerca filtrata direttamente sul NAS invece che sul mirror locale
+        self.server_search_var = tk.BooleanVar(value=self.search_mode == "server")
+        server_search_check = tb.Checkbutton(
+            search_frame,
+            text="Filtra sul NAS",
+            variable=self.server_search_var,
+            bootstyle="round-toggle"
+        )
+        server_search_check.pack(side=LEFT, padx=5)
+        ToolTip(
+            server_search_check,
+            text="Sul NAS maiuscole e minuscole coincidono solo per le lettere ASCII (A-Z): "
+                 "\"É\" non trova \"é\". La ricerca locale non ha questo limite."
+        )
+        
         # Frame azioni rapide
         actions_frame = tb.Frame(left_panel)
         actions_frame.pack(fill=X, pady=(0, 15))
@@ -225,15 +495,15 @@ class ModernSSLM:
             self.tree.heading(col, text=text)
             self.tree.column(col, width=w, anchor="w")
         
-        # Scrollbar
-        scrollbar = tb.Scrollbar(table_frame, orient=VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        # Scrollbar; le righe vengono caricate a pagine durante lo scorrimento
+        scrollbar = tb.Scrollbar(table_frame, orient=VERTICAL)
+        self.results = ResultsView(self.tree, scrollbar, self.format_tree_row, self.tree_sort_key)
         
         self.tree.pack(side=LEFT, fill=BOTH, expand=True)
         scrollbar.pack(side=RIGHT, fill=Y)
         
         # Bind eventi - SINGOLO CLICK per mostrare dettagli
-        self.tree.bind("<<TreeviewSelect>>", self.show_details)
+        self.tree.bind("<<TreeviewSelect>>", self.show_details, add="+")
         
         # Pannello destro - Dettagli e Azioni
         right_panel = tb.Labelframe(
@@ -331,9 +601,15 @@ class ModernSSLM:
             messagebox.showwarning("Attenzione", "Inserisci un nome gruppo.")
             return
         
-        # Cerca il gruppo
-        found_groups = self.find_groups_by_name(group_name)
-        
+        # Cerca il gruppo in background
+        self.submit_job(
+            f"Ricerca gruppo {group_name}",
+            lambda job: self.engine.find_groups_by_name(group_name),
+            on_done=lambda found: self.on_groups_found(found, group_name)
+        )
+
+    def on_groups_found(self, found_groups, group_name):
+        """Assegna il gruppo trovato o chiede di scegliere tra più risultati."""
         if not found_groups:
             messagebox.showwarning("Attenzione", f"Nessun gruppo trovato con nome: {group_name}")
             return
@@ -354,9 +630,15 @@ class ModernSSLM:
             messagebox.showwarning("Attenzione", "Inserisci un nome utente.")
             return
         
-        # Cerca l'utente
-        found_users = self.find_users_by_name(user_name)
-        
+        # Cerca l'utente in background
+        self.submit_job(
+            f"Ricerca utente {user_name}",
+            lambda job: self.engine.find_users_by_name(user_name),
+            on_done=lambda found: self.on_users_found(found, user_name)
+        )
+
+    def on_users_found(self, found_users, user_name):
+        """Assegna l'utente trovato o chiede di scegliere tra più risultati."""
         if not found_users:
             messagebox.showwarning("Attenzione", f"Nessun utente trovato con nome: {user_name}")
             return
@@ -370,90 +652,6 @@ class ModernSSLM:
             self.update_with_user(uid, name)
             self.user_entry.delete(0, tk.END)
     
-    def find_groups_by_name(self, group_name):
-        """Cerca gruppi per nome"""
-        found_groups = []
-        
-        # Prima cerca nella mappa esistente
-        for gid, name in group_map.items():
-            if group_name.lower() in name.lower():
-                found_groups.append((gid, name))
-        
-        # Se non trovato, cerca sul server
-        if not found_groups:
-            try:
-                cmd = f"sudo -S grep -r -i \"nss_name=.*{group_name}.*\" /usr/syno/etc/private/@accountcache/gid/ 2>/dev/null"
-                result = self.run_ssh_command(cmd)
-                group_files = result.splitlines()
-                
-                for line in group_files:
-                    if ':' in line:
-                        file_path, content = line.split(':', 1)
-                        gid = os.path.basename(file_path)
-                        
-                        # Leggi il contenuto completo del file
-                        cmd_content = f"sudo -S cat '{file_path}'"
-                        file_content = self.run_ssh_command(cmd_content)
-                        
-                        display_name = "Sconosciuto"
-                        for file_line in file_content.splitlines():
-                            if file_line.startswith("nss_name="):
-                                nss_value = file_line.split("=", 1)[1].strip()
-                                if "\\" in nss_value:
-                                    display_name = nss_value.split("\\", 1)[1]
-                                else:
-                                    display_name = nss_value
-                                break
-                        
-                        found_groups.append((gid, display_name))
-                        group_map[gid] = display_name
-            except Exception as e:
-                self.log_message(f"Errore nella ricerca gruppi: {e}")
-        
-        return found_groups
-    
-    def find_users_by_name(self, user_name):
-        """Cerca utenti per nome"""
-        found_users = []
-        
-        # Prima cerca nella mappa esistente
-        for uid, name in user_map.items():
-            if user_name.lower() in name.lower():
-                found_users.append((uid, name))
-        
-        # Se non trovato, cerca sul server
-        if not found_users:
-            try:
-                cmd = f"sudo -S grep -r -i \"nss_name=.*{user_name}.*\" /usr/syno/etc/private/@accountcache/uid/ 2>/dev/null"
-                result = self.run_ssh_command(cmd)
-                user_files = result.splitlines()
-                
-                for line in user_files:
-                    if ':' in line:
-                        file_path, content = line.split(':', 1)
-                        uid = os.path.basename(file_path)
-                        
-                        # Leggi il contenuto completo del file
-                        cmd_content = f"sudo -S cat '{file_path}'"
-                        file_content = self.run_ssh_command(cmd_content)
-                        
-                        display_name = "Sconosciuto"
-                        for file_line in file_content.splitlines():
-                            if file_line.startswith("nss_name="):
-                                nss_value = file_line.split("=", 1)[1].strip()
-                                if "\\" in nss_value:
-                                    display_name = nss_value.split("\\", 1)[1]
-                                else:
-                                    display_name = nss_value
-                                break
-                        
-                        found_users.append((uid, display_name))
-                        user_map[uid] = display_name
-            except Exception as e:
-                self.log_message(f"Errore nella ricerca utenti: {e}")
-        
-        return found_users
-    
     def show_group_selection(self, groups, search_name):
         """Mostra selezione quando ci sono più gruppi"""
         popup = tb.Toplevel(self.root)
@@ -542,20 +740,89 @@ class ModernSSLM:
         tb.Button(btn_frame, text="Annulla", command=popup.destroy,
                   bootstyle="secondary", width=10).pack(side=LEFT, padx=5)
 
-    def setup_default_info(self):
+    def setup_default_info(self, message="Nessun record selezionato"):
         """Configura le informazioni di default quando nessun record è selezionato"""
         for widget in self.selected_info_frame.winfo_children():
             widget.destroy()
         
         tb.Label(
             self.selected_info_frame,
-            text="Nessun record selezionato",
+            text=message,
             bootstyle="secondary",
             font=('Segoe UI', 11)
         ).pack(expand=True, pady=20)
     
-    def setup_selected_info(self, record):
-        """Mostra le informazioni del record selezionato"""
+    def load_selected_info(self, record, neighbours=()):
+        """Recupera owner, link pubblico e dati aggiornati del record (da thread di lavoro).
+
+        Se il record non è in cache viene letto con una sola query insieme ai
+        vicini non ancora caricati; altrimenti i vicini vengono precaricati
+        dopo, così il record selezionato è subito disponibile.
+        """
+        details = self.engine.row_details.get(record.rowid)
+        if details is None:
+            details = self.engine.fetch_row_details([record.rowid] + self.engine.row_details.missing(neighbours)).get(record.rowid)
+            neighbours = ()
+        
+        if details is None:
+            return record, "N/A", "N/A", neighbours
+        
+        record = details
+        self.engine.ensure_names_loaded([record])
+        
+        owner_uid = record.owner_uid
+        owner_name = "N/A"
+        full_public_url = "N/A"
+        
+        if owner_uid and owner_uid.isdigit():
+            owner_name = self.engine.find_user_name_by_uid(owner_uid)
+            if not owner_name:
+                owner_name = f"UID: {owner_uid} (Sconosciuto)"
+        elif owner_uid:
+            owner_name = f"Valore non valido: {owner_uid}"
+        
+        if record.public_url:
+            full_public_url = self.engine.public_link(record)
+        
+        return record, owner_name, full_public_url, neighbours
+
+    def show_record_details(self, record, neighbours=()):
+        """Carica in background i dettagli del record, poi li mostra nel pannello.
+
+        neighbours contiene i rowid dei record vicini da precaricare.
+        """
+        self._details_generation += 1
+        generation = self._details_generation
+        if self.engine.row_details.get(record.rowid) is None:
+            self.setup_default_info("Caricamento dettagli...")
+        self.details_executor.submit(self._details_worker, generation, record, neighbours)
+
+    def _details_worker(self, generation, record, neighbours):
+        if generation != self._details_generation:
+            return
+        try:
+            record, owner_name, full_public_url, neighbours = self.load_selected_info(record, neighbours)
+        except Exception as e:
+            self.log_message(f"Errore nel caricamento dei dettagli per rowid {record.rowid}: {e}")
+            return
+        self.call_in_ui(self._show_loaded_details, generation, record, owner_name, full_public_url)
+        
+        # Precarica i vicini mentre l'utente legge il pannello
+        missing = self.engine.row_details.missing(neighbours)
+        if missing and generation == self._details_generation:
+            try:
+                self.engine.fetch_row_details(missing)
+            except Exception as e:
+                self.log_message(f"Errore nel precaricamento dei dettagli: {e}")
+
+    def _show_loaded_details(self, generation, record, owner_name, full_public_url):
+        # Nel frattempo è stato selezionato un altro record
+        if generation != self._details_generation:
+            return
+        self.setup_selected_info(record, owner_name, full_public_url)
+
+    def setup_selected_info(self, record, owner_name, full_public_url):
+        """Mostra le informazioni del record selezionato (owner e link già caricati)"""
         for widget in self.selected_info_frame.winfo_children():
             widget.destroy()
         
@@ -567,39 +834,22 @@ class ModernSSLM:
         rowid_frame = tb.Frame(details_frame)
         rowid_frame.pack(fill=X, pady=2)
         tb.Label(rowid_frame, text="RowID:", bootstyle="dark", width=12, anchor="w").pack(side=LEFT)
-        tb.Label(rowid_frame, text=record["_rowid"], bootstyle="default").pack(side=LEFT)
+        tb.Label(rowid_frame, text=record.rowid, bootstyle="default").pack(side=LEFT)
         
         # Nome
         name_frame = tb.Frame(details_frame)
         name_frame.pack(fill=X, pady=2)
         tb.Label(name_frame, text="Nome:", bootstyle="dark", width=12, anchor="w").pack(side=LEFT)
-        tb.Label(name_frame, text=record.get("private_data", {}).get("name", "N/A"), bootstyle="default").pack(side=LEFT)
+        tb.Label(name_frame, text=record.name or "N/A", bootstyle="default").pack(side=LEFT)
         
         # Percorso
         path_frame = tb.Frame(details_frame)
         path_frame.pack(fill=X, pady=2)
         tb.Label(path_frame, text="Percorso:", bootstyle="dark", width=12, anchor="w").pack(side=LEFT)
-        path_text = record.get("private_data", {}).get("path", "N/A")
+        path_text = record.path or "N/A"
         path_label = tb.Label(path_frame, text=path_text, bootstyle="default", wraplength=400, justify="left")
         path_label.pack(side=LEFT, fill=X, expand=True)
         
-        # Recupera informazioni aggiuntive
-        owner_uid = self.get_owner_uid_by_rowid(record["_rowid"])
-        owner_name = "N/A"
-        public_url = None
-        full_public_url = "N/A"
-        
-        if owner_uid and owner_uid.isdigit():
-            owner_name = self.find_user_name_by_uid(owner_uid)
-            if not owner_name:
-                owner_name = f"UID: {owner_uid} (Sconosciuto)"
-        elif owner_uid:
-            owner_name = f"Valore non valido: {owner_uid}"
-        
-        public_url = self.get_public_url_by_rowid(record["_rowid"])
-        if public_url:
-            full_public_url = f"{BASE_URL}{public_url}"
-        
         # Owner
         owner_frame = tb.Frame(details_frame)
         owner_frame.pack(fill=X, pady=2)
@@ -633,10 +883,10 @@ class ModernSSLM:
         groups_list_frame = tb.Frame(groups_frame)
         groups_list_frame.pack(side=LEFT, fill=X, expand=True)
         
-        gid_list = record.get("protect_gids", [])
+        gid_list = record.gids
         for gid in gid_list:
             gid_str = str(gid)
-            group_name = self.find_group_name_by_gid(gid_str)
+            group_name = self.engine.cached_group_name(gid_str)
             if group_name:
                 tb.Label(groups_list_frame, text=f"• {group_name} (ID: {gid_str})", bootstyle="default").pack(anchor="w")
             else:
@@ -653,10 +903,10 @@ class ModernSSLM:
         users_list_frame = tb.Frame(users_frame)
         users_list_frame.pack(side=LEFT, fill=X, expand=True)
         
-        uid_list = record.get("protect_uids", [])
+        uid_list = record.uids
         for uid in uid_list:
             uid_str = str(uid)
-            user_name = self.find_user_name_by_uid(uid_str)
+            user_name = self.engine.cached_user_name(uid_str)
             if user_name:
                 tb.Label(users_list_frame, text=f"• {user_name} (ID: {uid_str})", bootstyle="default").pack(anchor="w")
             else:
@@ -679,6 +929,20 @@ class ModernSSLM:
         )
         status_label.pack(side=LEFT, fill=X, expand=True)
         
+        # Avanzamento e annullamento delle operazioni in background
+        self.cancel_button = tb.Button(
+            status_frame,
+            text="Annulla",
+            command=self.cancel_jobs,
+            bootstyle="danger-outline",
+            width=10,
+            state="disabled"
+        )
+        self.cancel_button.pack(side=RIGHT, padx=(10, 0))
+        
+        self.progress = tb.Progressbar(status_frame, bootstyle="info-striped", length=200, maximum=1)
+        self.progress.pack(side=RIGHT, padx=(10, 0))
+        
         # Powered by
         powered_by_label = tb.Label(
             status_frame,
@@ -698,385 +962,343 @@ class ModernSSLM:
             
             # Apri nel browser
             try:
+                # Importato solo qui: serve di rado e non deve pesare sull'avvio
+                import webbrowser
                 webbrowser.open(url)
                 self.log_message(f"Apertura nel browser: {url}")
             except Exception as e:
                 self.log_message(f"Errore nell'apertura del browser: {e}")
 
-    def run_ssh_command(self, command):
-        """Esegue un comando SSH con sudo e restituisce stdout."""
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(self.hostname, self.port, self.username, self.password)
+    def search_files(self, on_done=None):
+        """Cerca file/cartella nei path del JSON (sincronizzando prima il mirror)."""
+        file_name = self.entry_file.get().strip()
+        if not file_name:
+            messagebox.showwarning("Attenzione", "Inserisci un nome file/cartella.")
+            return
+
+        self.start_search(file_name, sync=True, on_done=on_done)
 
-        stdin, stdout, stderr = ssh.exec_command(command, get_pty=True)
-        stdin.write(self.password + "\n")
-        stdin.flush()
+    def on_search_key(self, event):
+        """Ricerca mentre si digita: ogni tasto riavvia il timer di debounce."""
+        if self._search_after_id is not None:
+            self.root.after_cancel(self._search_after_id)
+        self._search_after_id = self.root.after(SEARCH_DEBOUNCE_MS, self.live_search)
 
-        # Leggi i dati in byte invece di decodificarli immediatamente
-        result_bytes = stdout.read()
-        error_bytes = stderr.read()
+    def live_search(self):
+        """Filtra il mirror locale con il testo corrente, senza contattare il NAS."""
+        self._search_after_id = None
+        file_name = self.entry_file.get().strip()
+        # Con il filtro sul NAS la ricerca parte solo con Invio
+        if len(file_name) < 2 or file_name == self._last_search_text or self.server_search_var.get():
+            return
+        self.start_search(file_name, sync=False)
 
-        ssh.close()
-        
-        # Prova a decodificare con UTF-8, ma usa 'replace' per caratteri non validi
-        try:
-            result = result_bytes.decode('utf-8').strip()
-        except UnicodeDecodeError:
-            result = result_bytes.decode('utf-8', errors='replace').strip()
-        
-        try:
-            error = error_bytes.decode('utf-8').strip()
-        except UnicodeDecodeError:
-            error = error_bytes.decode('utf-8', errors='replace').strip()
+    def start_warmup(self):
+        """Connette e sincronizza mirror e cache account in background mentre l'utente digita.
 
-        if error and not result:
-            raise Exception(f"Errore SSH: {error}")
-        return result
+        Gira sul thread delle ricerche: una ricerca avviata nel frattempo parte
+        subito dopo, con il mirror già allineato.
+        """
+        self.search_executor.submit(self._warmup_worker, self._search_generation)
 
-    def find_group_name_by_gid(self, gid):
-        """Cerca il nome di un gruppo dato il GID nel percorso corretto."""
-        # Prima controlla se è già nella mappa
-        if gid in group_map:
-            return group_map[gid]
+    def _warmup_worker(self, generation):
+        def set_status(message):
+            # Una ricerca avviata nel frattempo ha la precedenza sulla barra di stato
+            if generation == self._search_generation:
+                self.call_in_ui(self.status_var.set, message)
         
+        started = time.perf_counter()
         try:
-            # Cerca direttamente il file del gruppo
-            group_file = f"/usr/syno/etc/private/@accountcache/gid/{gid}"
-            cmd = f"sudo -S cat '{group_file}'"
-            file_content = self.run_ssh_command(cmd)
-            
-            # Estrai il nome del gruppo dal file
-            for line in file_content.splitlines():
-                if line.startswith("nss_name="):
-                    nss_value = line.split("=", 1)[1].strip()
-                    if "\\" in nss_value:
-                        group_name = nss_value.split("\\", 1)[1]
-                    else:
-                        group_name = nss_value
-                    # Aggiungi alla mappa per uso futuro
-                    group_map[gid] = group_name
-                    return group_name
+            self.engine.warm_up(
+                on_status=set_status,
+                on_progress=lambda done, total: set_status(f"Sincronizzazione: {done}/{total} record...")
+            )
         except Exception as e:
-            self.log_message(f"Errore nella ricerca gruppo per GID {gid}: {e}")
+            self.log_message(f"Preriscaldamento non riuscito, le cache verranno caricate alla prima ricerca: {e}")
+            set_status("Pronto")
+            return
+        self.log_message(f"Connessione e cache pronte in {time.perf_counter() - started:.1f} s.")
+        set_status("Pronto")
+
+    def start_search(self, file_name, sync, on_done=None):
+        """Avvia la ricerca nel thread di lavoro; le ricerche precedenti diventano obsolete."""
+        self._search_generation += 1
+        self._last_search_text = file_name
+        self.status_var.set("Ricerca in corso...")
         
-        return None
+        if self._search_future is not None:
+            self._search_future.cancel()
+        self._search_future = self.search_executor.submit(
+            self._search_worker, self._search_generation, file_name, sync,
+            self.server_search_var.get(), on_done
+        )
 
-    def find_user_name_by_uid(self, uid):
-        """Cerca il nome di un utente dato l'UID nel percorso corretto."""
-        # Prima controlla se è già nella mappa
-        if uid in user_map:
-            return user_map[uid]
+    def _search_worker(self, generation, file_name, sync, server, on_done):
+        """Esegue la ricerca fuori dal thread della UI e consegna i risultati con call_in_ui."""
+        def stale():
+            return generation != self._search_generation
         
         try:
-            # Cerca direttamente il file dell'utente
-            user_file = f"/usr/syno/etc/private/@accountcache/uid/{uid}"
-            cmd = f"sudo -S cat '{user_file}'"
-            file_content = self.run_ssh_command(cmd)
+            if server:
+                # Filtro eseguito su sqlite3 nel NAS: la tabella si riempie man mano che arrivano le righe
+                self.call_in_ui(self.begin_search_results, generation, RecordStore())
+                
+                def on_batch(records):
+                    self.engine.ensure_names_loaded(records)
+                    if not stale():
+                        self.call_in_ui(self.append_search_results, generation, records)
+                
+                self.engine.search_entries_on_server(file_name, on_batch)
+                if not stale():
+                    self.call_in_ui(self.finish_search_results, generation, file_name, sync, on_done)
+                return
+            else:
+                # Sincronizza il mirror e filtra localmente
+                if sync:
+                    def on_progress(done, total):
+                        if not stale():
+                            self.call_in_ui(self.status_var.set, f"Sincronizzazione: {done}/{total} record...")
+                    try:
+                        self.engine.sync_entry_mirror(on_progress=on_progress)
+                    except Exception as e:
+                        self.log_message(f"Errore nella sincronizzazione del mirror, uso la copia locale: {e}")
+                if stale():
+                    return
+                mode = "substring"
+                filtered = self.engine.entry_mirror.search(file_name)
+                if not filtered and len(file_name) >= 3:
+                    # Nessuna corrispondenza esatta: propone i percorsi più simili
+                    filtered = self.engine.entry_mirror.search(file_name, mode="fuzzy", limit=200)
+                    if filtered:
+                        mode = "fuzzy"
+            if stale():
+                return
             
-            # Estrai il nome dell'utente dal file
-            for line in file_content.splitlines():
-                if line.startswith("nss_name="):
-                    nss_value = line.split("=", 1)[1].strip()
-                    if "\\" in nss_value:
-                        user_name = nss_value.split("\\", 1)[1]
-                    else:
-                        user_name = nss_value
-                    # Aggiungi alla mappa per uso futuro
-                    user_map[uid] = user_name
-                    return user_name
+            # Risolve tutti i nomi mancanti con al più due comandi remoti
+            self.engine.ensure_names_loaded(filtered)
+            if stale():
+                return
         except Exception as e:
-            self.log_message(f"Errore nella ricerca utente per UID {uid}: {e}")
+            self.log_message(f"Errore nella ricerca: {e}")
+            self.call_in_ui(self.status_var.set, "Errore nella ricerca")
+            return
+        
+        # Gli indici per rowid/GID/UID si costruiscono qui, fuori dal thread della UI
+        self.call_in_ui(self.show_search_results, generation, file_name, RecordStore(filtered), sync, on_done, mode)
+
+    def tree_sort_key(self, column):
+        """Chiave di ordinamento di una colonna della tabella, senza richieste al NAS.
+
+        Gruppi e utenti si ordinano per nome usando le mappature già caricate
+        (l'ID se il nome non è ancora noto), come appaiono nella tabella.
+        """
+        if column == "rowid":
+            return lambda rec: rec.rowid
+        if column == "name":
+            return lambda rec: rec.name.lower()
+        if column == "path":
+            return lambda rec: rec.path.lower()
+        names = self.engine.group_map if column == "protect_gids" else self.engine.user_map
+        return lambda rec: [names.get(str(i), str(i)).lower() for i in rec.principal_ids(column)]
+
+    def format_tree_row(self, rec):
+        """Restituisce i valori della riga in tabella per un record."""
+        name = rec.name
+        path = rec.path
+        
+        # Converti GIDs in nomi
+        gid_names = []
+        for gid in rec.gids:
+            gid_str = str(gid)
+            group_name = self.engine.cached_group_name(gid_str)
+            if group_name:
+                gid_names.append(f"{group_name}")
+            else:
+                gid_names.append(f"{gid_str} (Sconosciuto)")
+        gids = " || ".join(gid_names)
+        
+        # Converti UIDs in nomi
+        uid_names = []
+        for uid in rec.uids:
+            uid_str = str(uid)
+            user_name = self.engine.cached_user_name(uid_str)
+            if user_name:
+                uid_names.append(f"{user_name}")
+            else:
+                uid_names.append(f"{uid_str} (Sconosciuto)")
+        uids = " || ".join(uid_names)
         
-        return None
+        return (rec.rowid, name, path, gids, uids)
 
-    def get_owner_uid_by_rowid(self, rowid):
-        """Recupera l'owner_uid dato il rowid della condivisione."""
-        try:
-            cmd = f'sqlite3 /usr/syno/etc/private/session/sharing/sharing.db "SELECT owner_uid FROM entry WHERE rowid={rowid};"'
-            result = self.run_ssh_command(f"sudo -S {cmd}")
-            # La risposta dovrebbe essere solo un numero, puliamo eventuali newline e spazi
-            if result and result.strip():
-                # Prendi l'ultima linea non vuota (per evitare eventuali messaggi di password)
-                lines = result.strip().splitlines()
-                for line in reversed(lines):
-                    if line.strip() and not line.strip().startswith("Password"):
-                        return line.strip()
-            return None
-        except Exception as e:
-            self.log_message(f"Errore nel recupero owner_uid per rowid {rowid}: {e}")
-        return None
+    def show_search_results(self, generation, file_name, store, log, on_done=None, mode="substring"):
+        """Popola la tabella con i risultati (thread della UI)."""
+        if generation != self._search_generation:
+            return
 
-    def get_public_url_by_rowid(self, rowid):
-        """Recupera l'URL pubblico dato il rowid della condivisione."""
-        try:
-            cmd = f'sqlite3 /usr/syno/etc/private/session/sharing/sharing.db "SELECT * FROM entry WHERE rowid={rowid};"'
-            result = self.run_ssh_command(f"sudo -S {cmd}")
-            if result:
-                # Prendi l'ultima linea non vuota
-                lines = result.strip().splitlines()
-                for line in reversed(lines):
-                    if line.strip() and not line.strip().startswith("Password"):
-                        # La struttura è: rowid|public_url|... resto dei campi
-                        parts = line.split('|')
-                        if len(parts) >= 2:
-                            public_url = parts[1].strip()
-                            return public_url if public_url else None
-            return None
-        except Exception as e:
-            self.log_message(f"Errore nel recupero URL pubblico per rowid {rowid}: {e}")
-        return None
-
-    def get_sharing_entries(self):
-        """Restituisce la lista di record dal DB sharing.db."""
-        result = self.run_ssh_command(command_sqlite)
-        records = []
-        for line in result.splitlines():
-            try:
-                rowid, data = line.split("|", 1)
-                rec = json.loads(data)
-                rec["_rowid"] = int(rowid)
-                records.append(rec)
-            except Exception:
-                pass
-        return records
-
-    def search_files(self):
-        """Cerca file/cartella nei path del JSON."""
-        file_name = self.entry_file.get().strip()
-        if not file_name:
-            messagebox.showwarning("Attenzione", "Inserisci un nome file/cartella.")
+        self.begin_search_results(generation, store)
+        self.finish_search_results(generation, file_name, log, on_done, mode)
+
+    def begin_search_results(self, generation, store):
+        """Sostituisce i risultati in tabella, anche con un modello ancora vuoto (thread della UI)."""
+        if generation != self._search_generation:
             return
 
-        self.status_var.set("Ricerca in corso...")
-        self.root.update()
+        # Nella tabella entra solo la finestra iniziale, il resto durante lo scorrimento
+        self.results.set_store(store)
 
-        all_records = self.get_sharing_entries()
-        filtered = [rec for rec in all_records if file_name.lower() in rec.get("private_data", {}).get("path", "").lower()]
+        # Resetta il pannello informazioni
+        self.setup_default_info()
 
-        # Cancella risultati precedenti
-        for row in self.tree.get_children():
-            self.tree.delete(row)
+    def append_search_results(self, generation, records):
+        """Aggiunge in coda un blocco di risultati arrivati in streaming (thread della UI)."""
+        if generation != self._search_generation:
+            return
+        self.results.append_records(records)
+        self.status_var.set(f"Ricerca in corso... {len(self.results.store)} record")
 
-        # Popola la tabella
-        for rec in filtered:
-            name = rec.get("private_data", {}).get("name", "")
-            path = rec.get("private_data", {}).get("path", "")
-            
-            # Converti GIDs in nomi
-            gid_list = rec.get("protect_gids", [])
-            gid_names = []
-            for gid in gid_list:
-                gid_str = str(gid)
-                group_name = self.find_group_name_by_gid(gid_str)
-                if group_name:
-                    gid_names.append(f"{group_name}")
-                else:
-                    gid_names.append(f"{gid_str} (Sconosciuto)")
-            gids = " || ".join(gid_names)
-            
-            # Converti UIDs in nomi
-            uid_list = rec.get("protect_uids", [])
-            uid_names = []
-            for uid in uid_list:
-                uid_str = str(uid)
-                user_name = self.find_user_name_by_uid(uid_str)
-                if user_name:
-                    uid_names.append(f"{user_name}")
-                else:
-                    uid_names.append(f"{uid_str} (Sconosciuto)")
-            uids = " || ".join(uid_names)
-            
-            self.tree.insert("", "end", values=(rec["_rowid"], name, path, gids, uids))
+    def finish_search_results(self, generation, file_name, log, on_done=None, mode="substring"):
+        """Aggiorna stato e log a ricerca completata (thread della UI).
+
+        Con mode="fuzzy" i risultati sono solo percorsi simili: nessuno
+        contiene il testo cercato e i messaggi lo dicono.
+        """
+        if generation != self._search_generation:
+            return
+        
+        count = len(self.results.store)
+        if mode == "fuzzy":
+            self.status_var.set(f"Nessuna corrispondenza esatta: {count} percorsi simili")
+            if log:
+                self.log_message(f"Nessun percorso contiene '{file_name}': mostro i {count} più simili.")
+        else:
+            self.status_var.set(f"Trovati {count} record")
+            if log:
+                self.log_message(f"Trovati {count} record che contengono '{file_name}'.")
+        
+        if on_done:
+            on_done()
 
-        self.current_records = filtered
-        self.status_var.set(f"Trovati {len(filtered)} record")
-        self.log_message(f"Trovati {len(filtered)} record che contengono '{file_name}'.")
+    def call_in_ui(self, func, *args):
+        """Accoda una chiamata da eseguire nel thread della UI (sicuro da qualsiasi thread)."""
+        self._ui_queue.put((func, args))
 
-        # Resetta il pannello informazioni
-        self.setup_default_info()
+    def process_ui_queue(self):
+        """Esegue le chiamate accodate dai thread di lavoro e si ripianifica."""
+        try:
+            while True:
+                func, args = self._ui_queue.get_nowait()
+                try:
+                    func(*args)
+                except Exception as e:
+                    print(f"Errore nell'aggiornamento dell'interfaccia: {e}")
+        except queue.Empty:
+            pass
+        self.root.after(UI_POLL_MS, self.process_ui_queue)
 
     def show_details(self, event):
         """Mostra i dettagli del record selezionato nel pannello destro."""
-        selected_items = self.tree.selection()
-        if not selected_items:
+        selected = self.results.selected_indexes()
+        if not selected:
             return
         
         # Prendi il primo elemento selezionato
-        item_id = selected_items[0]
-        index = self.tree.index(item_id)
-        
-        if index < len(self.current_records):
-            record = self.current_records[index]
-            self.setup_selected_info(record)
+        index = selected[0]
+        store = self.results.store
+        record = store.at(index)
+        # Rowid dei record vicini, per una navigazione con le frecce senza attese
+        first = max(0, index - DETAILS_PREFETCH_ROWS)
+        neighbours = [rowid for rowid in store.order[first:index + DETAILS_PREFETCH_ROWS + 1] if rowid != record.rowid]
+        self.show_record_details(record, neighbours)
 
     def update_with_group(self, gr_gid, gr_name):
         """Aggiorna i record selezionati aggiungendo il gr_gid scelto."""
-        selected_items = self.tree.selection()
-        if not selected_items:
+        selected_records = self.results.selected_records()
+        if not selected_records:
             messagebox.showwarning("Attenzione", "Seleziona almeno un record dalla tabella principale.")
             return
 
-        # Salva i rowid degli elementi selezionati prima dell'aggiornamento
-        selected_rowids = []
-        for item_id in selected_items:
-            index = self.tree.index(item_id)
-            rec = self.current_records[index]
-            selected_rowids.append(rec["_rowid"])
-
-        for item_id in selected_items:
-            index = self.tree.index(item_id)
-            rec = self.current_records[index]
-
-            gids = rec.get("protect_gids", [])
-            if str(gr_gid) not in map(str, gids):
-                # Aggiungi il nuovo gid alla lista esistente
-                new_gids = gids + [int(gr_gid)]
-                
-                rowid = rec['_rowid']
-                
-                # Converti le liste in stringhe JSON
-                old_gids_str = json.dumps(gids, separators=(',', ':'))
-                new_gids_str = json.dumps(new_gids, separators=(',', ':'))
-                
-                # Costruisci il comando SQL per sostituire solo la parte dei gids
-                update_cmd = f'sqlite3 /usr/syno/etc/private/session/sharing/sharing.db "UPDATE entry SET data = replace(data, \'\\"protect_gids\\":{old_gids_str}\', \'\\"protect_gids\\":{new_gids_str}\') WHERE rowid={rowid};"'
-                cmd = f"sudo -S {update_cmd}"
-                
-                try:
-                    self.log_message(f"[DEBUG] Eseguo: {cmd}")
-                    result = self.run_ssh_command(cmd)
-                    
-                    # Verifica immediata
-                    verify_cmd = f'sqlite3 /usr/syno/etc/private/session/sharing/sharing.db "SELECT data FROM entry WHERE rowid={rowid};"'
-                    verify_result = self.run_ssh_command(f"sudo -S {verify_cmd}")
-                    
-                    if new_gids_str in verify_result:
-                        self.log_message(f"[SUCCESSO] Aggiornato rowid={rowid}, aggiunto gruppo: {gr_name} (ID: {gr_gid})")
-                    else:
-                        self.log_message(f"[ATTENZIONE] Aggiornamento potrebbe non essere avvenuto per rowid={rowid}")
-                        
-                except Exception as e:
-                    self.log_message(f"[ERRORE] rowid={rowid}: {e}")
+        # Record della ricerca che contengono già il gruppo (indice per GID)
+        granted = self.results.store.rowids_with("protect_gids", gr_gid)
+        target_rowids = []
+        for rec in selected_records:
+            rowid = rec.rowid
 
+            if rowid not in granted:
+                target_rowids.append(rowid)
             else:
-                self.log_message(f"[SKIP] rowid={rec['_rowid']} già contiene il gruppo: {gr_name} (ID: {gr_gid})")
-
-        # Refresh tabella
-        self.search_files()
-        
-        # Ripristina la selezione basata sui rowid
-        self.restore_selection_by_rowids(selected_rowids)
-        
-        # Aggiorna il pannello informazioni
-        self.refresh_selected_info()
+                self.log_message(f"[SKIP] rowid={rowid} già contiene il gruppo: {gr_name} (ID: {gr_gid})")
+
+        # Aggiungi il nuovo gid alla lista esistente, con un solo UPDATE per tutti i record
+        batch = PermissionBatch()
+        batch.add_principal(
+            "protect_gids", gr_gid, target_rowids,
+            lambda rowid: f"[SUCCESSO] Aggiornato rowid={rowid}, aggiunto gruppo: {gr_name} (ID: {gr_gid})",
+            lambda rowid: f"[ATTENZIONE] Aggiornamento potrebbe non essere avvenuto per rowid={rowid}"
+        )
+        self.run_permission_job(f"Aggiunta gruppo {gr_name}", batch)
 
     def update_with_user(self, pw_uid, nss_name):
         """Aggiorna i record selezionati aggiungendo l'pw_uid scelto."""
-        selected_items = self.tree.selection()
-        if not selected_items:
+        selected_records = self.results.selected_records()
+        if not selected_records:
             messagebox.showwarning("Attenzione", "Seleziona almeno un record dalla tabella principale.")
             return
 
-        # Salva i rowid degli elementi selezionati prima dell'aggiornamento
-        selected_rowids = []
-        for item_id in selected_items:
-            index = self.tree.index(item_id)
-            rec = self.current_records[index]
-            selected_rowids.append(rec["_rowid"])
-
-        for item_id in selected_items:
-            index = self.tree.index(item_id)
-            rec = self.current_records[index]
-
-            uids = rec.get("protect_uids", [])
-            if str(pw_uid) not in map(str, uids):
-                # Aggiungi il nuovo uid alla lista esistente
-                new_uids = uids + [int(pw_uid)]
-                
-                rowid = rec['_rowid']
-                
-                # Converti le liste in stringhe JSON
-                old_uids_str = json.dumps(uids, separators=(',', ':'))
-                new_uids_str = json.dumps(new_uids, separators=(',', ':'))
-                
-                # Costruisci il comando SQL per sostituire solo la parte degli uids
-                update_cmd = f'sqlite3 /usr/syno/etc/private/session/sharing/sharing.db "UPDATE entry SET data = replace(data, \'\\"protect_uids\\":{old_uids_str}\', \'\\"protect_uids\\":{new_uids_str}\') WHERE rowid={rowid};"'
-                cmd = f"sudo -S {update_cmd}"
-                
-                try:
-                    self.log_message(f"[DEBUG] Eseguo: {cmd}")
-                    result = self.run_ssh_command(cmd)
-                    
-                    # Verifica immediata
-                    verify_cmd = f'sqlite3 /usr/syno/etc/private/session/sharing/sharing.db "SELECT data FROM entry WHERE rowid={rowid};"'
-                    verify_result = self.run_ssh_command(f"sudo -S {verify_cmd}")
-                    
-                    if new_uids_str in verify_result:
-                        self.log_message(f"[SUCCESSO] Aggiornato rowid={rowid}, aggiunto utente: {nss_name} (ID: {pw_uid})")
-                    else:
-                        self.log_message(f"[ATTENZIONE] Aggiornamento potrebbe non essere avvenuto per rowid={rowid}")
-                        
-                except Exception as e:
-                    self.log_message(f"[ERRORE] rowid={rowid}: {e}")
+        # Record della ricerca che contengono già l'utente (indice per UID)
+        granted = self.results.store.rowids_with("protect_uids", pw_uid)
+        target_rowids = []
+        for rec in selected_records:
+            rowid = rec.rowid
 
+            if rowid not in granted:
+                target_rowids.append(rowid)
             else:
-                self.log_message(f"[SKIP] rowid={rec['_rowid']} già contiene l'utente: {nss_name} (ID: {pw_uid})")
+                self.log_message(f"[SKIP] rowid={rowid} già contiene l'utente: {nss_name} (ID: {pw_uid})")
+
+        # Aggiungi il nuovo uid alla lista esistente, con un solo UPDATE per tutti i record
+        batch = PermissionBatch()
+        batch.add_principal(
+            "protect_uids", pw_uid, target_rowids,
+            lambda rowid: f"[SUCCESSO] Aggiornato rowid={rowid}, aggiunto utente: {nss_name} (ID: {pw_uid})",
+            lambda rowid: f"[ATTENZIONE] Aggiornamento potrebbe non essere avvenuto per rowid={rowid}"
+        )
+        self.run_permission_job(f"Aggiunta utente {nss_name}", batch)
 
-        # Refresh tabella
-        self.search_files()
-        
-        # Ripristina la selezione basata sui rowid
-        self.restore_selection_by_rowids(selected_rowids)
-        
-        # Aggiorna il pannello informazioni
-        self.refresh_selected_info()
+    def run_permission_job(self, title, batch):
+        """Esegue in background un PermissionBatch, poi aggiorna in tabella solo i record modificati.
 
-    def restore_selection_by_rowids(self, rowids):
-        """Ripristina la selezione nella tabella basandosi sui rowid"""
-        if not rowids:
-            return
-        
-        # Cerca gli item nella tabella che corrispondono ai rowid
-        for item in self.tree.get_children():
-            item_rowid = self.tree.item(item)['values'][0]  # Il rowid è nella prima colonna
-            if item_rowid in rowids:
-                self.tree.selection_add(item)
-        
-        # Se c'è almeno un elemento selezionato, mostra i dettagli del primo
-        selected_items = self.tree.selection()
-        if selected_items:
-            self.show_details(None)
+        Le modifiche vengono applicate a lotti di batch_size record, una
+        transazione per lotto, così un job lungo resta annullabile.
+        """
+        def work(job):
+            return self.engine.apply_batch(batch, title, is_cancelled=job.cancelled.is_set, on_progress=job.report)
+
+        self.submit_job(title, work, on_done=self.refresh_records)
+
+    def refresh_records(self, records):
+        """Aggiorna in tabella e nel pannello i record modificati, senza rifare la ricerca."""
+        self.results.update_records(records)
+        self.refresh_selected_info()
 
     def refresh_selected_info(self):
         """Aggiorna il pannello informazioni selezionate"""
-        selected_items = self.tree.selection()
-        if selected_items:
-            # Prendi il primo elemento selezionato
-            item_id = selected_items[0]
-            index = self.tree.index(item_id)
-            
-            if index < len(self.current_records):
-                record = self.current_records[index]
-                self.setup_selected_info(record)
+        self.show_details(None)
 
     def remove_selected_groups(self):
         """Rimuove i gruppi selezionati dai record selezionati."""
-        selected_items = self.tree.selection()
-        if not selected_items:
+        selected_records = self.results.selected_records()
+        if not selected_records:
             messagebox.showwarning("Attenzione", "Seleziona almeno un record dalla tabella principale.")
             return
 
         # Ottieni tutti i gruppi presenti nei record selezionati
         all_groups = {}
-        for item_id in selected_items:
-            index = self.tree.index(item_id)
-            rec = self.current_records[index]
-            gids = rec.get("protect_gids", [])
+        for rec in selected_records:
+            gids = rec.gids
             
             for gid in gids:
                 gid_str = str(gid)
-                group_name = self.find_group_name_by_gid(gid_str)
+                group_name = self.engine.cached_group_name(gid_str)
                 if not group_name:
                     group_name = f"{gid_str} (Sconosciuto)"
                 
@@ -1132,85 +1354,47 @@ class ModernSSLM:
 
     def perform_group_removal(self, groups_to_remove):
         """Esegue la rimozione dei gruppi selezionati."""
-        selected_items = self.tree.selection()
+        selected_records = self.results.selected_records()
         
-        # Salva i rowid degli elementi selezionati prima dell'aggiornamento
-        selected_rowids = []
-        for item_id in selected_items:
-            index = self.tree.index(item_id)
-            rec = self.current_records[index]
-            selected_rowids.append(rec["_rowid"])
-        
-        for item_id in selected_items:
-            index = self.tree.index(item_id)
-            rec = self.current_records[index]
+        removed_by_rowid = {}
+        for rec in selected_records:
+            rowid = rec.rowid
 
-            gids = rec.get("protect_gids", [])
+            gids = rec.gids
             if not gids:
-                self.log_message(f"[SKIP] rowid={rec['_rowid']} non ha gruppi da rimuovere")
+                self.log_message(f"[SKIP] rowid={rowid} non ha gruppi da rimuovere")
                 continue
 
-            # Filtra i gruppi da rimuovere
-            new_gids = [gid for gid in gids if str(gid) not in groups_to_remove]
-            
-            # Se la lista non è cambiata, salta
-            if new_gids == gids:
-                self.log_message(f"[SKIP] rowid={rec['_rowid']} non contiene i gruppi specificati")
+            # I gruppi da rimuovere presenti nel record
+            removed_groups = [self.engine.group_map.get(str(gid), str(gid)) for gid in gids if str(gid) in groups_to_remove]
+            if not removed_groups:
+                self.log_message(f"[SKIP] rowid={rowid} non contiene i gruppi specificati")
                 continue
+            removed_by_rowid[rowid] = removed_groups
 
-            rowid = rec['_rowid']
-            
-            # Converti le liste in stringhe JSON
-            old_gids_str = json.dumps(gids, separators=(',', ':'))
-            new_gids_str = json.dumps(new_gids, separators=(',', ':'))
-            
-            # Costruisci il comando SQL per sostituire solo la parte dei gids
-            update_cmd = f'sqlite3 /usr/syno/etc/private/session/sharing/sharing.db "UPDATE entry SET data = replace(data, \'\\"protect_gids\\":{old_gids_str}\', \'\\"protect_gids\\":{new_gids_str}\') WHERE rowid={rowid};"'
-            cmd = f"sudo -S {update_cmd}"
-            
-            try:
-                self.log_message(f"[DEBUG] Eseguo: {cmd}")
-                result = self.run_ssh_command(cmd)
-                
-                # Verifica immediata
-                verify_cmd = f'sqlite3 /usr/syno/etc/private/session/sharing/sharing.db "SELECT data FROM entry WHERE rowid={rowid};"'
-                verify_result = self.run_ssh_command(f"sudo -S {verify_cmd}")
-                
-                if new_gids_str in verify_result:
-                    removed_groups = [group_map.get(str(gid), str(gid)) for gid in gids if str(gid) in groups_to_remove]
-                    self.log_message(f"[SUCCESSO] Rimossi gruppi {removed_groups} da rowid={rowid}")
-                else:
-                    self.log_message(f"[ATTENZIONE] Rimozione gruppi potrebbe non essere avvenuta per rowid={rowid}")
-                    
-            except Exception as e:
-                self.log_message(f"[ERRORE] rowid={rowid}: {e}")
-
-        # Refresh tabella
-        self.search_files()
-        
-        # Ripristina la selezione basata sui rowid
-        self.restore_selection_by_rowids(selected_rowids)
-        
-        # Aggiorna il pannello informazioni
-        self.refresh_selected_info()
+        batch = PermissionBatch()
+        batch.remove_principals(
+            "protect_gids", groups_to_remove, list(removed_by_rowid),
+            lambda rowid: f"[SUCCESSO] Rimossi gruppi {removed_by_rowid[rowid]} da rowid={rowid}",
+            lambda rowid: f"[ATTENZIONE] Rimozione gruppi potrebbe non essere avvenuta per rowid={rowid}"
+        )
+        self.run_permission_job("Rimozione gruppi", batch)
 
     def remove_selected_users(self):
         """Rimuove gli utenti selezionati dai record selezionati."""
-        selected_items = self.tree.selection()
-        if not selected_items:
+        selected_records = self.results.selected_records()
+        if not selected_records:
             messagebox.showwarning("Attenzione", "Seleziona almeno un record dalla tabella principale.")
             return
 
         # Ottieni tutti gli utenti presenti nei record selezionati
         all_users = {}
-        for item_id in selected_items:
-            index = self.tree.index(item_id)
-            rec = self.current_records[index]
-            uids = rec.get("protect_uids", [])
+        for rec in selected_records:
+            uids = rec.uids
             
             for uid in uids:
                 uid_str = str(uid)
-                user_name = self.find_user_name_by_uid(uid_str)
+                user_name = self.engine.cached_user_name(uid_str)
                 if not user_name:
                     user_name = f"{uid_str} (Sconosciuto)"
                 
@@ -1266,81 +1450,43 @@ class ModernSSLM:
 
     def perform_user_removal(self, users_to_remove):
         """Esegue la rimozione degli utenti selezionati."""
-        selected_items = self.tree.selection()
+        selected_records = self.results.selected_records()
         
-        # Salva i rowid degli elementi selezionati prima dell'aggiornamento
-        selected_rowids = []
-        for item_id in selected_items:
-            index = self.tree.index(item_id)
-            rec = self.current_records[index]
-            selected_rowids.append(rec["_rowid"])
-        
-        for item_id in selected_items:
-            index = self.tree.index(item_id)
-            rec = self.current_records[index]
+        removed_by_rowid = {}
+        for rec in selected_records:
+            rowid = rec.rowid
 
-            uids = rec.get("protect_uids", [])
+            uids = rec.uids
             if not uids:
-                self.log_message(f"[SKIP] rowid={rec['_rowid']} non ha utenti da rimuovere")
+                self.log_message(f"[SKIP] rowid={rowid} non ha utenti da rimuovere")
                 continue
 
-            # Filtra gli utenti da rimuovere
-            new_uids = [uid for uid in uids if str(uid) not in users_to_remove]
-            
-            # Se la lista non è cambiata, salta
-            if new_uids == uids:
-                self.log_message(f"[SKIP] rowid={rec['_rowid']} non contiene gli utenti specificati")
+            # Gli utenti da rimuovere presenti nel record
+            removed_users = [self.engine.user_map.get(str(uid), str(uid)) for uid in uids if str(uid) in users_to_remove]
+            if not removed_users:
+                self.log_message(f"[SKIP] rowid={rowid} non contiene gli utenti specificati")
                 continue
+            removed_by_rowid[rowid] = removed_users
 
-            rowid = rec['_rowid']
-            
-            # Converti le liste in stringhe JSON
-            old_uids_str = json.dumps(uids, separators=(',', ':'))
-            new_uids_str = json.dumps(new_uids, separators=(',', ':'))
-            
-            # Costruisci il comando SQL per sostituire solo la parte degli uids
-            update_cmd = f'sqlite3 /usr/syno/etc/private/session/sharing/sharing.db "UPDATE entry SET data = replace(data, \'\\"protect_uids\\":{old_uids_str}\', \'\\"protect_uids\\":{new_uids_str}\') WHERE rowid={rowid};"'
-            cmd = f"sudo -S {update_cmd}"
-            
-            try:
-                self.log_message(f"[DEBUG] Eseguo: {cmd}")
-                result = self.run_ssh_command(cmd)
-                
-                # Verifica immediata
-                verify_cmd = f'sqlite3 /usr/syno/etc/private/session/sharing/sharing.db "SELECT data FROM entry WHERE rowid={rowid};"'
-                verify_result = self.run_ssh_command(f"sudo -S {verify_cmd}")
-                
-                if new_uids_str in verify_result:
-                    removed_users = [user_map.get(str(uid), str(uid)) for uid in uids if str(uid) in users_to_remove]
-                    self.log_message(f"[SUCCESSO] Rimossi utenti {removed_users} da rowid={rowid}")
-                else:
-                    self.log_message(f"[ATTENZIONE] Rimozione utenti potrebbe non essere avvenuta per rowid={rowid}")
-                    
-            except Exception as e:
-                self.log_message(f"[ERRORE] rowid={rowid}: {e}")
-
-        # Refresh tabella
-        self.search_files()
-        
-        # Ripristina la selezione basata sui rowid
-        self.restore_selection_by_rowids(selected_rowids)
-        
-        # Aggiorna il pannello informazioni
-        self.refresh_selected_info()
+        batch = PermissionBatch()
+        batch.remove_principals(
+            "protect_uids", users_to_remove, list(removed_by_rowid),
+            lambda rowid: f"[SUCCESSO] Rimossi utenti {removed_by_rowid[rowid]} da rowid={rowid}",
+            lambda rowid: f"[ATTENZIONE] Rimozione utenti potrebbe non essere avvenuta per rowid={rowid}"
+        )
+        self.run_permission_job("Rimozione utenti", batch)
 
     def remove_all_groups(self):
         """Rimuove tutti i gruppi dai record selezionati."""
-        selected_items = self.tree.selection()
-        if not selected_items:
+        selected_records = self.results.selected_records()
+        if not selected_records:
             messagebox.showwarning("Attenzione", "Seleziona almeno un record dalla tabella principale.")
             return
 
         # Controlla se c'è almeno un record che ha gruppi
         has_groups = False
-        for item_id in selected_items:
-            index = self.tree.index(item_id)
-            rec = self.current_records[index]
-            gids = rec.get("protect_gids", [])
+        for rec in selected_records:
+            gids = rec.gids
             if gids:
                 has_groups = True
                 break
@@ -1349,15 +1495,8 @@ class ModernSSLM:
             messagebox.showinfo("Info", "Nessun gruppo presente nei record selezionati da rimuovere.")
             return
 
-        # Salva i rowid degli elementi selezionati prima dell'aggiornamento
-        selected_rowids = []
-        for item_id in selected_items:
-            index = self.tree.index(item_id)
-            rec = self.current_records[index]
-            selected_rowids.append(rec["_rowid"])
-
         # Aggiunta finestra di conferma
-        num_selected = len(selected_items)
+        num_selected = len(selected_records)
         confirm = messagebox.askyesno(
             "Conferma Rimozione", 
             f"Sei sicuro di voler rimuovere TUTTI i gruppi dai {num_selected} record selezionati?\n\n"
@@ -1369,65 +1508,35 @@ class ModernSSLM:
             self.log_message("Operazione di rimozione di tutti i gruppi annullata dall'utente")
             return
 
-        for item_id in selected_items:
-            index = self.tree.index(item_id)
-            rec = self.current_records[index]
+        target_rowids = []
+        for rec in selected_records:
+            rowid = rec.rowid
 
-            gids = rec.get("protect_gids", [])
-            if not gids:
-                self.log_message(f"[SKIP] rowid={rec['_rowid']} non ha gruppi da rimuovere")
+            if not rec.gids:
+                self.log_message(f"[SKIP] rowid={rowid} non ha gruppi da rimuovere")
                 continue
-
-            rowid = rec['_rowid']
-            
-            # Converti la lista corrente in stringa JSON
-            old_gids_str = json.dumps(gids, separators=(',', ':'))
-            
-            # Nuova lista vuota
-            new_gids_str = "[]"
-            
-            # Comando SQL per sostituire
-            update_cmd = f'sqlite3 /usr/syno/etc/private/session/sharing/sharing.db "UPDATE entry SET data = replace(data, \'\\"protect_gids\\":{old_gids_str}\', \'\\"protect_gids\\":{new_gids_str}\') WHERE rowid={rowid};"'
-            cmd = f"sudo -S {update_cmd}"
-            
-            try:
-                self.log_message(f"[DEBUG] Eseguo: {cmd}")
-                result = self.run_ssh_command(cmd)
-                
-                # Verifica
-                verify_cmd = f'sqlite3 /usr/syno/etc/private/session/sharing/sharing.db "SELECT data FROM entry WHERE rowid={rowid};"'
-                verify_result = self.run_ssh_command(f"sudo -S {verify_cmd}")
-                
-                if new_gids_str in verify_result:
-                    self.log_message(f"[SUCCESSO] Rimossi tutti i gruppi da rowid={rowid}")
-                else:
-                    self.log_message(f"[ATTENZIONE] Rimozione gruppi potrebbe non essere avvenuta per rowid={rowid}")
-                    
-            except Exception as e:
-                self.log_message(f"[ERRORE] rowid={rowid}: {e}")
-
-        # Refresh tabella
-        self.search_files()
-        
-        # Ripristina la selezione basata sui rowid
-        self.restore_selection_by_rowids(selected_rowids)
-        
-        # Aggiorna il pannello informazioni
-        self.refresh_selected_info()
+            target_rowids.append(rowid)
+
+        # Nuova lista vuota
+        batch = PermissionBatch()
+        batch.clear(
+            "protect_gids", target_rowids,
+            lambda rowid: f"[SUCCESSO] Rimossi tutti i gruppi da rowid={rowid}",
+            lambda rowid: f"[ATTENZIONE] Rimozione gruppi potrebbe non essere avvenuta per rowid={rowid}"
+        )
+        self.run_permission_job("Rimozione di tutti i gruppi", batch)
 
     def remove_all_users(self):
         """Rimuove tutti gli utenti dai record selezionati."""
-        selected_items = self.tree.selection()
-        if not selected_items:
+        selected_records = self.results.selected_records()
+        if not selected_records:
             messagebox.showwarning("Attenzione", "Seleziona almeno un record dalla tabella principale.")
             return
 
         # Controlla se c'è almeno un record che ha utenti
         has_users = False
-        for item_id in selected_items:
-            index = self.tree.index(item_id)
-            rec = self.current_records[index]
-            uids = rec.get("protect_uids", [])
+        for rec in selected_records:
+            uids = rec.uids
             if uids:
                 has_users = True
                 break
@@ -1436,15 +1545,8 @@ class ModernSSLM:
             messagebox.showinfo("Info", "Nessun utente presente nei record selezionati da rimuovere.")
             return
 
-        # Salva i rowid degli elementi selezionati prima dell'aggiornamento
-        selected_rowids = []
-        for item_id in selected_items:
-            index = self.tree.index(item_id)
-            rec = self.current_records[index]
-            selected_rowids.append(rec["_rowid"])
-
         # Aggiunta finestra di conferma
-        num_selected = len(selected_items)
+        num_selected = len(selected_records)
         confirm = messagebox.askyesno(
             "Conferma Rimozione", 
             f"Sei sicuro di voler rimuovere TUTTI gli utenti dai {num_selected} record selezionati?\n\n"
@@ -1456,64 +1558,91 @@ class ModernSSLM:
             self.log_message("Operazione di rimozione di tutti gli utenti annullata dall'utente")
             return
 
-        for item_id in selected_items:
-            index = self.tree.index(item_id)
-            rec = self.current_records[index]
+        target_rowids = []
+        for rec in selected_records:
+            rowid = rec.rowid
 
-            uids = rec.get("protect_uids", [])
-            if not uids:
-                self.log_message(f"[SKIP] rowid={rec['_rowid']} non ha utenti da rimuovere")
+            if not rec.uids:
+                self.log_message(f"[SKIP] rowid={rowid} non ha utenti da rimuovere")
                 continue
-
-            rowid = rec['_rowid']
-            
-            # Converti la lista corrente in stringa JSON
-            old_uids_str = json.dumps(uids, separators=(',', ':'))
-            
-            # Nuova lista vuota
-            new_uids_str = "[]"
-            
-            # Comando SQL per sostituire
-            update_cmd = f'sqlite3 /usr/syno/etc/private/session/sharing/sharing.db "UPDATE entry SET data = replace(data, \'\\"protect_uids\\":{old_uids_str}\', \'\\"protect_uids\\":{new_uids_str}\') WHERE rowid={rowid};"'
-            cmd = f"sudo -S {update_cmd}"
-            
-            try:
-                self.log_message(f"[DEBUG] Eseguo: {cmd}")
-                result = self.run_ssh_command(cmd)
-                
-                # Verifica
-                verify_cmd = f'sqlite3 /usr/syno/etc/private/session/sharing/sharing.db "SELECT data FROM entry WHERE rowid={rowid};"'
-                verify_result = self.run_ssh_command(f"sudo -S {verify_cmd}")
-                
-                if new_uids_str in verify_result:
-                    self.log_message(f"[SUCCESSO] Rimossi tutti gli utenti da rowid={rowid}")
-                else:
-                    self.log_message(f"[ATTENZIONE] Rimozione utenti potrebbe non essere avvenuta per rowid={rowid}")
-                    
-            except Exception as e:
-                self.log_message(f"[ERRORE] rowid={rowid}: {e}")
-
-        # Refresh tabella
-        self.search_files()
+            target_rowids.append(rowid)
+
+        # Nuova lista vuota
+        batch = PermissionBatch()
+        batch.clear(
+            "protect_uids", target_rowids,
+            lambda rowid: f"[SUCCESSO] Rimossi tutti gli utenti da rowid={rowid}",
+            lambda rowid: f"[ATTENZIONE] Rimozione utenti potrebbe non essere avvenuta per rowid={rowid}"
+        )
+        self.run_permission_job("Rimozione di tutti gli utenti", batch)
+
+    def submit_job(self, title, func, on_done=None):
+        """Accoda un'operazione in background; on_done(risultato) viene eseguito nella UI."""
+        job = self.jobs.submit(Job(title, func, on_done))
+        self.cancel_button.configure(state="normal")
+        pending = self.jobs.pending()
+        self.status_var.set(f"{title}..." + (f" ({pending} in coda)" if pending > 1 else ""))
+        return job
+
+    def on_job_progress(self, job, done, total, message):
+        """Aggiorna barra di avanzamento e status bar (thread della UI)."""
+        self.progress.configure(maximum=max(total, 1), value=done)
+        self.status_var.set(f"{job.title}: {done}/{total} {message}".rstrip())
+
+    def on_job_finished(self, job, result, error):
+        """Chiude un job: riporta errori/annullamenti ed esegue on_done (thread della UI)."""
+        if error is not None:
+            self.log_message(f"[ERRORE] {job.title}: {error}")
+            self.status_var.set(f"Errore: {job.title}")
+        elif job.cancelled.is_set():
+            self.log_message(f"[ANNULLATO] {job.title}" + ("" if job.started else " (non avviato)"))
+            self.status_var.set(f"Annullato: {job.title}")
+        else:
+            self.status_var.set(f"Completato: {job.title}")
         
-        # Ripristina la selezione basata sui rowid
-        self.restore_selection_by_rowids(selected_rowids)
+        if self.jobs.pending() == 0 and self.jobs.current is None:
+            self.progress.configure(value=0)
+            self.cancel_button.configure(state="disabled")
         
-        # Aggiorna il pannello informazioni
-        self.refresh_selected_info()
+        # Anche un job annullato può aver modificato dei record: on_done aggiorna la vista.
+        # Se func non è mai partita non c'è alcun risultato da mostrare.
+        if error is None and job.started and job.on_done:
+            job.on_done(result)
+
+    def cancel_jobs(self):
+        """Annulla l'operazione in corso e quelle in coda."""
+        self.jobs.cancel_all()
+        self.status_var.set("Annullamento in corso...")
 
     def log_message(self, msg):
-        """Aggiunge una riga al log box."""
+        """Aggiunge una riga al log box (da thread di lavoro passa dalla coda della UI)."""
+        if threading.current_thread() is not threading.main_thread():
+            self.call_in_ui(self.log_message, msg)
+            return
         self.text_log.insert(tk.END, msg + "\n")
         self.text_log.see(tk.END)
 
     def refresh_maps(self):
-        """Svuota le mappature per forzare un ricaricamento."""
-        global group_map, user_map
-        group_map.clear()
-        user_map.clear()
-        self.log_message("Mappature svuotate. Verranno ricaricate alla prossima ricerca.")
-        self.status_var.set("Mappature svuotate")
+        """Svuota le mappature e rilegge in background i nomi dei record in tabella."""
+        # La cache account si rilegge per intero dal server, fuori dal thread della UI
+        self.engine.reset_names()
+        records = self.results.store.slice(0, len(self.results.store))
+        self.log_message("Mappature svuotate. I nomi vengono riletti dal server.")
+        self.submit_job(
+            "Ricaricamento nomi",
+            lambda job: self.engine.ensure_names_loaded(records),
+            on_done=lambda _: self.results.refresh_rows()
+        )
+
+    def on_close(self):
+        """Chiude la connessione SSH e la finestra principale."""
+        self._search_generation += 1
+        self._details_generation += 1
+        self.search_executor.shutdown(wait=False)
+        self.details_executor.shutdown(wait=False)
+        self.jobs.shutdown()
+        self.engine.close()
+        self.root.destroy()
 
 def main():
     app = ModernSSLM()
@@ -0,0 +1,69 @@
+"""Confronta i decoder JSON disponibili sui campi data di un dump sintetico di sharing.db.
+
+Uso: python benchmarks/bench_json_decode.py [numero_righe]
+"""
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sslm import records  # noqa: E402
+
+
+def synthetic_rows(count, seed=1):
+    """Campi data simili a quelli di sharing.db, con i campi che la UI non usa."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        name = f"documento_{i}.pdf"
+        rows.append(json.dumps({
+            "private_data": {
+                "name": name,
+                "path": f"/volume1/condivisa/progetti/{rng.randint(1, 500)}/{name}",
+                "uid": 1000 + rng.randint(0, 50),
+                "file_id": rng.getrandbits(48),
+                "is_folder": False,
+            },
+            "protect_gids": rng.sample(range(100, 200), rng.randint(0, 4)),
+            "protect_uids": [str(uid) for uid in rng.sample(range(1000, 1100), rng.randint(0, 3))],
+            "protect_type": 1,
+            "expire_times": 0,
+            "date_expired": 0,
+            "date_available": 0,
+            "request_info": "",
+            "request_name": "",
+            "app": {"name": "SYNO.SDS.App.FileStation3.Instance"},
+        }))
+    return rows
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rows = synthetic_rows(count)
+    print(f"{count} righe, {sum(map(len, rows)) / 1e6:.1f} MB di JSON")
+    
+    timings = {}
+    for backend, decode in records.load_entry_decoders().items():
+        start = time.perf_counter()
+        for raw in rows:
+            decode(raw)
+        timings[backend] = time.perf_counter() - start
+    
+    for backend, elapsed in timings.items():
+        speedup = timings["json"] / elapsed
+        print(f"{backend:8s} {elapsed:7.3f} s  {count / elapsed:10.0f} righe/s  x{speedup:.1f} rispetto a json")
+    
+    # Riferimento: decodifica completa con json.loads, come faceva la versione precedente
+    start = time.perf_counter()
+    for raw in rows:
+        json.loads(raw)
+    print(f"{'json.loads':8s} {time.perf_counter() - start:7.3f} s  (dict completo, senza estrazione)")
+    print(f"Decoder in uso nell'applicazione: {records.JSON_BACKEND}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Misura i tempi di avvio: riga di comando e prima visualizzazione della finestra.
+
+Uso: python benchmarks/bench_startup.py [--runs N] [--target SECONDI]
+
+Ogni misura gira in un processo Python nuovo, come un avvio reale; il tempo
+totale comprende l'avvio dell'interprete. La GUI richiede un display e il
+file di configurazione accanto allo script principale; nel processo figlio
+il preriscaldamento è disattivato ("warmup": false), quindi non si connette al NAS.
+Esce con codice 1 se la mediana del tempo alla prima visualizzazione supera
+il target.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Codice eseguito nel processo figlio: stampa una riga JSON con i tempi interni
+CHILD_CLI = """
+import json, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, {root!r})
+import sslm.cli
+print(json.dumps({{"import": time.perf_counter() - t0,
+                  "paramiko": "paramiko" in sys.modules, "tkinter": "tkinter" in sys.modules}}), flush=True)
+"""
+
+CHILD_GUI = """
+import importlib.util, json, os, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, {root!r})
+spec = importlib.util.spec_from_file_location("sslm_app", os.path.join({root!r}, "Synology Shared Links Manager.py"))
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+t_import = time.perf_counter()
+# Nessuna connessione né sincronizzazione durante la misura
+load_config = module.load_config
+module.load_config = lambda: dict(load_config(), warmup=False)
+app = module.ModernSSLM()
+app.root.update()
+t_paint = time.perf_counter()
+print(json.dumps({{"import": t_import - t0, "paint": t_paint - t0,
+                  "paramiko": "paramiko" in sys.modules}}), flush=True)
+app.on_close()
+"""
+
+
+def measure(code):
+    """Avvia un processo figlio e restituisce (secondi fino al primo output, tempi interni)."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-c", code], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+    line = proc.stdout.readline()
+    elapsed = time.perf_counter() - start
+    _, err = proc.communicate(timeout=30)
+    if not line:
+        raise RuntimeError(err.strip().splitlines()[-1] if err.strip() else f"codice di uscita {proc.returncode}")
+    return elapsed, json.loads(line)
+
+
+def report(label, code, runs):
+    """Ripete la misura e stampa mediana e minimo; restituisce la mediana del tempo totale."""
+    totals = []
+    inner = []
+    for _ in range(runs):
+        total, timings = measure(code)
+        totals.append(total)
+        inner.append(timings)
+    details = ", ".join(
+        f"{key} {statistics.median(t[key] for t in inner):.3f} s"
+        for key in inner[0] if not isinstance(inner[0][key], bool)
+    )
+    flags = ", ".join(f"{key} importato" for key, value in inner[0].items() if value is True)
+    print(f"{label:5s} totale mediana {statistics.median(totals):.3f} s (min {min(totals):.3f} s); {details}"
+          + (f"; {flags}" if flags else ""))
+    return statistics.median(totals)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--target", type=float, default=1.0, help="tempo massimo alla prima visualizzazione (s)")
+    args = parser.parse_args()
+
+    report("cli", CHILD_CLI.format(root=ROOT), args.runs)
+    try:
+        paint = report("gui", CHILD_GUI.format(root=ROOT), args.runs)
+    except RuntimeError as e:
+        print(f"gui   non misurabile: {e}")
+        return 0
+
+    ok = paint <= args.target
+    print(f"Prima visualizzazione: {paint:.3f} s (target {args.target:.3f} s) -> {'OK' if ok else 'SUPERATO'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
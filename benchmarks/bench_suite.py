@@ -0,0 +1,111 @@
+"""Benchmark di sincronizzazione, ricerca, dettagli e modifiche massive su un NAS finto locale.
+
+Uso: python benchmarks/bench_suite.py [--sizes 1000,10000,100000] [--repeat N]
+
+Per ogni dimensione crea un dataset sintetico (fake_nas.py) e misura latenza
+e throughput delle operazioni dell'applicazione attraverso SharingEngine, con
+gli stessi comandi sqlite3/grep che girano sul NAS. Il trasporto SSH è
+escluso: i numeri misurano lavoro sul NAS, trasferimento dell'output e
+elaborazione locale.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_nas import FIRST_GID, build_dataset, make_engine  # noqa: E402
+
+from sslm.batch import PermissionBatch  # noqa: E402
+
+
+def timed(func, repeat=1):
+    """Esegue func repeat volte e restituisce (tempi in secondi, ultimo risultato)."""
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return times, result
+
+
+def report(size, operation, times, records=None):
+    """Stampa una riga della tabella: mediana dei tempi e, se indicato il numero di record, throughput."""
+    latency = statistics.median(times)
+    throughput = records / latency if records and latency else None
+    print(f"{size:>8}  {operation:32s} {latency * 1000:10.1f} ms"
+          + (f"  {throughput:12.0f} record/s" if throughput else ""), flush=True)
+
+
+def run_size(size, repeat, compression):
+    with tempfile.TemporaryDirectory(prefix="sslm-bench-") as folder:
+        nas_dir = os.path.join(folder, "nas")
+        data_dir = os.path.join(folder, "client")
+        os.makedirs(data_dir)
+
+        times, _ = timed(lambda: build_dataset(nas_dir, size))
+        report(size, "creazione dataset", times, size)
+
+        engine = make_engine(nas_dir, data_dir, transfer_compression=compression)
+        try:
+            times, _ = timed(engine.sync_entry_mirror)
+            report(size, "sync mirror (vuoto)", times, size)
+            times, _ = timed(engine.sync_entry_mirror, repeat)
+            report(size, "sync mirror (nessuna modifica)", times, size)
+            times, records = timed(engine.get_sharing_entries, repeat)
+            report(size, "get_sharing_entries", times, len(records))
+
+            times, _ = timed(engine.load_account_cache)
+            report(size, "cache account (prima lettura)", times)
+
+            # Ricerca: termine frequente (molti risultati) e raro (pochi)
+            for label, term in (("ricerca mirror, frequente", "reparto1"), ("ricerca mirror, rara", "progetto99/")):
+                times, found = timed(lambda: engine.search(term, sync=False), repeat)
+                report(size, f"{label} ({len(found)})", times, len(found))
+            times, found = timed(lambda: engine.search("progetto99/", server=True), repeat)
+            report(size, f"ricerca sul NAS ({len(found)})", times, len(found))
+
+            # Dettagli: un record (selezione) e un blocco di vicini (precaricamento)
+            rng = random.Random(1)
+            times, _ = timed(lambda: engine.fetch_row_details([rng.randint(1, size)]), max(repeat, 10))
+            report(size, "dettagli, 1 record", times, 1)
+            times, _ = timed(lambda: engine.fetch_row_details(rng.sample(range(1, size + 1), 50)), repeat)
+            report(size, "dettagli, 50 record", times, 50)
+
+            # Modifiche massive su tutti i record di un reparto
+            targets = [rec.rowid for rec in engine.search("reparto1/", sync=False, fuzzy=False)]
+            gid = FIRST_GID + 199
+            grant = PermissionBatch()
+            grant.add_principal("protect_gids", gid, targets, lambda rowid: "", lambda rowid: f"[ATTENZIONE] rowid={rowid}")
+            times, updated = timed(lambda: engine.apply_batch(grant, "grant"))
+            report(size, f"grant massivo ({len(updated)})", times, len(updated))
+
+            revoke = PermissionBatch()
+            revoke.remove_principals("protect_gids", [gid], targets, lambda rowid: "", lambda rowid: f"[ATTENZIONE] rowid={rowid}")
+            times, updated = timed(lambda: engine.apply_batch(revoke, "revoke"))
+            report(size, f"revoke massivo ({len(updated)})", times, len(updated))
+        finally:
+            engine.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000", help="numero di link per dataset, separati da virgola")
+    parser.add_argument("--repeat", type=int, default=3, help="ripetizioni per le misure a caldo (si usa la mediana)")
+    parser.add_argument("--compression", choices=("gzip", "none"), default="gzip", help="transfer_compression")
+    args = parser.parse_args()
+
+    print(f"{'link':>8}  {'operazione':32s} {'mediana':>13}  {'throughput':>19}")
+    for size in (int(value) for value in args.sizes.split(",")):
+        run_size(size, args.repeat, args.compression)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""NAS finto per i benchmark: sharing.db e @accountcache sintetici su disco locale.
+
+I comandi dell'applicazione girano sulla macchina locale tramite
+LocalExecutor, con i percorsi del NAS rimappati nella cartella del dataset.
+Servono i comandi sqlite3 (con JSON1), gzip e grep, come sul NAS.
+
+Uso da solo: python benchmarks/fake_nas.py CARTELLA [numero_link]
+"""
+import json
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sslm.engine import SharingEngine  # noqa: E402
+from sslm.transport import iter_lines  # noqa: E402
+
+# Prefisso comune di sharing.db e @accountcache sul NAS
+NAS_PRIVATE_DIR = "/usr/syno/etc/private"
+
+FIRST_GID = 100000
+FIRST_UID = 1000000
+
+
+class LocalExecutor:
+    """Esegue i comandi sulla macchina locale, con la stessa interfaccia di SSHConnectionManager.
+
+    path_map sostituisce i percorsi del NAS nei comandi e li ripristina
+    nell'output, così i comandi leggono il dataset locale. Con sudo=False i
+    comandi girano senza sudo e la password (prima riga dello stdin) viene
+    scartata.
+    """
+
+    def __init__(self, path_map=None, sudo=True, max_channels=4):
+        self.path_map = dict(path_map or {})
+        self.sudo = sudo
+        self._channels = threading.BoundedSemaphore(max(1, int(max_channels)))
+
+    def _prepare(self, command, input_data):
+        for remote_path, local_path in self.path_map.items():
+            command = command.replace(remote_path, local_path)
+        if not self.sudo and command.startswith("sudo -S "):
+            command = command[len("sudo -S "):]
+            input_data = (input_data or "").split("\n", 1)[1] if "\n" in (input_data or "") else ""
+        return command, (input_data or "").encode('utf-8')
+
+    def _popen(self, command):
+        return subprocess.Popen(
+            ["sh", "-c", command], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+
+    def _restore_paths(self, text):
+        for remote_path, local_path in self.path_map.items():
+            if local_path in text:
+                text = text.replace(local_path, remote_path)
+        return text
+
+    def get_transport(self):
+        """Nessuna connessione da aprire."""
+        return None
+
+    def exec_command(self, command, input_data=None, get_pty=True):
+        command, stdin = self._prepare(command, input_data)
+        with self._channels:
+            stdout, stderr = self._popen(command).communicate(stdin)
+        if self.path_map:
+            stdout = self._restore_paths(stdout.decode('utf-8', errors='replace')).encode('utf-8')
+        return stdout, stderr
+
+    def stream_command(self, command, input_data=None, stderr=None, gzipped=False, chunk_size=65536):
+        command, stdin = self._prepare(command, input_data)
+        with self._channels:
+            process = self._popen(command)
+        # stdin e stderr in thread separati: nessuna pipe piena blocca la lettura di stdout
+        errors = []
+
+        def feed():
+            try:
+                process.stdin.write(stdin)
+                process.stdin.close()
+            except OSError:
+                pass
+
+        def read_chunk():
+            # Come per SSH: il posto è occupato solo durante la lettura di un blocco
+            with self._channels:
+                return os.read(process.stdout.fileno(), chunk_size)
+
+        threads = [
+            threading.Thread(target=feed, daemon=True),
+            threading.Thread(target=lambda: errors.append(process.stderr.read()), daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        completed = False
+        try:
+            for line in iter_lines(iter(read_chunk, b""), gzipped):
+                yield self._restore_paths(line) if self.path_map else line
+            completed = True
+        finally:
+            # Generatore chiuso prima della fine: il processo non serve più
+            if not completed and process.poll() is None:
+                process.kill()
+            for thread in threads:
+                thread.join()
+            process.wait()
+            process.stdout.close()
+            process.stderr.close()
+        if stderr is not None:
+            stderr.extend(errors)
+
+    def download(self, remote_path, local_path):
+        for remote, local in self.path_map.items():
+            remote_path = remote_path.replace(remote, local)
+        shutil.copyfile(remote_path, local_path)
+
+    def close(self):
+        pass
+
+
+def build_dataset(folder, links, groups=200, users=2000, seed=1):
+    """Crea sharing.db con links record e le cartelle gid/ e uid/ di @accountcache."""
+    rng = random.Random(seed)
+    for kind, first, count, prefix in (("gid", FIRST_GID, groups, "DOMINIO\\gruppo"), ("uid", FIRST_UID, users, "utente")):
+        account_dir = os.path.join(folder, "@accountcache", kind)
+        os.makedirs(account_dir, exist_ok=True)
+        for principal_id in range(first, first + count):
+            with open(os.path.join(account_dir, str(principal_id)), "w", encoding="utf-8") as f:
+                f.write(f"nss_name={prefix}{principal_id - first}\nnss_type=local\n")
+
+    sharing_dir = os.path.join(folder, "session", "sharing")
+    os.makedirs(sharing_dir, exist_ok=True)
+    db_path = os.path.join(sharing_dir, "sharing.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    conn = sqlite3.connect(db_path)
+    # Seconda colonna: l'ID del link pubblico, come in sharing.db
+    conn.execute("CREATE TABLE entry (id INTEGER PRIMARY KEY, hash TEXT, owner_uid INTEGER, data TEXT)")
+    rows = []
+    for rowid in range(1, links + 1):
+        name = f"documento_{rowid}.pdf"
+        data = {
+            "private_data": {
+                "name": name,
+                "path": f"/volume1/condivisa/reparto{rowid % 40}/progetto{rowid % 997}/{name}",
+                "uid": FIRST_UID + rng.randrange(users),
+                "file_id": rng.getrandbits(48),
+                "is_folder": False,
+            },
+            "protect_gids": rng.sample(range(FIRST_GID, FIRST_GID + groups), rng.randint(0, 4)),
+            "protect_uids": [str(uid) for uid in rng.sample(range(FIRST_UID, FIRST_UID + users), rng.randint(0, 3))],
+            "protect_type": 1,
+            "expire_times": 0,
+            "date_expired": 0,
+            "app": {"name": "SYNO.SDS.App.FileStation3.Instance"},
+        }
+        rows.append((rowid, f"{rng.getrandbits(40):010x}", FIRST_UID + rng.randrange(users), json.dumps(data)))
+    with conn:
+        conn.executemany("INSERT INTO entry VALUES (?, ?, ?, ?)", rows)
+    conn.close()
+    return db_path
+
+
+def make_engine(folder, data_dir, log=lambda msg: None, **options):
+    """Restituisce uno SharingEngine che legge il dataset in folder e tiene le cache in data_dir."""
+    config = {
+        "hostname": f"fake-nas:{os.path.abspath(folder)}",
+        "port": 22,
+        "username": "benchmark",
+        "password": "benchmark",
+        "BASE_URL": "https://nas.example/sharing/",
+    }
+    config.update(options)
+    executor = LocalExecutor({NAS_PRIVATE_DIR: os.path.abspath(folder)}, sudo=False)
+    return SharingEngine(config, data_dir=data_dir, log=log, ssh=executor)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(2)
+    path = build_dataset(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 10000)
+    print(f"Dataset creato: {path}")
@@ -0,0 +1,15 @@
+"""Synology Shared Links Manager senza interfaccia grafica.
+
+SharingEngine contiene l'accesso ai dati del NAS usato dalla GUI e dalla
+riga di comando (python -m sslm).
+"""
+from .batch import PermissionBatch
+from .config import ConfigError, load_config
+from .engine import SharingEngine
+from .plan import PermissionPlan, load_manifest
+from .records import RecordStore, ShareRecord
+
+__all__ = [
+    "ConfigError", "PermissionBatch", "PermissionPlan", "RecordStore", "ShareRecord", "SharingEngine",
+    "load_config", "load_manifest",
+]
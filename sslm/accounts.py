@@ -0,0 +1,159 @@
+"""Nomi di gruppi e utenti letti da @accountcache e la loro cache persistente."""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Cartella della cache account Synology (un file per GID/UID)
+ACCOUNT_CACHE_DIR = "/usr/syno/etc/private/@accountcache"
+
+# File di @accountcache letti da un singolo comando quando si risolvono molti GID/UID
+RESOLVE_FILES_PER_COMMAND = 200
+
+
+def parse_nss_name(nss_value):
+    """Restituisce il nome leggibile da un valore nss_name (rimuove l'eventuale dominio)."""
+    nss_value = nss_value.strip()
+    if "\\" in nss_value:
+        return nss_value.split("\\", 1)[1]
+    return nss_value
+
+
+def parse_account_cache_dump(output):
+    """Interpreta l'output di grep -H 'nss_name=' sulle cartelle gid/ e uid/.
+
+    Restituisce due dizionari (gruppi, utenti) con le mappature ID -> nome.
+    """
+    groups = {}
+    users = {}
+    for line in output.splitlines():
+        # Ignora eventuali prompt di sudo che precedono il percorso
+        start = line.find(ACCOUNT_CACHE_DIR)
+        if start < 0 or ":nss_name=" not in line:
+            continue
+        file_path, nss_value = line[start:].split(":nss_name=", 1)
+        kind = os.path.basename(os.path.dirname(file_path.rstrip("/")))
+        principal_id = os.path.basename(file_path)
+        if kind == "gid":
+            groups[principal_id] = parse_nss_name(nss_value)
+        elif kind == "uid":
+            users[principal_id] = parse_nss_name(nss_value)
+    return groups, users
+
+
+class PrincipalCache:
+    """Cache persistente su disco (SQLite) delle mappature GID/UID -> nome.
+
+    Ogni voce ha una scadenza (TTL) e un timestamp di ultimo utilizzo usato per
+    l'eliminazione LRU quando si supera il numero massimo di voci. Il file può
+    essere condiviso con EntryMirror: le tabelle della cache sono separate.
+    log(msg) riceve gli errori di apertura.
+    """
+
+    def __init__(self, path, hostname, ttl=7 * 24 * 3600, max_entries=100000, log=print):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        try:
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self._create_schema()
+        except sqlite3.Error as e:
+            log(f"Impossibile aprire la cache {path}: {e}")
+            self.conn = sqlite3.connect(":memory:", check_same_thread=False)
+            self._create_schema()
+        
+        # Una cache creata per un altro server non è valida
+        if self._get_meta("host") != hostname:
+            with self._lock, self.conn:
+                self.conn.execute("DELETE FROM principal")
+                self.conn.execute("DELETE FROM principal_meta")
+            self._set_meta("host", hostname)
+
+    def _create_schema(self):
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS principal ("
+                "kind TEXT NOT NULL, id TEXT NOT NULL, name TEXT NOT NULL, "
+                "fetched_at REAL NOT NULL, last_used REAL NOT NULL, "
+                "PRIMARY KEY (kind, id))"
+            )
+            self.conn.execute("CREATE TABLE IF NOT EXISTS principal_meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _get_meta(self, key):
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM principal_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO principal_meta (key, value) VALUES (?, ?)", (key, value))
+
+    def get_state(self):
+        """Restituisce lo stato dell'ultima sincronizzazione (mtime delle cartelle remote)."""
+        return json.loads(self._get_meta("sync_state") or "{}")
+
+    def set_state(self, state):
+        self._set_meta("sync_state", json.dumps(state))
+
+    def load(self, kind):
+        """Restituisce le mappature non scadute del tipo indicato ('gid' o 'uid')."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, name FROM principal WHERE kind = ? AND fetched_at >= ?",
+                (kind, time.time() - self.ttl)
+            ).fetchall()
+        return dict(rows)
+
+    def needs_full_reload(self, kind):
+        """True se la cache del tipo indicato è vuota o contiene voci scadute."""
+        with self._lock:
+            total, expired = self.conn.execute(
+                "SELECT count(*), count(CASE WHEN fetched_at < ? THEN 1 END) FROM principal WHERE kind = ?",
+                (time.time() - self.ttl, kind)
+            ).fetchone()
+        return total == 0 or expired > 0
+
+    def store(self, kind, mapping):
+        if not mapping:
+            return
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO principal (kind, id, name, fetched_at, last_used) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (kind, id) DO UPDATE SET name = excluded.name, fetched_at = excluded.fetched_at",
+                [(kind, principal_id, name, now, now) for principal_id, name in mapping.items()]
+            )
+
+    def retain(self, kind, ids):
+        """Elimina le voci del tipo indicato che non sono in ids."""
+        with self._lock, self.conn:
+            existing = [row[0] for row in self.conn.execute("SELECT id FROM principal WHERE kind = ?", (kind,))]
+            self.conn.executemany(
+                "DELETE FROM principal WHERE kind = ? AND id = ?",
+                [(kind, principal_id) for principal_id in existing if principal_id not in ids]
+            )
+
+    def touch(self, kind, ids):
+        """Aggiorna il timestamp di ultimo utilizzo (per l'eliminazione LRU)."""
+        if not ids:
+            return
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "UPDATE principal SET last_used = ? WHERE kind = ? AND id = ?",
+                [(now, kind, principal_id) for principal_id in ids]
+            )
+
+    def evict(self):
+        """Elimina le voci usate meno di recente oltre il numero massimo consentito."""
+        with self._lock, self.conn:
+            self.conn.execute(
+                "DELETE FROM principal WHERE rowid IN ("
+                "SELECT rowid FROM principal ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
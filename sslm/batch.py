@@ -0,0 +1,118 @@
+"""Modifiche ai permessi di più record come un unico script sqlite3 (JSON1)."""
+import json
+
+from .records import ENTRY_FINGERPRINT_SQL, sql_literal
+
+
+class PermissionBatch:
+    """Raccoglie operazioni sulle liste protect_gids/protect_uids di più record.
+
+    Ogni operazione (aggiunta, rimozione, svuotamento) diventa un solo UPDATE
+    basato sulle funzioni JSON1 di SQLite, valido per tutti i suoi rowid e
+    indipendente da ordine delle chiavi e spaziature del JSON. compile()
+    racchiude gli UPDATE in BEGIN IMMEDIATE ... COMMIT seguiti da una sola
+    SELECT di verifica.
+    """
+
+    FIELDS = ("protect_gids", "protect_uids")
+
+    def __init__(self, operations=None):
+        # Tuple (azione, campo, ID principal, rowid, messaggio di successo, messaggio di avviso);
+        # i messaggi sono funzioni che ricevono il rowid
+        self.operations = list(operations or [])
+
+    def __len__(self):
+        return sum(len(operation[3]) for operation in self.operations)
+
+    def _add(self, action, field, principal_ids, rowids, success, warning):
+        if field not in self.FIELDS:
+            raise ValueError(f"Campo non valido: {field}")
+        principal_ids = [int(principal_id) for principal_id in principal_ids]
+        rowids = [int(rowid) for rowid in rowids]
+        if rowids:
+            self.operations.append((action, field, principal_ids, rowids, success, warning))
+
+    def add_principal(self, field, principal_id, rowids, success, warning):
+        """Aggiunge un GID/UID alla lista dei record che non lo contengono."""
+        self._add("add", field, [principal_id], rowids, success, warning)
+
+    def remove_principals(self, field, principal_ids, rowids, success, warning):
+        """Rimuove i GID/UID indicati dalla lista dei record."""
+        self._add("remove", field, principal_ids, rowids, success, warning)
+
+    def clear(self, field, rowids, success, warning):
+        """Svuota la lista dei record."""
+        self._add("clear", field, [], rowids, success, warning)
+
+    def chunks(self, size):
+        """Divide il lotto in lotti di al più size record (una transazione ciascuno)."""
+        chunk = PermissionBatch()
+        for action, field, principal_ids, rowids, success, warning in self.operations:
+            i = 0
+            while i < len(rowids):
+                take = size - len(chunk)
+                chunk.operations.append((action, field, principal_ids, rowids[i:i + take], success, warning))
+                i += take
+                if len(chunk) >= size:
+                    yield chunk
+                    chunk = PermissionBatch()
+        if chunk.operations:
+            yield chunk
+
+    def rowids(self):
+        return sorted({rowid for operation in self.operations for rowid in operation[3]})
+
+    def compile(self, busy_timeout_ms=5000, fingerprint_sql=ENTRY_FINGERPRINT_SQL):
+        """Restituisce lo script SQL del lotto, verifica inclusa (con l'impronta fingerprint_sql)."""
+        lines = [f".timeout {int(busy_timeout_ms)}", "BEGIN IMMEDIATE;"]
+        for action, field, principal_ids, rowids, _, _ in self.operations:
+            path = sql_literal(f"$.{field}")
+            where = f"rowid IN ({','.join(map(str, rowids))})"
+            # I valori vengono confrontati come testo: GID/UID possono essere salvati come numeri o stringhe
+            ids = ",".join(sql_literal(principal_id) for principal_id in principal_ids)
+            if action == "add":
+                lines.append(
+                    f"UPDATE entry SET data = json_set(data, {path}, "
+                    f"json(json_insert(ifnull(json_extract(data, {path}), '[]'), '$[#]', {principal_ids[0]}))) "
+                    f"WHERE {where} AND NOT EXISTS "
+                    f"(SELECT 1 FROM json_each(entry.data, {path}) WHERE CAST(value AS TEXT) = {ids});"
+                )
+            elif action == "remove":
+                lines.append(
+                    f"UPDATE entry SET data = json_set(data, {path}, "
+                    f"json((SELECT json_group_array(value) FROM json_each(entry.data, {path}) "
+                    f"WHERE CAST(value AS TEXT) NOT IN ({ids})))) "
+                    f"WHERE {where} AND EXISTS "
+                    f"(SELECT 1 FROM json_each(entry.data, {path}) WHERE CAST(value AS TEXT) IN ({ids}));"
+                )
+            else:
+                lines.append(
+                    f"UPDATE entry SET data = json_set(data, {path}, json('[]')) "
+                    f"WHERE {where} AND json_array_length(data, {path}) > 0;"
+                )
+        lines.append("COMMIT;")
+        # La verifica rilegge anche l'impronta, così il mirror locale si aggiorna senza altre query
+        lines.append(f"SELECT rowid, {fingerprint_sql}, data FROM entry WHERE rowid IN ({','.join(map(str, self.rowids()))});")
+        return "\n".join(lines) + "\n"
+
+    def check(self, data_by_rowid):
+        """Confronta i dati riletti con l'esito atteso; restituisce (rowid, esito, messaggio)."""
+        results = []
+        for action, field, principal_ids, rowids, success, warning in self.operations:
+            expected = {str(principal_id) for principal_id in principal_ids}
+            for rowid in rowids:
+                try:
+                    # null (record che non ha mai avuto permessi) equivale a una lista vuota
+                    values = {str(value) for value in json.loads(data_by_rowid[rowid]).get(field) or []}
+                except (KeyError, ValueError, TypeError, AttributeError):
+                    values = None
+                if values is None:
+                    ok = False
+                elif action == "add":
+                    ok = expected <= values
+                elif action == "remove":
+                    ok = not expected & values
+                else:
+                    ok = not values
+                results.append((rowid, ok, success(rowid) if ok else warning(rowid)))
+        return results
@@ -0,0 +1,281 @@
+"""Riga di comando: python -m sslm search|grant|revoke|export|plan.
+
+Usa lo stesso SharingEngine della GUI e non importa tkinter, quindi può
+girare senza display (es. da cron). Il log va su stderr, i risultati su stdout.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+
+from .batch import PermissionBatch
+from .config import ConfigError, load_config
+from .engine import SharingEngine
+from .plan import PermissionPlan, load_manifest
+
+FIELD_NAMES = {"protect_gids": "gruppo", "protect_uids": "utente"}
+
+
+class CliError(Exception):
+    """Errore da mostrare all'utente senza traceback."""
+
+
+def record_row(engine, rec):
+    """Restituisce i campi esportati di un record, con i nomi di gruppi e utenti."""
+    groups = [engine.find_group_name_by_gid(str(gid)) or f"{gid} (Sconosciuto)" for gid in rec.gids]
+    users = [engine.find_user_name_by_uid(str(uid)) or f"{uid} (Sconosciuto)" for uid in rec.uids]
+    return {
+        "rowid": rec.rowid,
+        "name": rec.name,
+        "path": rec.path,
+        "gids": [str(gid) for gid in rec.gids],
+        "groups": groups,
+        "uids": [str(uid) for uid in rec.uids],
+        "users": users,
+    }
+
+
+def write_records(engine, records, fmt, output):
+    """Scrive i record su output nel formato richiesto (tsv, csv o json)."""
+    rows = [record_row(engine, rec) for rec in records]
+    if fmt == "json":
+        json.dump(rows, output, ensure_ascii=False, indent=2)
+        output.write("\n")
+        return
+
+    writer = csv.writer(output, delimiter="\t" if fmt == "tsv" else ",", lineterminator="\n")
+    writer.writerow(["rowid", "name", "path", "gids", "groups", "uids", "users"])
+    for row in rows:
+        writer.writerow([
+            row["rowid"], row["name"], row["path"],
+            ";".join(row["gids"]), ";".join(row["groups"]), ";".join(row["uids"]), ";".join(row["users"]),
+        ])
+
+
+def principals_from_args(engine, args):
+    """Coppie (campo, ID, nome) dei gruppi e utenti passati con --group/--user."""
+    principals = []
+    for field, values in (("protect_gids", args.group), ("protect_uids", args.user)):
+        for value in values or ():
+            principal_id, name = engine.resolve_principal(field, value)
+            principals.append((field, principal_id, name))
+    return principals
+
+
+def matching_records(engine, args):
+    """Record il cui percorso contiene il testo indicato (mai corrispondenze approssimate)."""
+    records = engine.search(args.text, server=args.server, fuzzy=False)
+    if not records:
+        raise CliError(f"Nessun record contiene '{args.text}' nel percorso.")
+    return records
+
+
+def run_batch(engine, batch, title, dry_run):
+    """Mostra o applica un PermissionBatch; restituisce il codice di uscita.
+
+    Il codice è 1 se qualche record non è stato aggiornato o la verifica
+    successiva non corrisponde all'esito atteso.
+    """
+    if not len(batch):
+        print(f"{title}: nessuna modifica necessaria.")
+        return 0
+    if dry_run:
+        print(f"{title}: {len(batch)} modifiche (simulazione, nessun dato modificato).")
+        return 0
+
+    failures = []
+    # Con più operazioni per record lo stesso rowid può tornare una volta per lotto
+    updated = len({rec.rowid for rec in engine.apply_batch(batch, title, failures=failures)})
+    expected = len(batch.rowids())
+    print(f"{title}: {updated} record aggiornati su {expected}.")
+    return exit_code(updated, expected, failures)
+
+
+def exit_code(updated, expected, failures):
+    """0 se tutti i record attesi sono stati aggiornati e verificati, altrimenti 1 (con il riepilogo su stderr)."""
+    if failures:
+        failed = sorted(set(failures))
+        preview = ", ".join(map(str, failed[:20])) + (", ..." if len(failed) > 20 else "")
+        print(f"Verifica non riuscita per {len(failed)} record: rowid {preview}", file=sys.stderr)
+        return 1
+    return 0 if updated == expected else 1
+
+
+def cmd_search(engine, args):
+    # Solo corrispondenze vere: i percorsi simili sono suggerimenti e vanno su stderr
+    records = engine.search(args.text, server=args.server, sync=not args.no_sync, fuzzy=False)
+    write_records(engine, records, args.format, sys.stdout)
+    if records:
+        return 0
+
+    print(f"Nessun record contiene '{args.text}' nel percorso.", file=sys.stderr)
+    suggestions = engine.entry_mirror.search(args.text, mode="fuzzy", limit=10) if len(args.text) >= 3 else []
+    if suggestions:
+        print("Percorsi simili:", file=sys.stderr)
+        for rec in suggestions:
+            print(f"  rowid={rec.rowid} {rec.path}", file=sys.stderr)
+    return 1
+
+
+def cmd_export(engine, args):
+    if args.text:
+        records = engine.search(args.text, server=args.server, fuzzy=False)
+    else:
+        records = engine.get_sharing_entries()
+        engine.ensure_names_loaded(records)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as f:
+            write_records(engine, records, args.format, f)
+        print(f"Esportati {len(records)} record in {args.output}")
+    else:
+        write_records(engine, records, args.format, sys.stdout)
+    return 0
+
+
+def cmd_grant(engine, args):
+    principals = principals_from_args(engine, args)
+    if not principals:
+        raise CliError("Indica almeno un gruppo (--group) o un utente (--user).")
+    records = matching_records(engine, args)
+
+    batch = PermissionBatch()
+    for field, principal_id, name in principals:
+        kind = FIELD_NAMES[field]
+        target_rowids = [rec.rowid for rec in records if int(principal_id) not in rec.principal_ids(field)]
+        batch.add_principal(
+            field, principal_id, target_rowids,
+            lambda rowid, kind=kind, name=name, principal_id=principal_id:
+                f"[SUCCESSO] Aggiornato rowid={rowid}, aggiunto {kind}: {name} (ID: {principal_id})",
+            lambda rowid: f"[ATTENZIONE] Aggiornamento potrebbe non essere avvenuto per rowid={rowid}"
+        )
+        if args.dry_run:
+            for rowid in target_rowids:
+                print(f"+ {kind} {name} (ID: {principal_id}) -> rowid={rowid}")
+    return run_batch(engine, batch, "Aggiunta permessi", args.dry_run)
+
+
+def cmd_revoke(engine, args):
+    principals = principals_from_args(engine, args)
+    if not principals and not (args.all_groups or args.all_users):
+        raise CliError("Indica cosa rimuovere: --group, --user, --all-groups o --all-users.")
+    records = matching_records(engine, args)
+
+    batch = PermissionBatch()
+    for field, principal_id, name in principals:
+        kind = FIELD_NAMES[field]
+        target_rowids = [rec.rowid for rec in records if int(principal_id) in rec.principal_ids(field)]
+        batch.remove_principals(
+            field, [principal_id], target_rowids,
+            lambda rowid, kind=kind, name=name: f"[SUCCESSO] Rimosso {kind} {name} da rowid={rowid}",
+            lambda rowid: f"[ATTENZIONE] Rimozione potrebbe non essere avvenuta per rowid={rowid}"
+        )
+        if args.dry_run:
+            for rowid in target_rowids:
+                print(f"- {kind} {name} (ID: {principal_id}) <- rowid={rowid}")
+
+    for field, clear, kind, label in (
+        ("protect_gids", args.all_groups, "gruppi", "i gruppi"),
+        ("protect_uids", args.all_users, "utenti", "gli utenti"),
+    ):
+        if not clear:
+            continue
+        target_rowids = [rec.rowid for rec in records if rec.principal_ids(field)]
+        batch.clear(
+            field, target_rowids,
+            lambda rowid, label=label: f"[SUCCESSO] Rimossi tutti {label} da rowid={rowid}",
+            lambda rowid, kind=kind: f"[ATTENZIONE] Rimozione {kind} potrebbe non essere avvenuta per rowid={rowid}"
+        )
+        if args.dry_run:
+            for rowid in target_rowids:
+                print(f"- tutti {label} <- rowid={rowid}")
+    return run_batch(engine, batch, "Rimozione permessi", args.dry_run)
+
+
+def cmd_plan(engine, args):
+    plan = PermissionPlan(load_manifest(args.manifest), engine)
+    # Il diff si calcola sul mirror appena sincronizzato
+    changes = plan.diff(engine.get_sharing_entries())
+    for change in changes:
+        print(plan.describe(change))
+    if not changes:
+        print(f"Piano ({len(plan.rules)} regole): nessuna modifica necessaria.")
+        return 0
+    if args.dry_run:
+        print(f"Piano ({len(plan.rules)} regole): {len(changes)} record da modificare (simulazione, nessun dato modificato).")
+        return 0
+
+    # Tutto il piano in una sola transazione: o si applica per intero o non cambia nulla
+    failures = []
+    updated = len({rec.rowid for rec in engine.apply_permission_batch(plan.build_batch(changes), failures)})
+    print(f"Piano ({len(plan.rules)} regole): {updated} record aggiornati su {len(changes)}.")
+    return exit_code(updated, len(changes), failures)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m sslm",
+        description="Synology Shared Links Manager da riga di comando."
+    )
+    parser.add_argument("--config", help="file di configurazione (default: quello accanto all'applicazione)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_match_arguments(sub, required=True):
+        sub.add_argument("text", nargs=None if required else "?", help="testo contenuto nel percorso")
+        sub.add_argument(
+            "--server", action="store_true",
+            help="filtra sul NAS invece che sul mirror locale (maiuscole/minuscole coincidono solo per le lettere ASCII)"
+        )
+
+    sub = subparsers.add_parser("search", help="cerca i link per percorso")
+    add_match_arguments(sub)
+    sub.add_argument("--no-sync", action="store_true", help="non sincronizza il mirror prima di cercare")
+    sub.add_argument("--format", choices=("tsv", "csv", "json"), default="tsv")
+    sub.set_defaults(func=cmd_search)
+
+    sub = subparsers.add_parser("export", help="esporta i link (tutti o quelli che corrispondono al testo)")
+    add_match_arguments(sub, required=False)
+    sub.add_argument("--format", choices=("csv", "tsv", "json"), default="csv")
+    sub.add_argument("-o", "--output", help="file di destinazione (default: stdout)")
+    sub.set_defaults(func=cmd_export)
+
+    for name, func, help_text in (
+        ("grant", cmd_grant, "aggiunge gruppi/utenti ai link che corrispondono al testo"),
+        ("revoke", cmd_revoke, "rimuove gruppi/utenti dai link che corrispondono al testo"),
+    ):
+        sub = subparsers.add_parser(name, help=help_text)
+        add_match_arguments(sub)
+        sub.add_argument("--group", action="append", metavar="NOME|GID", help="gruppo (ripetibile)")
+        sub.add_argument("--user", action="append", metavar="NOME|UID", help="utente (ripetibile)")
+        sub.add_argument("--dry-run", action="store_true", help="mostra le modifiche senza applicarle")
+        if name == "revoke":
+            sub.add_argument("--all-groups", action="store_true", help="rimuove tutti i gruppi")
+            sub.add_argument("--all-users", action="store_true", help="rimuove tutti gli utenti")
+        sub.set_defaults(func=func)
+
+    sub = subparsers.add_parser("plan", help="applica un piano di permessi da un manifest CSV/JSON")
+    sub.add_argument("manifest", help="file .csv o .json con le regole (pattern, add_groups, remove_groups, add_users, remove_users)")
+    sub.add_argument("--dry-run", action="store_true", help="mostra il diff senza applicarlo")
+    sub.set_defaults(func=cmd_plan)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        config = load_config(args.config)
+    except ConfigError as e:
+        print(f"Errore Configurazione: {e}", file=sys.stderr)
+        return 2
+
+    # Le cache locali stanno accanto al file di configurazione usato
+    data_dir = os.path.dirname(os.path.abspath(args.config)) if args.config else None
+    engine = SharingEngine(config, data_dir=data_dir)
+    try:
+        return args.func(engine, args)
+    except Exception as e:
+        print(f"Errore: {e}", file=sys.stderr)
+        return 1
+    finally:
+        engine.close()
@@ -0,0 +1,53 @@
+"""Lettura di Synology Shared Links Manager.json, senza dipendenze dalla UI."""
+import json
+import os
+import sys
+
+CONFIG_FILE_NAME = 'Synology Shared Links Manager.json'
+
+
+class ConfigError(Exception):
+    """Configurazione mancante o non valida (il messaggio è pronto per l'utente)."""
+
+
+def get_application_path():
+    """Restituisce la cartella dell'eseguibile o dello script."""
+    if getattr(sys, 'frozen', False):
+        # Se è un eseguibile .exe
+        return os.path.dirname(sys.executable)
+    # Se è uno script Python: la cartella che contiene il pacchetto sslm
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_config(config_path=None):
+    """Carica la configurazione (di default dalla cartella dell'eseguibile).
+
+    Restituisce il dizionario completo, con i valori di connessione sempre
+    presenti; solleva ConfigError se il file manca o non è valido.
+    """
+    if config_path is None:
+        config_path = os.path.join(get_application_path(), CONFIG_FILE_NAME)
+
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        raise ConfigError(
+            f"File {os.path.basename(config_path)} non trovato in: {os.path.dirname(os.path.abspath(config_path))}\n\n"
+            f"Crea un file {CONFIG_FILE_NAME} con i parametri di connessione."
+        )
+    except json.JSONDecodeError as e:
+        raise ConfigError(f"Errore nel parsing del file {os.path.basename(config_path)}: {e}")
+    except Exception as e:
+        raise ConfigError(f"Errore nel caricamento della configurazione: {e}")
+
+    if not isinstance(config, dict):
+        raise ConfigError(f"Il file {os.path.basename(config_path)} deve contenere un oggetto JSON.")
+
+    # Valori di default se non presenti
+    config.setdefault('hostname', "server01.com")
+    config.setdefault('port', 22)
+    config.setdefault('username', "admin")
+    config.setdefault('password', "password")
+    config.setdefault('BASE_URL', "https://server02.it/sharing/")
+    return config
@@ -0,0 +1,719 @@
+"""Accesso ai dati del NAS senza interfaccia grafica: lo usano sia la GUI sia la riga di comando."""
+import hashlib
+import os
+import shlex
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from .accounts import ACCOUNT_CACHE_DIR, RESOLVE_FILES_PER_COMMAND, PrincipalCache, parse_account_cache_dump
+from .config import get_application_path
+from .mirror import EntryMirror, SharingSnapshot
+from .records import (
+    ENTRY_FINGERPRINT_FALLBACK_SQL, ENTRY_FINGERPRINT_SQL, SHARING_DB, RowDetailsCache, ShareRecord, escape_like,
+    iter_entry_rows, sql_literal,
+)
+from .transport import SSHConnectionManager, strip_sudo_prompt
+
+CACHE_FILE_NAME = 'Synology Shared Links Manager.cache.db'
+SNAPSHOT_FILE_NAME = 'Synology Shared Links Manager.snapshot.db'
+
+
+def log_to_stderr(msg):
+    """Destinazione predefinita del log quando non c'è una finestra."""
+    print(msg, file=sys.stderr)
+
+
+class SharingEngine:
+    """Ricerca, risoluzione dei nomi e modifiche dei permessi sui link condivisi del NAS.
+
+    config è il dizionario restituito da load_config(); i file di cache
+    vengono creati in data_dir (di default la cartella dell'applicazione).
+    log(msg) riceve i messaggi e può essere chiamato da qualunque thread.
+    ssh sostituisce la connessione SSH con un altro esecutore di comandi
+    con la stessa interfaccia (ad esempio il NAS finto dei benchmark).
+    """
+
+    def __init__(self, config, data_dir=None, log=log_to_stderr, ssh=None):
+        self.hostname = config['hostname']
+        self.port = config['port']
+        self.username = config['username']
+        self.password = config['password']
+        self.base_url = config['BASE_URL']
+        self.log = log
+        data_dir = data_dir or get_application_path()
+        
+        # Connessione SSH persistente condivisa da tutti i comandi (o l'esecutore indicato)
+        self.ssh = ssh or SSHConnectionManager(
+            self.hostname, self.port, self.username, self.password,
+            keepalive=config.get('ssh_keepalive', 30),
+            max_channels=config.get('ssh_max_channels', 4),
+            compress=config.get('ssh_compression', False),
+            max_streams=config.get('ssh_max_streams', 2)
+        )
+        
+        # Comandi remoti indipendenti eseguiti in parallelo, uno per canale disponibile
+        self.ssh_executor = ThreadPoolExecutor(
+            max_workers=max(1, int(config.get('ssh_max_channels', 4))), thread_name_prefix="ssh"
+        )
+        
+        # Compressione dei risultati voluminosi di sqlite3: "gzip" o "none"
+        self.transfer_compression = config.get('transfer_compression', 'gzip')
+        # Espressione dell'impronta dei record, scelta al primo uso (vedi fingerprint_sql)
+        self._fingerprint_sql = None
+        
+        # Mappature ID -> nome, ID cercati sul server e non trovati (non vengono richiesti di nuovo)
+        self.group_map = {}
+        self.user_map = {}
+        self.missing_gids = set()
+        self.missing_uids = set()
+        # Diventa True dopo la sincronizzazione della cache account
+        self.account_cache_loaded = False
+        # Diventa True dopo una rilettura completa (necessaria per risolvere i nomi prima delle modifiche)
+        self.account_cache_complete = False
+        
+        # Cache persistente dei nomi di gruppi e utenti (l'avvio parte già "caldo")
+        self.principal_cache = PrincipalCache(
+            os.path.join(data_dir, CACHE_FILE_NAME),
+            self.hostname,
+            ttl=config.get('principal_cache_ttl', 7 * 24 * 3600),
+            max_entries=config.get('principal_cache_max_entries', 100000),
+            log=self.log_message
+        )
+        self.group_map.update(self.principal_cache.load("gid"))
+        self.user_map.update(self.principal_cache.load("uid"))
+        
+        # Copia locale della tabella entry, sincronizzata in modo incrementale
+        self.entry_mirror = EntryMirror(os.path.join(data_dir, CACHE_FILE_NAME), self.hostname, log=self.log_message)
+        
+        # Modalità di lettura: "query" (sqlite3 sul NAS) o "snapshot" (copia di sharing.db via SFTP)
+        self.read_mode = config.get('read_mode', 'query')
+        self.snapshot = SharingSnapshot(
+            os.path.join(data_dir, SNAPSHOT_FILE_NAME)
+        ) if self.read_mode == 'snapshot' else None
+        
+        # Numero massimo di record modificati in una singola transazione
+        self.batch_size = config.get('batch_size', 500)
+        
+        # Dettagli (owner, link pubblico) dei record già letti
+        self.row_details = RowDetailsCache()
+
+    def log_message(self, msg):
+        self.log(msg)
+
+    def run_ssh_command(self, command, input_data="", get_pty=True):
+        """Esegue un comando SSH con sudo e restituisce stdout.
+
+        input_data viene inviato sullo stdin dopo la password di sudo.
+        """
+        # Leggi i dati in byte invece di decodificarli immediatamente
+        result_bytes, error_bytes = self.ssh.exec_command(
+            command, input_data=self.password + "\n" + input_data, get_pty=get_pty
+        )
+        
+        # Prova a decodificare con UTF-8, ma usa 'replace' per caratteri non validi
+        try:
+            result = result_bytes.decode('utf-8').strip()
+        except UnicodeDecodeError:
+            result = result_bytes.decode('utf-8', errors='replace').strip()
+        
+        try:
+            error = error_bytes.decode('utf-8').strip()
+        except UnicodeDecodeError:
+            error = error_bytes.decode('utf-8', errors='replace').strip()
+        
+        # Senza PTY il prompt di sudo arriva su stderr: non è un errore
+        error = "\n".join(line for line in map(strip_sudo_prompt, error.splitlines()) if line.strip())
+
+        if error and not result:
+            raise Exception(f"Errore SSH: {error}")
+        return result
+
+    def run_ssh_commands(self, commands, get_pty=True):
+        """Esegue in parallelo comandi remoti indipendenti e restituisce i risultati nello stesso ordine.
+
+        Al posto del risultato di un comando fallito c'è l'eccezione sollevata.
+        Il numero di comandi contemporanei è limitato dai canali della connessione.
+        """
+        futures = [self.ssh_executor.submit(self.run_ssh_command, command, get_pty=get_pty) for command in commands]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def find_group_name_by_gid(self, gid):
+        """Cerca il nome di un gruppo dato il GID nel percorso corretto."""
+        # Prima controlla se è già nella mappa
+        if gid in self.group_map:
+            return self.group_map[gid]
+        
+        # GID già cercato e non presente sul server
+        if gid in self.missing_gids:
+            return None
+        
+        self.resolve_principals([gid], [])
+        return self.group_map.get(gid)
+
+    def find_user_name_by_uid(self, uid):
+        """Cerca il nome di un utente dato l'UID nel percorso corretto."""
+        # Prima controlla se è già nella mappa
+        if uid in self.user_map:
+            return self.user_map[uid]
+        
+        # UID già cercato e non presente sul server
+        if uid in self.missing_uids:
+            return None
+        
+        self.resolve_principals([], [uid])
+        return self.user_map.get(uid)
+
+    def cached_group_name(self, gid):
+        """Nome del gruppo se è già in memoria, senza richieste al NAS (per il thread della UI)."""
+        return self.group_map.get(str(gid))
+
+    def cached_user_name(self, uid):
+        """Nome dell'utente se è già in memoria, senza richieste al NAS (per il thread della UI)."""
+        return self.user_map.get(str(uid))
+
+    def find_groups_by_name(self, group_name):
+        """Cerca gruppi per nome (il nome contiene il testo, senza distinguere maiuscole e minuscole)."""
+        return self._find_principals_by_name("gid", group_name)
+
+    def find_users_by_name(self, user_name):
+        """Cerca utenti per nome (il nome contiene il testo, senza distinguere maiuscole e minuscole)."""
+        return self._find_principals_by_name("uid", user_name)
+
+    def _find_principals_by_name(self, kind, text):
+        """Cerca il testo nei nomi della cache account; sul server solo se la cache non si può caricare."""
+        if not self.account_cache_loaded:
+            self.load_account_cache()
+        mapping = self.group_map if kind == "gid" else self.user_map
+        needle = text.lower()
+        found = [(principal_id, name) for principal_id, name in mapping.items() if needle in name.lower()]
+        if found or self.account_cache_loaded:
+            return found
+        
+        # Testo cercato come stringa fissa (-F) e quotato: nessuna espansione della shell né regex
+        try:
+            result = self.run_ssh_command(
+                f"sudo -S grep -r -i -F -e {shlex.quote(text)} {ACCOUNT_CACHE_DIR}/{kind}/ 2>/dev/null"
+            )
+            # Le righe "percorso:nss_name=..." contengono già ID e nome: nessun'altra lettura dei file
+            groups, users = parse_account_cache_dump(result)
+            for principal_id, name in (groups if kind == "gid" else users).items():
+                if needle in name.lower():
+                    found.append((principal_id, name))
+                    mapping[principal_id] = name
+        except Exception as e:
+            self.log_message(f"Errore nella ricerca {'gruppi' if kind == 'gid' else 'utenti'}: {e}")
+        return found
+
+    def resolve_principal(self, field, value):
+        """Restituisce (ID, nome) di un gruppo/utente indicato per nome o per ID numerico.
+
+        field è "protect_gids" o "protect_uids". Prima della ricerca la cache
+        account viene riletta per intero; il nome deve coincidere esattamente
+        (senza distinguere maiuscole e minuscole). ValueError se il gruppo/utente
+        non esiste o se più di uno ha lo stesso nome.
+        """
+        kind = "gruppo" if field == "protect_gids" else "utente"
+        if not self.account_cache_complete:
+            self.load_account_cache(full=True)
+        if not self.account_cache_complete:
+            raise ValueError(f"Cache account non disponibile: impossibile risolvere il {kind} '{value}'.")
+        
+        mapping = self.group_map if field == "protect_gids" else self.user_map
+        value = str(value).strip()
+        if value.isdigit():
+            if value not in mapping:
+                raise ValueError(f"Nessun {kind} trovato con ID: {value}")
+            return value, mapping[value]
+        
+        candidates = [(principal_id, name) for principal_id, name in mapping.items() if name.lower() == value.lower()]
+        if not candidates:
+            raise ValueError(f"Nessun {kind} trovato con nome: {value}")
+        if len(candidates) > 1:
+            names = ", ".join(f"{name} (ID: {principal_id})" for principal_id, name in candidates[:10])
+            raise ValueError(f"Più di un {kind} si chiama '{value}': {names}. Indica l'ID numerico.")
+        return candidates[0]
+
+    def load_account_cache(self, full=False):
+        """Sincronizza la cache account con un solo comando remoto.
+
+        Le cartelle gid/ e uid/ la cui mtime non è cambiata dall'ultima
+        sincronizzazione non vengono rilette; per le altre si rileggono solo
+        i file modificati (o tutti, alla prima sincronizzazione o a TTL scaduto).
+        Con full=True si rileggono sempre tutti i file e le mappature in
+        memoria diventano esattamente quelle presenti sul server.
+        """
+        state = self.principal_cache.get_state()
+        synced_at = state.get("synced_at")
+        
+        script = ['echo "@@NOW $(date +%s)"']
+        reread_all = {}
+        for kind in ("gid", "uid"):
+            folder = f"{ACCOUNT_CACHE_DIR}/{kind}"
+            reread_all[kind] = (
+                full
+                or synced_at is None
+                or kind not in state
+                or self.principal_cache.needs_full_reload(kind)
+            )
+            if reread_all[kind]:
+                reread = f"grep -r -H '^nss_name=' {folder}/ 2>/dev/null"
+            else:
+                # Rilegge solo i file modificati dall'ultima sincronizzazione (con margine)
+                reread = (f"find {folder} -type f -mmin -$(( ($(date +%s) - {int(synced_at)}) / 60 + 2 )) "
+                          f"-exec grep -H '^nss_name=' {{}} + 2>/dev/null")
+            old_mtime = "" if reread_all[kind] else state[kind]
+            script.append(
+                f'm=$(stat -c %Y {folder}); echo "@@MTIME {kind} $m"; '
+                f'if [ "$m" != "{old_mtime}" ]; then echo "@@IDS {kind}" $(ls {folder}); {reread}; fi'
+            )
+        
+        try:
+            result = self.run_ssh_command(f"sudo -S sh -c {shlex.quote('; '.join(script))}")
+        except Exception as e:
+            self.log_message(f"Errore nel caricamento della cache account: {e}")
+            return
+        
+        groups, users = parse_account_cache_dump(result)
+        changed = {"gid": groups, "uid": users}
+        for line in result.splitlines():
+            tag = line.find("@@")
+            if tag < 0:
+                continue
+            parts = line[tag:].split()
+            if parts[0] == "@@NOW" and len(parts) > 1:
+                state["synced_at"] = int(parts[1])
+            elif parts[0] == "@@MTIME" and len(parts) > 2:
+                state[parts[1]] = parts[2]
+            elif parts[0] == "@@IDS" and len(parts) > 1:
+                # Rimuove dalla cache gli account non più presenti sul server
+                self.principal_cache.retain(parts[1], set(parts[2:]))
+        
+        for kind, mapping in changed.items():
+            self.principal_cache.store(kind, mapping)
+        self.principal_cache.set_state(state)
+        self.principal_cache.evict()
+        
+        if full:
+            # Nessun nome rimasto in memoria da account rinominati o eliminati
+            self.group_map.clear()
+            self.user_map.clear()
+            self.missing_gids.clear()
+            self.missing_uids.clear()
+        self.group_map.update(self.principal_cache.load("gid"))
+        self.user_map.update(self.principal_cache.load("uid"))
+        # Quanto appena letto resta in memoria anche se la cache su disco ha eliminato delle voci (LRU)
+        self.group_map.update(groups)
+        self.user_map.update(users)
+        self.account_cache_loaded = True
+        self.account_cache_complete = self.account_cache_complete or full
+        self.log_message(f"Cache account sincronizzata: {len(groups)} gruppi e {len(users)} utenti aggiornati.")
+
+    def resolve_principals(self, gids, uids):
+        """Legge dal server i nomi dei GID/UID indicati (un comando ogni RESOLVE_FILES_PER_COMMAND file)."""
+        files = [f"{ACCOUNT_CACHE_DIR}/gid/{gid}" for gid in gids if str(gid).isdigit()]
+        files += [f"{ACCOUNT_CACHE_DIR}/uid/{uid}" for uid in uids if str(uid).isdigit()]
+        if not files:
+            return
+        
+        # Molti file: più comandi paralleli, ciascuno con una riga di comando di lunghezza contenuta
+        chunks = [files[i:i + RESOLVE_FILES_PER_COMMAND] for i in range(0, len(files), RESOLVE_FILES_PER_COMMAND)]
+        results = self.run_ssh_commands(
+            [f"sudo -S grep -H '^nss_name=' {' '.join(chunk)} 2>/dev/null" for chunk in chunks]
+        )
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            self.log_message(f"Errore nella ricerca nomi per GID {list(gids)} / UID {list(uids)}: {errors[0]}")
+            if len(errors) == len(results):
+                return
+        
+        groups, users = parse_account_cache_dump("\n".join(r for r in results if not isinstance(r, Exception)))
+        self.group_map.update(groups)
+        self.user_map.update(users)
+        self.principal_cache.store("gid", groups)
+        self.principal_cache.store("uid", users)
+        self.missing_gids.update(str(gid) for gid in gids if str(gid) not in groups)
+        self.missing_uids.update(str(uid) for uid in uids if str(uid) not in users)
+
+    def ensure_names_loaded(self, records):
+        """Risolve tutti i GID/UID dei record con al più due comandi remoti."""
+        if not self.account_cache_loaded:
+            self.load_account_cache()
+        
+        gids = {str(gid) for rec in records for gid in rec.gids}
+        uids = {str(uid) for rec in records for uid in rec.uids}
+        self.principal_cache.touch("gid", gids)
+        self.principal_cache.touch("uid", uids)
+        
+        unknown_gids = [gid for gid in gids if gid not in self.group_map and gid not in self.missing_gids]
+        unknown_uids = [uid for uid in uids if uid not in self.user_map and uid not in self.missing_uids]
+        if unknown_gids or unknown_uids:
+            self.resolve_principals(unknown_gids, unknown_uids)
+
+    def fetch_row_details(self, rowids):
+        """Legge owner, link pubblico e dati dei rowid indicati con una sola query e li mette in cache.
+
+        In modalità snapshot la query gira sulla copia locale di sharing.db.
+        """
+        if not rowids:
+            return {}
+        if self.snapshot is not None and self.snapshot.available():
+            details_by_rowid = {}
+            for rowid, owner_uid, data, public_url in self.snapshot.details(rowids):
+                try:
+                    details_by_rowid[rowid] = ShareRecord.from_json(
+                        rowid, data, owner_uid=str(owner_uid) if owner_uid is not None else None,
+                        public_url=public_url or None
+                    )
+                except ValueError:
+                    continue
+            self.row_details.store(details_by_rowid)
+            return details_by_rowid
+        
+        # Colonne note per nome, poi SELECT *: la seconda colonna della tabella è il link pubblico.
+        # Il JSON non contiene tabulazioni non codificate, quindi il TAB separa i campi in modo sicuro.
+        sql = (
+            '.separator "\\t"\n'
+            f"SELECT rowid, owner_uid, data, * FROM entry WHERE rowid IN ({','.join(str(int(rowid)) for rowid in rowids)});\n"
+        )
+        details_by_rowid = {}
+        for line in self.run_sqlite_query(sql):
+            parts = line.split("\t")
+            if len(parts) < 5 or not parts[0].isdigit():
+                continue
+            rowid = int(parts[0])
+            try:
+                details_by_rowid[rowid] = ShareRecord.from_json(
+                    rowid, parts[2], owner_uid=parts[1].strip() or None, public_url=parts[4].strip() or None
+                )
+            except ValueError:
+                continue
+        
+        self.row_details.store(details_by_rowid)
+        return details_by_rowid
+
+    def run_sqlite_query(self, sql, bail=False):
+        """Esegue uno script SQL su sharing.db e restituisce le righe di output.
+
+        Lo script viaggia sullo stdin di sqlite3 (senza PTY), quindi non passa
+        dalla shell remota e non richiede alcun escaping per la riga di comando.
+        Con bail=True sqlite3 si ferma al primo errore.
+        """
+        options = "-bail " if bail else ""
+        result = self.run_ssh_command(f"sudo -S sqlite3 {options}{SHARING_DB}", input_data=sql, get_pty=False)
+        return result.splitlines()
+
+    def fingerprint_sql(self):
+        """Espressione SQL dell'impronta dei record: digest sha3 se la shell sqlite3 del NAS lo offre.
+
+        Le versioni di sqlite3 senza sha3() usano l'impronta di riserva, più
+        voluminosa. La verifica si fa una sola volta per sessione.
+        """
+        if self._fingerprint_sql is None:
+            expected = hashlib.sha3_256(b"sslm").hexdigest().upper()
+            try:
+                supported = expected in self.run_sqlite_query("SELECT hex(sha3('sslm'));")
+            except Exception:
+                supported = False
+            self._fingerprint_sql = ENTRY_FINGERPRINT_SQL if supported else ENTRY_FINGERPRINT_FALLBACK_SQL
+        return self._fingerprint_sql
+
+    def stream_sqlite_query(self, sql):
+        """Come run_sqlite_query, ma restituisce le righe una alla volta mentre arrivano dal NAS.
+
+        Con transfer_compression = "gzip" l'output di sqlite3 viene compresso
+        sul NAS (gzip -1, veloce) e decompresso in arrivo: il JSON dei record
+        si riduce di diverse volte.
+        """
+        gzipped = self.transfer_compression == "gzip"
+        command = f"sudo -S sqlite3 {SHARING_DB}" + (" | gzip -1 -c" if gzipped else "")
+        stderr = []
+        count = 0
+        for line in self.ssh.stream_command(
+            command, input_data=self.password + "\n" + sql, stderr=stderr, gzipped=gzipped
+        ):
+            if line:
+                count += 1
+                yield line
+        
+        # Senza PTY il prompt di sudo arriva su stderr: non è un errore
+        error = b"".join(stderr).decode('utf-8', errors='replace')
+        error = "\n".join(line for line in map(strip_sudo_prompt, error.splitlines()) if line.strip())
+        if error and not count:
+            raise Exception(f"Errore SSH: {error}")
+
+    def search_entries_on_server(self, text, on_batch=None, batch_size=500):
+        """Filtra i record direttamente sul NAS: tornano solo le righe il cui percorso contiene il testo.
+
+        Le righe vengono lette man mano che arrivano; ogni batch_size record
+        on_batch(records) riceve il blocco già pronto, così la tabella si
+        riempie progressivamente. Restituisce il numero di record trovati.
+        Il confronto è quello di LIKE: maiuscole e minuscole coincidono solo
+        per le lettere ASCII ("É" non trova "é", la ricerca sul mirror sì).
+        """
+        pattern = sql_literal(f"%{escape_like(text)}%")
+        query = (
+            f"SELECT rowid, {self.fingerprint_sql()}, data FROM entry "
+            f"WHERE json_extract(data, '$.private_data.path') LIKE {pattern} ESCAPE '\\';"
+        )
+        found = 0
+        rows = []
+        
+        def flush():
+            # Le righe ricevute sono aggiornate: le riporta anche nel mirror
+            self.entry_mirror.apply(rows)
+            records = []
+            for rowid, _, data in rows:
+                try:
+                    rec = ShareRecord.from_json(rowid, data, keep_raw=False)
+                except ValueError:
+                    continue
+                records.append(rec)
+            del rows[:]
+            if records and on_batch:
+                on_batch(records)
+            return len(records)
+        
+        for row in iter_entry_rows(self.stream_sqlite_query(query)):
+            rows.append(row)
+            if len(rows) >= batch_size:
+                found += flush()
+        found += flush()
+        return found
+
+    def refresh_snapshot(self):
+        """Aggiorna la copia locale di sharing.db; restituisce False se sul NAS non è cambiato nulla.
+
+        Dimensione e data di modifica di sharing.db (e del suo WAL) fanno da
+        firma: se coincidono con quelle dell'ultima copia non si trasferisce
+        niente. Altrimenti sqlite3 .backup crea sul NAS una copia coerente,
+        che viene scaricata via SFTP e poi cancellata.
+        """
+        signature = " ".join(self.run_ssh_command(
+            f"sudo -S stat -c '%s %Y' {SHARING_DB} {SHARING_DB}-wal 2>/dev/null", get_pty=False
+        ).split())
+        if self.snapshot.available() and signature == self.entry_mirror.get_meta("snapshot_signature"):
+            return False
+        
+        script = (
+            f'f=$(mktemp /tmp/sslm-snapshot.XXXXXX) && sqlite3 {SHARING_DB} ".backup $f" '
+            f'&& chown {shlex.quote(self.username)} "$f" && echo "$f"'
+        )
+        remote_path = self.run_ssh_command(f"sudo -S sh -c {shlex.quote(script)}", get_pty=False).splitlines()[-1].strip()
+        local_path = self.snapshot.path + ".part"
+        try:
+            self.ssh.download(remote_path, local_path)
+        finally:
+            self.run_ssh_command(f"rm -f {shlex.quote(remote_path)}", get_pty=False)
+        
+        self.snapshot.replace(local_path)
+        self.entry_mirror.set_meta("snapshot_signature", signature)
+        self.log_message(f"Copia di sharing.db aggiornata ({os.path.getsize(self.snapshot.path)} byte).")
+        return True
+
+    def sync_mirror_from_snapshot(self):
+        """Allinea il mirror alla copia locale di sharing.db, senza query sul NAS."""
+        rows = self.snapshot.rows()
+        local = self.entry_mirror.fingerprints()
+        changed = [row for row in rows if local.get(row[0]) != row[1]]
+        present = {row[0] for row in rows}
+        deleted = [rowid for rowid in local if rowid not in present]
+        
+        self.entry_mirror.apply(changed, deleted)
+        self.row_details.invalidate([row[0] for row in changed] + deleted)
+        if changed or deleted:
+            self.log_message(f"Mirror sincronizzato: {len(changed)} record aggiornati, {len(deleted)} eliminati.")
+
+    def sync_entry_mirror(self, chunk_size=500, on_progress=None):
+        """Allinea il mirror locale alla tabella entry trasferendo solo le differenze.
+
+        Le righe scaricate vengono lette in streaming e salvate a blocchi di
+        chunk_size, così la memoria non cresce con la dimensione della tabella;
+        on_progress(scaricate, totale) segue l'avanzamento. In modalità
+        snapshot il confronto avviene sulla copia locale di sharing.db.
+        """
+        if self.snapshot is not None:
+            try:
+                if self.refresh_snapshot() or not self.entry_mirror.fingerprints():
+                    self.sync_mirror_from_snapshot()
+                return
+            except Exception as e:
+                self.log_message(f"Copia di sharing.db non disponibile, uso le query sul NAS: {e}")
+        
+        # 1) Elenco leggero rowid -> impronta
+        fingerprint_sql = self.fingerprint_sql()
+        remote = {}
+        for line in self.stream_sqlite_query(f"SELECT rowid, {fingerprint_sql} FROM entry;"):
+            rowid, _, fingerprint = line.partition("|")
+            if rowid.isdigit():
+                remote[int(rowid)] = fingerprint
+        
+        local = self.entry_mirror.fingerprints()
+        changed = [rowid for rowid, fingerprint in remote.items() if local.get(rowid) != fingerprint]
+        deleted = [rowid for rowid in local if rowid not in remote]
+        
+        # 2) Scarica solo le righe nuove o modificate (tutte, se il mirror è vuoto)
+        queries = []
+        if changed and not local:
+            queries.append(f"SELECT rowid, {fingerprint_sql}, data FROM entry;")
+        else:
+            for i in range(0, len(changed), chunk_size):
+                rowids = ",".join(str(rowid) for rowid in changed[i:i + chunk_size])
+                queries.append(f"SELECT rowid, {fingerprint_sql}, data FROM entry WHERE rowid IN ({rowids});")
+        
+        updated = 0
+        rows = []
+        for query in queries:
+            for row in iter_entry_rows(self.stream_sqlite_query(query)):
+                rows.append(row)
+                if len(rows) >= chunk_size:
+                    self.entry_mirror.apply(rows)
+                    self.row_details.invalidate([row[0] for row in rows])
+                    updated += len(rows)
+                    del rows[:]
+                    if on_progress:
+                        on_progress(updated, len(changed))
+        
+        self.entry_mirror.apply(rows, deleted)
+        self.row_details.invalidate([row[0] for row in rows] + deleted)
+        updated += len(rows)
+        if updated or deleted:
+            self.log_message(f"Mirror sincronizzato: {updated} record aggiornati, {len(deleted)} eliminati.")
+
+    def get_sharing_entries(self):
+        """Restituisce la lista di record dal DB sharing.db (tramite il mirror locale)."""
+        self.sync_entry_mirror()
+        return self.entry_mirror.all_records()
+
+    def apply_permission_batch(self, batch, failures=None):
+        """Applica un lotto di modifiche con un solo sqlite3 (una transazione) e verifica tutti i record.
+
+        Restituisce i record del lotto come risultano dopo la transazione. Se
+        failures è una lista, vi si aggiungono i rowid la cui verifica non è
+        riuscita (tutti, se la transazione è stata annullata).
+        """
+        rowids = batch.rowids()
+        preview = ", ".join(map(str, rowids[:10])) + (", ..." if len(rowids) > 10 else "")
+        self.log_message(f"[DEBUG] Eseguo {len(batch)} aggiornamenti in una transazione (rowid {preview})")
+        # I dettagli in cache di questi record non sono più validi, anche se la transazione fallisce
+        self.row_details.invalidate(rowids)
+        try:
+            # Con -bail il primo errore interrompe lo script e la transazione non viene confermata
+            lines = self.run_sqlite_query(batch.compile(fingerprint_sql=self.fingerprint_sql()), bail=True)
+        except Exception as e:
+            self.log_message(f"[ERRORE] Transazione annullata, nessuna modifica per rowid {preview}: {e}")
+            if failures is not None:
+                failures.extend(rowids)
+            return []
+        
+        # Verifica: una sola SELECT per tutti i record del lotto
+        rows = list(iter_entry_rows(lines))
+        data_by_rowid = {rowid: data for rowid, _, data in rows}
+        
+        for rowid, ok, message in batch.check(data_by_rowid):
+            self.log_message(message)
+            if not ok and failures is not None:
+                failures.append(rowid)
+        
+        # Le righe rilette aggiornano mirror e copia locale e tornano come record per la tabella
+        self.entry_mirror.apply(rows)
+        if self.snapshot is not None and self.snapshot.available():
+            self.snapshot.update(rows)
+        records = []
+        for rowid, _, data in rows:
+            try:
+                records.append(ShareRecord.from_json(rowid, data, keep_raw=False))
+            except ValueError:
+                continue
+        return records
+
+    def warm_up(self, on_status=None, on_progress=None):
+        """Prepara le cache prima della prima ricerca: connessione, cache account e mirror.
+
+        on_status(messaggio) segnala il passo in corso, on_progress(scaricate,
+        totale) l'avanzamento della sincronizzazione del mirror.
+        """
+        def status(message):
+            if on_status:
+                on_status(message)
+        
+        status("Connessione al NAS...")
+        self.ssh.get_transport()
+        status("Caricamento account...")
+        self.load_account_cache()
+        status("Sincronizzazione del mirror...")
+        self.sync_entry_mirror(on_progress=on_progress)
+
+    def search(self, text, server=False, sync=True, fuzzy=True):
+        """Restituisce i record il cui percorso contiene text, con i nomi di GID/UID già risolti.
+
+        Con server=True il filtro gira su sqlite3 nel NAS; altrimenti il
+        mirror viene sincronizzato (se sync) e filtrato localmente. Se non
+        c'è alcuna corrispondenza e fuzzy è True tornano i percorsi più simili.
+        """
+        if server:
+            records = []
+            self.search_entries_on_server(text, records.extend)
+        else:
+            if sync:
+                self.sync_entry_mirror()
+            records = self.entry_mirror.search(text)
+            if not records and fuzzy and len(text) >= 3:
+                records = self.entry_mirror.search(text, mode="fuzzy", limit=200)
+        self.ensure_names_loaded(records)
+        return records
+
+    def apply_batch(self, batch, title="", is_cancelled=None, on_progress=None, failures=None):
+        """Applica un PermissionBatch a lotti di batch_size record, una transazione per lotto.
+
+        is_cancelled() viene controllata prima di ogni lotto; on_progress(fatti,
+        totale) segue l'avanzamento; failures raccoglie i rowid non verificati
+        (vedi apply_permission_batch). Restituisce i record modificati, con i
+        nomi di GID/UID già risolti.
+        """
+        done = 0
+        updated = []
+        for chunk in batch.chunks(self.batch_size):
+            if is_cancelled is not None and is_cancelled():
+                self.log_message(f"[ANNULLATO] {title}: {len(batch) - done} record non modificati")
+                break
+            updated.extend(self.apply_permission_batch(chunk, failures))
+            done += len(chunk)
+            if on_progress:
+                on_progress(done, len(batch))
+        self.ensure_names_loaded(updated)
+        return updated
+
+    def public_link(self, record):
+        """Restituisce l'URL completo del link pubblico del record, o None."""
+        if record.public_url:
+            return f"{self.base_url}{record.public_url}"
+        return None
+
+    def reset_names(self):
+        """Svuota le mappature ID -> nome; alla prossima risoluzione la cache account si rilegge per intero.
+
+        Anche lo stato di sincronizzazione salvato viene azzerato: un gruppo
+        rinominato senza cambiare la mtime della cartella non resta vecchio.
+        """
+        self.principal_cache.set_state({})
+        self.group_map.clear()
+        self.user_map.clear()
+        self.missing_gids.clear()
+        self.missing_uids.clear()
+        self.account_cache_loaded = False
+        self.account_cache_complete = False
+
+    def close(self):
+        """Chiude la connessione SSH e i database locali."""
+        self.ssh_executor.shutdown(wait=False)
+        self.ssh.close()
+        self.principal_cache.close()
+        self.entry_mirror.close()
+        if self.snapshot is not None:
+            self.snapshot.close()
@@ -0,0 +1,239 @@
+"""Copie locali della tabella entry: il mirror con indice FTS e lo snapshot di sharing.db."""
+import os
+import sqlite3
+import threading
+
+from .records import ENTRY_FINGERPRINT_SQL, ShareRecord, fts_phrase, principal_array, register_sha3
+
+
+class EntryMirror:
+    """Copia locale (SQLite) della tabella entry di sharing.db.
+
+    Ogni riga conserva l'impronta calcolata sul NAS, così una sincronizzazione
+    trasferisce solo le righe nuove, modificate o eliminate. log(msg) riceve
+    gli errori di apertura.
+    """
+
+    def __init__(self, path, hostname, log=print):
+        self._lock = threading.Lock()
+        try:
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self._create_schema()
+        except sqlite3.Error as e:
+            log(f"Impossibile aprire il mirror {path}: {e}")
+            self.conn = sqlite3.connect(":memory:", check_same_thread=False)
+            self._create_schema()
+        
+        # Un mirror creato per un altro server non è valido
+        with self._lock, self.conn:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'mirror_host'").fetchone()
+            if not row or row[0] != hostname:
+                self.conn.execute("DELETE FROM entry_mirror")
+                if self.fts:
+                    self.conn.execute("DELETE FROM entry_fts")
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('mirror_host', ?)", (hostname,))
+
+    def _create_schema(self):
+        # lower() di SQLite gestisce solo l'ASCII: per nomi accentati si usa quello di Python
+        self.conn.create_function("py_lower", 1, str.lower, deterministic=True)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS entry_mirror ("
+                "rowid INTEGER PRIMARY KEY, fingerprint TEXT NOT NULL, "
+                "name TEXT NOT NULL, path TEXT NOT NULL, path_lower TEXT NOT NULL, "
+                "gids TEXT NOT NULL, uids TEXT NOT NULL, data TEXT NOT NULL)"
+            )
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        
+        # Indice trigrammi su nome e percorso (richiede FTS5 con tokenizer trigram, SQLite >= 3.34)
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'entry_fts'"
+        ).fetchone()
+        try:
+            with self.conn:
+                self.conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS entry_fts USING fts5(name, path, tokenize = 'trigram')"
+                )
+                if not exists:
+                    self.conn.execute("INSERT INTO entry_fts (rowid, name, path) SELECT rowid, name, path FROM entry_mirror")
+            self.fts = True
+        except sqlite3.Error:
+            self.fts = False
+
+    def get_meta(self, key):
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def fingerprints(self):
+        """Restituisce le impronte locali per rowid."""
+        with self._lock:
+            return dict(self.conn.execute("SELECT rowid, fingerprint FROM entry_mirror"))
+
+    def apply(self, rows, deleted_rowids=()):
+        """Inserisce/aggiorna le righe (rowid, impronta, data) ed elimina quelle rimosse."""
+        values = []
+        for rowid, fingerprint, data in rows:
+            try:
+                rec = ShareRecord.from_json(rowid, data, keep_raw=False)
+            except ValueError:
+                continue
+            # GID/UID salvati come testo "1,2,3": le ricerche non devono decodificare il JSON
+            values.append((
+                rowid, fingerprint, rec.name, rec.path, rec.path.lower(),
+                ",".join(map(str, rec.gids)), ",".join(map(str, rec.uids)), data
+            ))
+        
+        deleted = [(rowid,) for rowid in deleted_rowids]
+        with self._lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO entry_mirror VALUES (?, ?, ?, ?, ?, ?, ?, ?)", values)
+            self.conn.executemany("DELETE FROM entry_mirror WHERE rowid = ?", deleted)
+            if self.fts:
+                # Aggiornamento incrementale dell'indice: solo le righe toccate
+                self.conn.executemany("DELETE FROM entry_fts WHERE rowid = ?", [(v[0],) for v in values] + deleted)
+                self.conn.executemany(
+                    "INSERT INTO entry_fts (rowid, name, path) VALUES (?, ?, ?)",
+                    [(v[0], v[2], v[3]) for v in values]
+                )
+
+    # Colonne lette per costruire un ShareRecord (il JSON completo resta nel mirror)
+    RECORD_COLUMNS = "m.rowid, m.name, m.path, m.gids, m.uids"
+
+    def _to_records(self, rows):
+        return [
+            ShareRecord(rowid, name, path, principal_array(gids.split(",") if gids else ()),
+                        principal_array(uids.split(",") if uids else ()))
+            for rowid, name, path, gids, uids in rows
+        ]
+
+    def all_records(self):
+        with self._lock:
+            rows = self.conn.execute(f"SELECT {self.RECORD_COLUMNS} FROM entry_mirror m ORDER BY m.rowid").fetchall()
+        return self._to_records(rows)
+
+    def search(self, text, mode="substring", limit=None):
+        """Restituisce i record che corrispondono al testo, ordinati per rilevanza.
+
+        mode può essere "substring" (percorso che contiene il testo), "prefix"
+        (nome che inizia con il testo) o "fuzzy" (percorsi con almeno metà dei
+        trigrammi in comune, utile per errori di battitura). I nomi che iniziano
+        con il testo vengono prima, poi i nomi che lo contengono, poi il resto.
+        """
+        needle = text.lower()
+        if mode == "fuzzy":
+            return self._fuzzy_search(needle, limit or 200)
+        
+        rank = (
+            "CASE WHEN substr(py_lower(m.name), 1, length(:needle)) = :needle THEN 0 "
+            "WHEN instr(py_lower(m.name), :needle) > 0 THEN 1 ELSE 2 END"
+        )
+        params = {"needle": needle, "match": fts_phrase(needle), "limit": -1 if limit is None else limit}
+        if self.fts and len(needle) >= 3:
+            # Con il tokenizer trigram una frase equivale a una ricerca di sottostringa
+            column = "name" if mode == "prefix" else "path"
+            sql = (f"SELECT {self.RECORD_COLUMNS} FROM entry_fts f JOIN entry_mirror m ON m.rowid = f.rowid "
+                   f"WHERE f.{column} MATCH :match")
+            if mode == "prefix":
+                sql += " AND substr(py_lower(m.name), 1, length(:needle)) = :needle"
+        else:
+            # Testi di meno di 3 caratteri (o FTS5 assente): scansione lineare
+            where = ("substr(py_lower(m.name), 1, length(:needle)) = :needle" if mode == "prefix"
+                     else "instr(m.path_lower, :needle) > 0")
+            sql = f"SELECT {self.RECORD_COLUMNS} FROM entry_mirror m WHERE {where}"
+        sql += f" ORDER BY {rank}, m.rowid LIMIT :limit"
+        
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return self._to_records(rows)
+
+    def _fuzzy_search(self, needle, limit, candidates=2000):
+        """Ricerca approssimata: candidati dall'indice (bm25), poi punteggio sui trigrammi comuni."""
+        trigrams = {needle[i:i + 3] for i in range(len(needle) - 2)}
+        if not self.fts or not trigrams:
+            return self.search(needle, "substring", limit)
+        
+        match = " OR ".join(fts_phrase(trigram) for trigram in sorted(trigrams))
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT m.rowid, m.path_lower FROM entry_fts f JOIN entry_mirror m ON m.rowid = f.rowid "
+                "WHERE f.path MATCH ? ORDER BY bm25(entry_fts) LIMIT ?",
+                (match, candidates)
+            ).fetchall()
+        
+        scored = []
+        for rowid, path_lower in rows:
+            score = sum(1 for trigram in trigrams if trigram in path_lower) / len(trigrams)
+            if score >= 0.5:
+                scored.append((-score, len(path_lower), rowid))
+        best = [rowid for _, _, rowid in sorted(scored)[:limit]]
+        
+        with self._lock:
+            rows = {row[0]: row for row in self.conn.execute(
+                f"SELECT {self.RECORD_COLUMNS} FROM entry_mirror m WHERE m.rowid IN ({','.join('?' * len(best))})", best
+            )} if best else {}
+        return self._to_records([rows[rowid] for rowid in best if rowid in rows])
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class SharingSnapshot:
+    """Copia locale e coerente di sharing.db, letta con il modulo sqlite3.
+
+    La copia viene creata sul NAS con .backup e scaricata via SFTP; qui le
+    letture usano parametri con binding e non passano dalla rete.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = None
+        if os.path.exists(path):
+            self._open()
+
+    def _open(self):
+        # sha3() come nella shell sqlite3 del NAS, per calcolare la stessa impronta
+        self.conn = register_sha3(sqlite3.connect(self.path, check_same_thread=False))
+
+    def available(self):
+        return self.conn is not None
+
+    def replace(self, downloaded_path):
+        """Sostituisce la copia locale con il file appena scaricato."""
+        with self._lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+            os.replace(downloaded_path, self.path)
+            self._open()
+
+    def rows(self):
+        """Restituisce tutte le righe (rowid, impronta, data), con la stessa impronta calcolata sul NAS."""
+        with self._lock:
+            return self.conn.execute(f"SELECT rowid, {ENTRY_FINGERPRINT_SQL}, data FROM entry").fetchall()
+
+    def details(self, rowids):
+        """Righe (rowid, owner_uid, data, link pubblico) dei rowid indicati."""
+        placeholders = ",".join("?" * len(rowids))
+        with self._lock:
+            cursor = self.conn.execute(
+                f"SELECT rowid, owner_uid, data, * FROM entry WHERE rowid IN ({placeholders})", list(rowids)
+            )
+            # Come nella query remota, la seconda colonna della tabella è il link pubblico
+            return [(row[0], row[1], row[2], row[4]) for row in cursor]
+
+    def update(self, rows):
+        """Riporta nella copia le righe (rowid, impronta, data) appena modificate sul NAS."""
+        with self._lock, self.conn:
+            self.conn.executemany("UPDATE entry SET data = ? WHERE rowid = ?", [(data, rowid) for rowid, _, data in rows])
+
+    def close(self):
+        with self._lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
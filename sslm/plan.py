@@ -0,0 +1,200 @@
+"""Piani dichiarativi di permessi: un manifest CSV/JSON applicato come un'unica transazione.
+
+Ogni regola indica un pattern di percorso (glob, senza distinzione tra
+maiuscole e minuscole) e i gruppi/utenti da aggiungere o rimuovere. Le regole
+si applicano in ordine; il piano contiene solo i record il cui stato finale
+differisce da quello attuale.
+
+CSV: colonne pattern, add_groups, remove_groups, add_users, remove_users
+(più valori separati da ";"). JSON: una lista di oggetti con le stesse
+chiavi (liste o stringhe), oppure {"rules": [...]}.
+"""
+import csv
+import fnmatch
+import json
+import os
+
+from .batch import PermissionBatch
+
+# Colonne del manifest: (chiave, campo di sharing.db, azione)
+RULE_COLUMNS = (
+    ("add_groups", "protect_gids", "add"),
+    ("remove_groups", "protect_gids", "remove"),
+    ("add_users", "protect_uids", "add"),
+    ("remove_users", "protect_uids", "remove"),
+)
+
+FIELD_LABELS = {"protect_gids": "gruppo", "protect_uids": "utente"}
+
+
+class PlanRule:
+    """Una riga del manifest: pattern di percorso e principal da aggiungere/rimuovere (nomi o ID)."""
+
+    def __init__(self, pattern, add_groups=(), remove_groups=(), add_users=(), remove_users=()):
+        if not pattern:
+            raise ValueError("Regola senza pattern di percorso")
+        self.pattern = pattern
+        self.principals = {
+            "add_groups": list(add_groups), "remove_groups": list(remove_groups),
+            "add_users": list(add_users), "remove_users": list(remove_users),
+        }
+        # Pattern senza caratteri jolly: basta che il percorso lo contenga
+        glob = pattern if any(c in pattern for c in "*?[") else f"*{pattern}*"
+        self._glob = glob.lower()
+
+    def matches(self, path):
+        return fnmatch.fnmatchcase(path.lower(), self._glob)
+
+
+def _split_values(value):
+    """Accetta una lista o una stringa separata da ";" e restituisce i valori non vuoti."""
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        values = value
+    else:
+        values = str(value).split(";")
+    return [str(v).strip() for v in values if str(v).strip()]
+
+
+def _rule_from_mapping(mapping):
+    unknown = set(mapping) - {"pattern"} - {key for key, _, _ in RULE_COLUMNS}
+    if unknown:
+        raise ValueError(f"Colonne non riconosciute nel manifest: {', '.join(sorted(unknown))}")
+    return PlanRule(
+        (mapping.get("pattern") or "").strip(),
+        **{key: _split_values(mapping.get(key)) for key, _, _ in RULE_COLUMNS}
+    )
+
+
+def load_manifest(path):
+    """Legge le regole da un file .csv o .json; ValueError se il formato non è valido."""
+    if os.path.splitext(path)[1].lower() == ".json":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict) and "rules" in data:
+            data = data["rules"]
+        if not isinstance(data, list):
+            raise ValueError("Il manifest JSON deve essere una lista di regole o {\"rules\": [...]}")
+        return [_rule_from_mapping(item) for item in data]
+
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        return [_rule_from_mapping(row) for row in csv.DictReader(f) if any((v or "").strip() for v in row.values())]
+
+
+class PlanChange:
+    """Modifiche nette di un record: ID aggiunti e rimossi per campo."""
+
+    __slots__ = ("record", "added", "removed")
+
+    def __init__(self, record, added, removed):
+        self.record = record
+        self.added = added
+        self.removed = removed
+
+
+class PermissionPlan:
+    """Regole del manifest con i principal già risolti in ID numerici.
+
+    Ogni nome deve corrispondere esattamente a un solo gruppo/utente
+    (engine.resolve_principal); se anche uno solo non si risolve il piano
+    non viene creato e ValueError elenca tutti i nomi da correggere.
+    """
+
+    def __init__(self, rules, engine):
+        self.rules = rules
+        # (regola, [(campo, azione, ID, nome)])
+        self.resolved = []
+        errors = []
+        for rule in rules:
+            actions = []
+            for key, field, action in RULE_COLUMNS:
+                for value in rule.principals[key]:
+                    try:
+                        principal_id, name = engine.resolve_principal(field, value)
+                    except ValueError as e:
+                        errors.append(f"regola '{rule.pattern}': {e}")
+                        continue
+                    actions.append((field, action, int(principal_id), name))
+            self.resolved.append((rule, actions))
+        if errors:
+            raise ValueError("Principal non risolti nel manifest, nessuna modifica:\n" + "\n".join(errors))
+        self.names = {
+            (field, principal_id): name
+            for _, actions in self.resolved for field, _, principal_id, name in actions
+        }
+
+    def label(self, field, principal_id):
+        """Descrizione di un GID/UID del piano; ValueError se non viene dal manifest."""
+        try:
+            name = self.names[(field, principal_id)]
+        except KeyError:
+            raise ValueError(f"{FIELD_LABELS[field]} con ID {principal_id} non risolto nel piano")
+        return f"{FIELD_LABELS[field]} {name} (ID: {principal_id})"
+
+    def diff(self, records):
+        """Confronta le regole con i record attuali e restituisce i PlanChange necessari."""
+        changes = []
+        for rec in records:
+            current = {"protect_gids": list(rec.gids), "protect_uids": list(rec.uids)}
+            target = {field: list(ids) for field, ids in current.items()}
+            matched = False
+            for rule, actions in self.resolved:
+                if not rule.matches(rec.path):
+                    continue
+                matched = True
+                for field, action, principal_id, _ in actions:
+                    ids = target[field]
+                    if action == "add" and principal_id not in ids:
+                        ids.append(principal_id)
+                    elif action == "remove":
+                        target[field] = [i for i in ids if i != principal_id]
+            if not matched:
+                continue
+
+            added = {}
+            removed = {}
+            for field in current:
+                before, after = set(current[field]), set(target[field])
+                if after - before:
+                    added[field] = [i for i in target[field] if i not in before]
+                if before - after:
+                    removed[field] = sorted(before - after)
+            if added or removed:
+                changes.append(PlanChange(rec, added, removed))
+        return changes
+
+    def describe(self, change):
+        """Riga leggibile del diff di un record (per il dry-run)."""
+        parts = []
+        for sign, delta in (("+", change.added), ("-", change.removed)):
+            for field, ids in delta.items():
+                for principal_id in ids:
+                    parts.append(sign + self.label(field, principal_id))
+        return f"rowid={change.record.rowid} {change.record.path}: " + ", ".join(parts)
+
+    def build_batch(self, changes):
+        """Raggruppa le modifiche per principal: un UPDATE per ogni GID/UID aggiunto o rimosso."""
+        grouped = {}
+        for change in changes:
+            for action, delta in (("add", change.added), ("remove", change.removed)):
+                for field, ids in delta.items():
+                    for principal_id in ids:
+                        grouped.setdefault((action, field, principal_id), []).append(change.record.rowid)
+
+        batch = PermissionBatch()
+        for (action, field, principal_id), rowids in grouped.items():
+            label = self.label(field, principal_id)
+            if action == "add":
+                batch.add_principal(
+                    field, principal_id, rowids,
+                    lambda rowid, label=label: f"[SUCCESSO] Aggiornato rowid={rowid}, aggiunto {label}",
+                    lambda rowid: f"[ATTENZIONE] Aggiornamento potrebbe non essere avvenuto per rowid={rowid}"
+                )
+            else:
+                batch.remove_principals(
+                    field, [principal_id], rowids,
+                    lambda rowid, label=label: f"[SUCCESSO] Rimosso {label} da rowid={rowid}",
+                    lambda rowid: f"[ATTENZIONE] Rimozione potrebbe non essere avvenuta per rowid={rowid}"
+                )
+        return batch
@@ -0,0 +1,315 @@
+"""Record della tabella entry di sharing.db: decodifica, contenitori e cache."""
+import hashlib
+import json
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List, Optional, Union
+
+# Database dei link condivisi sul NAS
+SHARING_DB = "/usr/syno/etc/private/session/sharing/sharing.db"
+
+# Impronta compatta di una riga: lunghezza del JSON e inizio del suo digest SHA3-256
+# (funzione sha3() della shell sqlite3). Cambia con qualsiasi modifica del record,
+# anche per rinomine della stessa lunghezza, e non contiene mai "|".
+ENTRY_FINGERPRINT_SQL = "length(data) || ':' || substr(hex(sha3(data)), 1, 16)"
+
+# Impronta per le shell sqlite3 senza sha3(): permessi, nome e percorso in chiaro.
+# json_quote protegge i caratteri di controllo e "|" diventa \u007c, così l'impronta
+# non spezza le righe "rowid|impronta|data" di sqlite3.
+ENTRY_FINGERPRINT_FALLBACK_SQL = (
+    "replace(length(data) || ':' || ifnull(json_extract(data, '$.protect_gids'), '') "
+    "|| ':' || ifnull(json_extract(data, '$.protect_uids'), '') "
+    "|| ':' || json_quote(json_extract(data, '$.private_data.name')) "
+    "|| ':' || json_quote(json_extract(data, '$.private_data.path')), '|', '\\u007c')"
+)
+
+# Dimensione predefinita della cache dei dettagli dei record
+DETAILS_CACHE_SIZE = 1000
+
+
+def _sha3(value):
+    """sha3(X) della shell sqlite3 (SHA3-256) per i valori testo e blob."""
+    if value is None:
+        return None
+    if not isinstance(value, bytes):
+        value = str(value).encode("utf-8")
+    return hashlib.sha3_256(value).digest()
+
+
+def register_sha3(conn):
+    """Rende disponibile sha3() su una connessione sqlite3 locale, come nella shell del NAS."""
+    conn.create_function("sha3", 1, _sha3)
+    return conn
+
+
+def sql_literal(value):
+    """Restituisce value come letterale stringa SQL (apici raddoppiati)."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def escape_like(text):
+    """Protegge i caratteri speciali di LIKE; da usare con ESCAPE '\\'."""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def fts_phrase(text):
+    """Restituisce text come frase FTS5 tra virgolette (nessun operatore interpretato)."""
+    return '"' + text.replace('"', '""') + '"'
+
+
+def iter_entry_rows(lines):
+    """Converte le righe "rowid|impronta|data" di sqlite3 in tuple (rowid, impronta, data), una alla volta."""
+    for line in lines:
+        parts = line.split("|", 2)
+        if len(parts) == 3 and parts[0].isdigit():
+            yield int(parts[0]), parts[1], parts[2]
+
+
+def principal_array(values):
+    """Converte una lista di GID/UID (numeri o stringhe) in un array compatto di interi."""
+    ids = array("q")
+    for value in values or ():
+        try:
+            ids.append(int(value))
+        except (TypeError, ValueError):
+            continue
+    return ids
+
+
+def _entry_fields(data):
+    """Estrae (nome, percorso, GID, UID) da un dict già decodificato."""
+    if not isinstance(data, dict):
+        raise ValueError("Il campo data non è un oggetto JSON")
+    private_data = data.get("private_data") or {}
+    return (
+        private_data.get("name") or "", private_data.get("path") or "",
+        principal_array(data.get("protect_gids")), principal_array(data.get("protect_uids"))
+    )
+
+
+def decode_entry_json(raw):
+    """Decoder di riserva (modulo json della libreria standard)."""
+    return _entry_fields(json.loads(raw))
+
+
+# Decoder disponibili, dal più veloce; decode_entry usa il primo.
+# msgspec e orjson (opzionali) si importano solo al primo record decodificato.
+ENTRY_DECODERS = {}
+JSON_BACKEND = None
+_decoders_lock = threading.Lock()
+
+
+def load_entry_decoders():
+    """Prepara una sola volta i decoder disponibili e restituisce ENTRY_DECODERS."""
+    global JSON_BACKEND, decode_entry
+    with _decoders_lock:
+        if ENTRY_DECODERS:
+            return ENTRY_DECODERS
+        try:
+            import msgspec
+        except ImportError:
+            msgspec = None
+        try:
+            import orjson
+        except ImportError:
+            orjson = None
+        decoders = {}
+
+        if msgspec is not None:
+            # Schema tipizzato con i soli campi usati: msgspec salta tutto il resto del JSON senza costruirlo
+            class _PrivateData(msgspec.Struct):
+                name: Optional[str] = None
+                path: Optional[str] = None
+
+            class _EntryData(msgspec.Struct):
+                private_data: Optional[_PrivateData] = None
+                protect_gids: Optional[List[Union[int, str]]] = None
+                protect_uids: Optional[List[Union[int, str]]] = None
+
+            _entry_decoder = msgspec.json.Decoder(_EntryData)
+
+            def decode_entry_msgspec(raw):
+                try:
+                    entry = _entry_decoder.decode(raw)
+                except msgspec.DecodeError:
+                    # Tipi inattesi (es. GID come oggetti): decide il decoder standard
+                    return decode_entry_json(raw)
+                private_data = entry.private_data
+                return (
+                    (private_data and private_data.name) or "", (private_data and private_data.path) or "",
+                    principal_array(entry.protect_gids), principal_array(entry.protect_uids)
+                )
+
+            decoders["msgspec"] = decode_entry_msgspec
+
+        if orjson is not None:
+            def decode_entry_orjson(raw):
+                return _entry_fields(orjson.loads(raw))
+
+            decoders["orjson"] = decode_entry_orjson
+
+        decoders["json"] = decode_entry_json
+        ENTRY_DECODERS.update(decoders)
+        JSON_BACKEND, decode_entry = next(iter(ENTRY_DECODERS.items()))
+        return ENTRY_DECODERS
+
+
+def decode_entry(raw):
+    """Al primo utilizzo carica i decoder; da lì in poi decode_entry è il più veloce disponibile."""
+    load_entry_decoders()
+    return decode_entry(raw)
+
+
+class ShareRecord:
+    """Record compatto di un link condiviso, con i soli campi usati dalla UI.
+
+    GID/UID sono array di interi; il JSON originale, se conservato in raw,
+    viene decodificato solo quando si legge data.
+    """
+
+    __slots__ = ("rowid", "name", "path", "gids", "uids", "owner_uid", "public_url", "raw")
+
+    def __init__(self, rowid, name, path, gids=(), uids=(), owner_uid=None, public_url=None, raw=None):
+        self.rowid = rowid
+        self.name = name
+        self.path = path
+        self.gids = gids if isinstance(gids, array) else principal_array(gids)
+        self.uids = uids if isinstance(uids, array) else principal_array(uids)
+        self.owner_uid = owner_uid
+        self.public_url = public_url
+        self.raw = raw
+
+    @classmethod
+    def from_json(cls, rowid, raw, owner_uid=None, public_url=None, keep_raw=True):
+        """Crea il record dal campo data di sharing.db (ValueError se il JSON non è valido).
+
+        Vengono decodificati solo nome, percorso, GID e UID, con il decoder
+        più veloce disponibile (JSON_BACKEND).
+        """
+        name, path, gids, uids = decode_entry(raw)
+        return cls(rowid, name, path, gids, uids, owner_uid, public_url, raw if keep_raw else None)
+
+    @property
+    def data(self):
+        return json.loads(self.raw) if self.raw else {}
+
+    def principal_ids(self, field):
+        """GID (protect_gids) o UID (protect_uids) del record."""
+        return self.gids if field == "protect_gids" else self.uids
+
+
+class RecordStore:
+    """Record dei risultati indicizzati per rowid.
+
+    order contiene i rowid nell'ordine mostrato e index_of la sua inversa;
+    by_principal indicizza i rowid per GID (protect_gids) e UID
+    (protect_uids), così "quali link abilitano il gruppo X" costa O(k).
+    """
+
+    FIELDS = ("protect_gids", "protect_uids")
+
+    def __init__(self, records=()):
+        self.by_rowid = {}
+        self.order = []
+        self.by_principal = {field: {} for field in self.FIELDS}
+        for rec in records:
+            rowid = rec.rowid
+            if rowid not in self.by_rowid:
+                self.order.append(rowid)
+            self._put(rec)
+        self._reindex()
+
+    def __len__(self):
+        return len(self.order)
+
+    def __contains__(self, rowid):
+        return rowid in self.by_rowid
+
+    def _reindex(self):
+        self.index_of = {rowid: i for i, rowid in enumerate(self.order)}
+
+    def _put(self, rec):
+        rowid = rec.rowid
+        old = self.by_rowid.get(rowid)
+        if old is not None:
+            for field in self.FIELDS:
+                for principal_id in old.principal_ids(field):
+                    rowids = self.by_principal[field].get(str(principal_id))
+                    if rowids:
+                        rowids.discard(rowid)
+        self.by_rowid[rowid] = rec
+        for field in self.FIELDS:
+            for principal_id in rec.principal_ids(field):
+                self.by_principal[field].setdefault(str(principal_id), set()).add(rowid)
+
+    def get(self, rowid):
+        return self.by_rowid.get(rowid)
+
+    def at(self, index):
+        return self.by_rowid[self.order[index]]
+
+    def slice(self, start, end):
+        return [self.by_rowid[rowid] for rowid in self.order[start:end]]
+
+    def extend(self, records):
+        """Aggiunge in coda i record non ancora presenti."""
+        for rec in records:
+            if rec.rowid not in self.by_rowid:
+                self.index_of[rec.rowid] = len(self.order)
+                self.order.append(rec.rowid)
+                self._put(rec)
+
+    def update(self, rec):
+        """Sostituisce un record già presente; restituisce False se il rowid non c'è."""
+        if rec.rowid not in self.by_rowid:
+            return False
+        self._put(rec)
+        return True
+
+    def rowids_with(self, field, principal_id):
+        """Rowid dei record che contengono il GID/UID nel campo indicato."""
+        return self.by_principal[field].get(str(principal_id), set())
+
+    def sort(self, key, reverse=False):
+        """Riordina i rowid con key(record)."""
+        self.order.sort(key=lambda rowid: key(self.by_rowid[rowid]), reverse=reverse)
+        self._reindex()
+
+
+class RowDetailsCache:
+    """Cache in memoria dei ShareRecord completi (owner e link inclusi) per rowid, con rimozione LRU."""
+
+    def __init__(self, max_entries=DETAILS_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._details = OrderedDict()
+
+    def get(self, rowid):
+        with self._lock:
+            details = self._details.get(rowid)
+            if details is not None:
+                self._details.move_to_end(rowid)
+            return details
+
+    def missing(self, rowids):
+        """Restituisce i rowid non ancora in cache, nell'ordine dato."""
+        with self._lock:
+            return [rowid for rowid in rowids if rowid not in self._details]
+
+    def store(self, details_by_rowid):
+        with self._lock:
+            for rowid, details in details_by_rowid.items():
+                self._details[rowid] = details
+                self._details.move_to_end(rowid)
+            while len(self._details) > self.max_entries:
+                self._details.popitem(last=False)
+
+    def invalidate(self, rowids):
+        with self._lock:
+            for rowid in rowids:
+                self._details.pop(rowid, None)
+
+    def clear(self):
+        with self._lock:
+            self._details.clear()
@@ -0,0 +1,179 @@
+"""Esecuzione dei comandi sul NAS via SSH, un canale per comando."""
+import threading
+import zlib
+
+# paramiko (con cryptography, bcrypt e nacl) viene importato alla prima connessione
+paramiko = None
+
+
+def strip_sudo_prompt(line):
+    """Rimuove l'eventuale prompt di sudo finito all'inizio di una riga di output (PTY)."""
+    stripped = line.lstrip()
+    if stripped.startswith("Password:") or stripped.startswith("[sudo]"):
+        return stripped.split(": ", 1)[1] if ": " in stripped else ""
+    return line
+
+
+def load_paramiko():
+    """Importa paramiko al primo utilizzo e lo restituisce."""
+    global paramiko
+    if paramiko is None:
+        import paramiko as module
+        paramiko = module
+    return paramiko
+
+
+def iter_lines(chunks, gzipped=False):
+    """Ricompone in righe di testo i blocchi di byte di stdout (flusso gzip se gzipped)."""
+    # wbits=31: formato gzip (intestazione e CRC inclusi)
+    decompressor = zlib.decompressobj(wbits=31) if gzipped else None
+    pending = b""
+    for chunk in chunks:
+        if decompressor:
+            chunk = decompressor.decompress(chunk)
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line.rstrip(b"\r").decode('utf-8', errors='replace')
+    if decompressor:
+        pending += decompressor.flush()
+    for line in pending.split(b"\n") if pending else ():
+        yield line.rstrip(b"\r").decode('utf-8', errors='replace')
+
+
+class SSHConnectionManager:
+    """Mantiene una connessione SSH autenticata e la riusa aprendo un canale per comando."""
+
+    def __init__(self, hostname, port, username, password, keepalive=30, max_channels=4, timeout=15,
+                 compress=False, max_streams=2):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.keepalive = keepalive
+        self.timeout = timeout
+        # Compressione del trasporto SSH (zlib): utile su WAN, inutile in LAN
+        self.compress = compress
+        self._client = None
+        self._lock = threading.Lock()
+        # Limita il numero di canali aperti contemporaneamente sulla stessa connessione:
+        # al più max_channels comandi (e SFTP) più max_streams letture in streaming
+        self._channels = threading.BoundedSemaphore(max(1, int(max_channels)))
+        self._streams = threading.BoundedSemaphore(max(1, int(max_streams)))
+
+    def _connect(self):
+        """Apre una nuova connessione e la autentica (handshake completo)."""
+        load_paramiko()
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect(
+            self.hostname, self.port, self.username, self.password,
+            timeout=self.timeout, banner_timeout=self.timeout, auth_timeout=self.timeout,
+            compress=bool(self.compress)
+        )
+        transport = client.get_transport()
+        if self.keepalive:
+            transport.set_keepalive(int(self.keepalive))
+        self._client = client
+        return transport
+
+    def get_transport(self):
+        """Restituisce il Transport attivo, riconnettendosi se la connessione è caduta."""
+        with self._lock:
+            transport = self._client.get_transport() if self._client else None
+            if transport is None or not transport.is_active():
+                self._close_client()
+                transport = self._connect()
+            return transport
+
+    def _open_channel(self):
+        """Apre un canale di sessione; in caso di connessione caduta riprova una volta."""
+        load_paramiko()
+        transport = self.get_transport()
+        try:
+            return transport.open_session(timeout=self.timeout)
+        except (paramiko.SSHException, EOFError, OSError):
+            # Canale rifiutato su una connessione attiva (es. ChannelException): gli altri comandi continuano
+            if transport.is_active():
+                raise
+            # Il comando non è ancora stato inviato: get_transport() riconnette
+            return self.get_transport().open_session(timeout=self.timeout)
+
+    def exec_command(self, command, input_data=None, get_pty=True):
+        """Esegue un comando su un nuovo canale e restituisce (stdout, stderr) in byte."""
+        with self._channels:
+            channel = self._open_channel()
+            try:
+                if get_pty:
+                    channel.get_pty()
+                channel.exec_command(command)
+                if input_data:
+                    channel.sendall(input_data.encode('utf-8'))
+                if not get_pty:
+                    # Senza PTY si segnala la fine dell'input (es. script SQL via stdin)
+                    channel.shutdown_write()
+                stdout = channel.makefile('rb')
+                stderr = channel.makefile_stderr('rb')
+                result_bytes = stdout.read()
+                error_bytes = stderr.read()
+                channel.recv_exit_status()
+                return result_bytes, error_bytes
+            finally:
+                channel.close()
+
+    def stream_command(self, command, input_data=None, stderr=None, gzipped=False, chunk_size=65536):
+        """Esegue un comando senza PTY e restituisce le righe di stdout man mano che arrivano.
+
+        È un generatore: il canale resta aperto finché le righe non sono
+        state consumate (o il generatore viene chiuso). Gli stream hanno un
+        limite proprio (max_streams) e non occupano posti di max_channels,
+        così il chiamante può eseguire altri comandi durante la lettura anche
+        con ssh_max_channels = 1. Non va aperto un altro stream mentre si
+        consuma questo se max_streams = 1. Con gzipped=True stdout è un
+        flusso gzip, decompresso qui a blocchi. A fine lettura i byte di
+        stderr vengono aggiunti alla lista stderr, se indicata.
+        """
+        with self._streams:
+            channel = self._open_channel()
+            try:
+                channel.exec_command(command)
+                if input_data:
+                    channel.sendall(input_data.encode('utf-8'))
+                channel.shutdown_write()
+
+                yield from iter_lines(iter(lambda: channel.recv(chunk_size), b""), gzipped)
+
+                if stderr is not None:
+                    stderr.append(channel.makefile_stderr('rb').read())
+                channel.recv_exit_status()
+            finally:
+                channel.close()
+
+    def download(self, remote_path, local_path):
+        """Scarica un file via SFTP sulla connessione condivisa."""
+        load_paramiko()
+        with self._channels:
+            transport = self.get_transport()
+            try:
+                sftp = paramiko.SFTPClient.from_transport(transport)
+            except (paramiko.SSHException, EOFError, OSError):
+                if transport.is_active():
+                    raise
+                sftp = paramiko.SFTPClient.from_transport(self.get_transport())
+            try:
+                sftp.get(remote_path, local_path)
+            finally:
+                sftp.close()
+
+    def _close_client(self):
+        if self._client is not None:
+            try:
+                self._client.close()
+            except Exception:
+                pass
+            self._client = None
+
+    def close(self):
+        """Chiude la connessione persistente."""
+        with self._lock:
+            self._close_client()
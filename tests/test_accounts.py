@@ -0,0 +1,41 @@
+"""parse_account_cache_dump: mappature ID -> nome dall'output di grep su @accountcache."""
+import unittest
+
+from sslm.accounts import ACCOUNT_CACHE_DIR, parse_account_cache_dump
+
+
+class ParseAccountCacheDumpTest(unittest.TestCase):
+
+    def test_groups_and_users(self):
+        output = "\n".join([
+            f"{ACCOUNT_CACHE_DIR}/gid/100:nss_name=users",
+            f"{ACCOUNT_CACHE_DIR}/gid/65536:nss_name=DOMINIO\\Domain Users",
+            f"{ACCOUNT_CACHE_DIR}/uid/1026:nss_name=mario.rossi",
+            f"{ACCOUNT_CACHE_DIR}/uid/1000001:nss_name=DOMINIO\\anna\\bianchi",
+        ])
+        groups, users = parse_account_cache_dump(output)
+        self.assertEqual(groups, {"100": "users", "65536": "Domain Users"})
+        # Si toglie solo il dominio: il resto del nome resta invariato
+        self.assertEqual(users, {"1026": "mario.rossi", "1000001": "anna\\bianchi"})
+
+    def test_sudo_prompt_before_path(self):
+        output = (
+            f"[sudo] password for admin: {ACCOUNT_CACHE_DIR}/gid/101:nss_name=amministrazione\r\n"
+            f"Password: {ACCOUNT_CACHE_DIR}/uid/1027:nss_name=ospite \n"
+        )
+        groups, users = parse_account_cache_dump(output)
+        self.assertEqual(groups, {"101": "amministrazione"})
+        self.assertEqual(users, {"1027": "ospite"})
+
+    def test_ignores_other_lines(self):
+        output = "\n".join([
+            "grep: /usr/syno/etc/private/@accountcache/gid/x: Permission denied",
+            f"{ACCOUNT_CACHE_DIR}/gid/102:nss_type=local",
+            f"{ACCOUNT_CACHE_DIR}/other/5:nss_name=altro",
+            "",
+        ])
+        self.assertEqual(parse_account_cache_dump(output), ({}, {}))
+
+
+if __name__ == "__main__":
+    unittest.main()
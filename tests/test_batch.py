@@ -0,0 +1,105 @@
+"""PermissionBatch: script SQL generato da compile() e verifica con check()."""
+import json
+import sqlite3
+import unittest
+
+from sslm.batch import PermissionBatch
+from sslm.records import register_sha3
+
+
+def ok(rowid):
+    return f"ok {rowid}"
+
+
+def warn(rowid):
+    return f"warn {rowid}"
+
+
+class PermissionBatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = register_sha3(sqlite3.connect(":memory:"))
+        self.conn.execute("CREATE TABLE entry (id INTEGER PRIMARY KEY, hash TEXT, owner_uid INTEGER, data TEXT)")
+        self.insert(1, [100], ["1000"])
+        self.insert(2, [100, 101], [])
+        self.insert(3, None, None)
+        self.insert(4, ["101"], [1000, 1001])
+
+    def tearDown(self):
+        self.conn.close()
+
+    def insert(self, rowid, gids, uids):
+        data = {"private_data": {"name": f"f{rowid}", "path": f"/v/f{rowid}"}, "protect_gids": gids, "protect_uids": uids}
+        self.conn.execute("INSERT INTO entry VALUES (?, ?, 1000, ?)", (rowid, f"h{rowid}", json.dumps(data)))
+
+    def run_batch(self, batch):
+        """Esegue lo script come sqlite3 sul NAS (i comandi con il punto sono della shell di sqlite3)."""
+        statements = [line for line in batch.compile().splitlines() if not line.startswith(".")]
+        self.conn.executescript("\n".join(statements[:-1]))
+        rows = self.conn.execute(statements[-1]).fetchall()
+        return {rowid: data for rowid, _, data in rows}
+
+    def ids(self, rowid, field):
+        data = json.loads(self.conn.execute("SELECT data FROM entry WHERE rowid = ?", (rowid,)).fetchone()[0])
+        return [str(value) for value in data[field] or []]
+
+    def test_add(self):
+        batch = PermissionBatch()
+        batch.add_principal("protect_gids", 101, [1, 2, 3, 4], ok, warn)
+        results = batch.check(self.run_batch(batch))
+
+        self.assertEqual(self.ids(1, "protect_gids"), ["100", "101"])
+        self.assertEqual(self.ids(2, "protect_gids"), ["100", "101"])
+        self.assertEqual(self.ids(3, "protect_gids"), ["101"])
+        # Già presente come stringa: nessun duplicato
+        self.assertEqual(self.ids(4, "protect_gids"), ["101"])
+        self.assertEqual(results, [(rowid, True, ok(rowid)) for rowid in (1, 2, 3, 4)])
+
+    def test_remove(self):
+        batch = PermissionBatch()
+        batch.remove_principals("protect_uids", [1000], [1, 3, 4], ok, warn)
+        results = batch.check(self.run_batch(batch))
+
+        self.assertEqual(self.ids(1, "protect_uids"), [])
+        self.assertEqual(self.ids(4, "protect_uids"), ["1001"])
+        self.assertEqual(self.ids(2, "protect_gids"), ["100", "101"])
+        self.assertTrue(all(result[1] for result in results))
+
+    def test_clear(self):
+        batch = PermissionBatch()
+        batch.clear("protect_gids", [1, 2, 3], ok, warn)
+        results = batch.check(self.run_batch(batch))
+
+        self.assertEqual([self.ids(rowid, "protect_gids") for rowid in (1, 2, 3)], [[], [], []])
+        self.assertEqual(self.ids(4, "protect_gids"), ["101"])
+        self.assertTrue(all(result[1] for result in results))
+
+    def test_check_treats_null_as_empty(self):
+        data = {3: json.dumps({"protect_gids": None, "protect_uids": None})}
+        batch = PermissionBatch()
+        batch.add_principal("protect_gids", 100, [3], ok, warn)
+        batch.remove_principals("protect_uids", [1000], [3], ok, warn)
+        batch.clear("protect_gids", [3], ok, warn)
+        self.assertEqual([result[1:] for result in batch.check(data)],
+                         [(False, warn(3)), (True, ok(3)), (True, ok(3))])
+
+    def test_check_reports_missing_or_unchanged_rows(self):
+        batch = PermissionBatch()
+        batch.add_principal("protect_gids", 999, [1, 7], ok, warn)
+        data = {1: json.dumps({"protect_gids": [100]})}
+        self.assertEqual(batch.check(data), [(1, False, warn(1)), (7, False, warn(7))])
+
+    def test_chunks_split_by_record(self):
+        batch = PermissionBatch()
+        batch.add_principal("protect_gids", 101, [1, 2, 3], ok, warn)
+        batch.clear("protect_uids", [4, 5], ok, warn)
+        self.assertEqual([len(chunk) for chunk in batch.chunks(2)], [2, 2, 1])
+        self.assertEqual(batch.rowids(), [1, 2, 3, 4, 5])
+
+    def test_invalid_field(self):
+        with self.assertRaises(ValueError):
+            PermissionBatch().clear("owner_uid", [1], ok, warn)
+
+
+if __name__ == "__main__":
+    unittest.main()
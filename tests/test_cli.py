@@ -0,0 +1,139 @@
+"""Codici di uscita della riga di comando."""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from sslm.batch import PermissionBatch
+from sslm.cli import cmd_search, run_batch
+from sslm.engine import SharingEngine
+from sslm.records import ShareRecord, register_sha3
+
+
+class FakeEngine:
+    """apply_batch finto: aggiorna tutti i record e segnala come non verificati quelli in failed."""
+
+    def __init__(self, failed=()):
+        self.failed = list(failed)
+
+    def apply_batch(self, batch, title="", failures=None):
+        if failures is not None:
+            failures.extend(self.failed)
+        return [ShareRecord(rowid, "", "") for rowid in batch.rowids()]
+
+
+def grant(rowids):
+    batch = PermissionBatch()
+    batch.add_principal("protect_gids", 100, rowids, lambda rowid: "", lambda rowid: "")
+    return batch
+
+
+class RunBatchTest(unittest.TestCase):
+
+    def run_quietly(self, engine, batch, dry_run=False):
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            return run_batch(engine, batch, "Aggiunta permessi", dry_run)
+
+    def test_success(self):
+        self.assertEqual(self.run_quietly(FakeEngine(), grant([1, 2])), 0)
+
+    def test_verification_failure_is_an_error(self):
+        self.assertEqual(self.run_quietly(FakeEngine(failed=[2]), grant([1, 2])), 1)
+
+    def test_dry_run_and_empty_batch(self):
+        self.assertEqual(self.run_quietly(FakeEngine(failed=[1]), grant([1]), dry_run=True), 0)
+        self.assertEqual(self.run_quietly(FakeEngine(), PermissionBatch()), 0)
+
+
+
+class SqliteScriptExecutor:
+    """Esecutore finto: esegue gli script sqlite3 con il modulo sqlite3 e restituisce le righe come la shell."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    def exec_command(self, command, input_data=None, get_pty=True):
+        # Prima riga dello stdin: la password di sudo; i comandi con il punto sono della shell sqlite3
+        script = [line for line in input_data.split("\n")[1:] if line.strip() and not line.startswith(".")]
+        output = []
+        conn = register_sha3(sqlite3.connect(self.db_path, isolation_level=None))
+        try:
+            statement = ""
+            for line in script:
+                statement += line + "\n"
+                if sqlite3.complete_statement(statement):
+                    output += ["|".join(str(value) for value in row) for row in conn.execute(statement)]
+                    statement = ""
+        finally:
+            conn.close()
+        return "\n".join(output).encode("utf-8"), b""
+
+    def close(self):
+        pass
+
+
+class ApplyBatchExitCodeTest(unittest.TestCase):
+
+    def test_multi_operation_batch_over_several_chunks(self):
+        with tempfile.TemporaryDirectory() as folder:
+            db_path = os.path.join(folder, "sharing.db")
+            with sqlite3.connect(db_path) as conn:
+                conn.execute("CREATE TABLE entry (id INTEGER PRIMARY KEY, hash TEXT, owner_uid INTEGER, data TEXT)")
+                conn.executemany("INSERT INTO entry VALUES (?, '', 1000, ?)", [
+                    (rowid, json.dumps({"private_data": {"name": f"f{rowid}", "path": f"/v/f{rowid}"},
+                                        "protect_gids": [], "protect_uids": []}))
+                    for rowid in range(1, 31)
+                ])
+            config = {"hostname": "nas-test", "port": 22, "username": "admin", "password": "password",
+                      "BASE_URL": "https://nas.example/sharing/", "batch_size": 10}
+            engine = SharingEngine(config, data_dir=folder, log=lambda msg: None, ssh=SqliteScriptExecutor(db_path))
+            # I nomi sono già noti: nessuna lettura della cache account
+            engine.account_cache_loaded = True
+            engine.group_map["100"] = "gruppo"
+            engine.user_map["1000"] = "utente"
+            try:
+                # Un gruppo e un utente su 30 record: 60 operazioni, 6 lotti, ogni rowid in due lotti
+                batch = grant(range(1, 31))
+                batch.add_principal("protect_uids", 1000, range(1, 31), lambda rowid: "", lambda rowid: "")
+                output = io.StringIO()
+                with contextlib.redirect_stdout(output):
+                    self.assertEqual(run_batch(engine, batch, "Aggiunta permessi", False), 0)
+                self.assertIn("30 record aggiornati su 30", output.getvalue())
+            finally:
+                engine.close()
+
+
+
+class SearchEngine:
+    """search finto: nessuna corrispondenza vera, un percorso simile nel mirror."""
+
+    def __init__(self):
+        self.calls = []
+        self.entry_mirror = self
+
+    def search(self, text, server=False, sync=True, fuzzy=True, mode=None, limit=None):
+        self.calls.append((text, fuzzy, mode))
+        if mode == "fuzzy" or fuzzy:
+            return [ShareRecord(1, "documento_1.pdf", "/v/documento_1.pdf")]
+        return []
+
+
+class SearchCommandTest(unittest.TestCase):
+
+    def test_similar_paths_are_only_suggestions(self):
+        engine = SearchEngine()
+        args = argparse.Namespace(text="documentx_1", server=False, no_sync=False, format="tsv")
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            self.assertEqual(cmd_search(engine, args), 1)
+        self.assertEqual(engine.calls[0], ("documentx_1", False, None))
+        self.assertNotIn("documento_1", stdout.getvalue())
+        self.assertIn("/v/documento_1.pdf", stderr.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+"""Risoluzione dei nomi di gruppi e utenti in SharingEngine."""
+import shlex
+import tempfile
+import unittest
+
+from sslm.accounts import ACCOUNT_CACHE_DIR
+from sslm.engine import SharingEngine
+
+
+class AccountCacheExecutor:
+    """Esecutore finto: risponde ai comandi sulla cache account con il contenuto di accounts."""
+
+    def __init__(self, accounts, cache_readable=True):
+        # {"gid": {ID: nss_name}, "uid": {ID: nss_name}}
+        self.accounts = accounts
+        self.cache_readable = cache_readable
+        # mtime delle cartelle gid/ e uid/: se non cambia, la sincronizzazione incrementale non rilegge nulla
+        self.mtime = 1
+        self.commands = []
+
+    def exec_command(self, command, input_data=None, get_pty=True):
+        self.commands.append(command)
+        lines = []
+        if "@@NOW" in command and not self.cache_readable:
+            return b"", b"sh: permesso negato"
+        if "@@NOW" in command:
+            lines.append("@@NOW 1700000000")
+            for kind, mapping in self.accounts.items():
+                lines.append(f"@@MTIME {kind} {self.mtime}")
+                if f'echo "@@MTIME {kind} $m"; if [ "$m" != "{self.mtime}" ]' in command:
+                    continue
+                lines.append(f"@@IDS {kind} " + " ".join(mapping))
+                lines += [f"{ACCOUNT_CACHE_DIR}/{kind}/{principal_id}:nss_name={name}"
+                          for principal_id, name in mapping.items()]
+        elif " grep " in command and " -F " in command:
+            # grep -r -i -F -e TESTO CARTELLA: stringa fissa, senza distinguere maiuscole e minuscole
+            args = shlex.split(command)
+            text, folder = args[args.index("-e") + 1], args[args.index("-e") + 2]
+            kind = folder.rstrip("/").rsplit("/", 1)[1]
+            lines += [f"{folder}{principal_id}:nss_name={name}"
+                      for principal_id, name in self.accounts[kind].items() if text.lower() in name.lower()]
+        return "\n".join(lines).encode("utf-8"), b""
+
+    def close(self):
+        pass
+
+
+class ResolvePrincipalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.ssh = AccountCacheExecutor({
+            "gid": {"100": "DOMINIO\\gruppo5", "101": "DOMINIO\\gruppo50", "102": "Contabilità",
+                    "103": "ALTRO\\doppio", "104": "DOMINIO\\doppio"},
+            "uid": {"1000": "DOMINIO\\mario.rossi"},
+        })
+        config = {"hostname": "nas-test", "port": 22, "username": "admin", "password": "password",
+                  "BASE_URL": "https://nas.example/sharing/"}
+        self.engine = SharingEngine(config, data_dir=self.folder.name, log=lambda msg: None, ssh=self.ssh)
+
+    def tearDown(self):
+        self.engine.close()
+        self.folder.cleanup()
+
+    def test_partial_map_does_not_win_over_exact_name(self):
+        # Mappa caricata solo in parte: contiene gruppo50 ma non gruppo5
+        self.engine.group_map["101"] = "gruppo50"
+        self.assertEqual(self.engine.resolve_principal("protect_gids", "gruppo5"), ("100", "gruppo5"))
+
+    def test_exact_match_ignores_case(self):
+        self.assertEqual(self.engine.resolve_principal("protect_gids", "GRUPPO50"), ("101", "gruppo50"))
+        self.assertEqual(self.engine.resolve_principal("protect_uids", "Mario.Rossi"), ("1000", "mario.rossi"))
+
+    def test_substring_is_not_enough(self):
+        with self.assertRaises(ValueError):
+            self.engine.resolve_principal("protect_gids", "gruppo")
+
+    def test_ambiguous_name_fails(self):
+        with self.assertRaises(ValueError):
+            self.engine.resolve_principal("protect_gids", "doppio")
+
+    def test_numeric_id_must_exist(self):
+        self.assertEqual(self.engine.resolve_principal("protect_gids", "102"), ("102", "Contabilità"))
+        with self.assertRaises(ValueError):
+            self.engine.resolve_principal("protect_gids", "999")
+
+    def test_stale_names_are_dropped_by_full_reload(self):
+        self.engine.group_map["555"] = "gruppo5"
+        self.assertEqual(self.engine.resolve_principal("protect_gids", "gruppo5"), ("100", "gruppo5"))
+
+    def test_name_search_never_reaches_the_shell(self):
+        found = self.engine.find_groups_by_name("x\"; $(touch /tmp/pwned) '")
+        self.assertEqual(found, [])
+        self.assertFalse(any("pwned" in command for command in self.ssh.commands))
+        self.assertEqual(sorted(self.engine.find_groups_by_name("GRUPPO5")), [("100", "gruppo5"), ("101", "gruppo50")])
+
+    def test_server_search_without_account_cache(self):
+        self.ssh.cache_readable = False
+        found = self.engine.find_groups_by_name("Gruppo5")
+        self.assertEqual(sorted(found), [("100", "gruppo5"), ("101", "gruppo50")])
+        # Una sola grep: ID e nome arrivano dalla stessa riga, senza leggere i file uno per uno
+        self.assertEqual([command for command in self.ssh.commands if "@@NOW" not in command],
+                         [f"sudo -S grep -r -i -F -e Gruppo5 {ACCOUNT_CACHE_DIR}/gid/ 2>/dev/null"])
+
+    def test_unreadable_account_cache_blocks_resolution(self):
+        self.ssh.cache_readable = False
+        with self.assertRaises(ValueError):
+            self.engine.resolve_principal("protect_gids", "gruppo5")
+
+
+class ResetNamesTest(unittest.TestCase):
+
+    def test_reset_rereads_renamed_group(self):
+        with tempfile.TemporaryDirectory() as folder:
+            ssh = AccountCacheExecutor({"gid": {"100": "vecchio"}, "uid": {}})
+            config = {"hostname": "nas-test", "port": 22, "username": "admin", "password": "password",
+                      "BASE_URL": "https://nas.example/sharing/"}
+            engine = SharingEngine(config, data_dir=folder, log=lambda msg: None, ssh=ssh)
+            try:
+                engine.load_account_cache()
+                self.assertEqual(engine.find_group_name_by_gid("100"), "vecchio")
+
+                # Rinominato sul NAS senza che la mtime della cartella cambi
+                ssh.accounts["gid"]["100"] = "nuovo"
+                engine.load_account_cache()
+                self.assertEqual(engine.find_group_name_by_gid("100"), "vecchio")
+
+                engine.reset_names()
+                engine.ensure_names_loaded([])
+                self.assertEqual(engine.find_group_name_by_gid("100"), "nuovo")
+            finally:
+                engine.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
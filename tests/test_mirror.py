@@ -0,0 +1,150 @@
+"""Sincronizzazione incrementale del mirror locale della tabella entry."""
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from sslm.accounts import PrincipalCache
+from sslm.engine import SharingEngine
+from sslm.mirror import EntryMirror
+from sslm.records import ENTRY_FINGERPRINT_FALLBACK_SQL, ENTRY_FINGERPRINT_SQL, register_sha3
+
+
+class SqliteExecutor:
+    """Esecutore finto: gira le query di sharing.db con il modulo sqlite3 su un file locale.
+
+    Con sha3=False simula una shell sqlite3 senza la funzione sha3().
+    """
+
+    def __init__(self, db_path, sha3=True):
+        self.db_path = db_path
+        self.sha3 = sha3
+        self.queries = []
+
+    def stream_command(self, command, input_data=None, stderr=None, gzipped=False):
+        # Prima riga dello stdin: la password di sudo
+        sql = input_data.split("\n", 1)[1].strip().rstrip(";")
+        self.queries.append(sql)
+        conn = sqlite3.connect(self.db_path)
+        if self.sha3:
+            register_sha3(conn)
+        try:
+            for row in conn.execute(sql):
+                yield "|".join("" if value is None else str(value) for value in row)
+        except sqlite3.OperationalError as e:
+            stderr.append(f"Error: {e}".encode("utf-8"))
+        finally:
+            conn.close()
+
+    def exec_command(self, command, input_data=None, get_pty=True):
+        stderr = []
+        stdout = "\n".join(self.stream_command(command, input_data, stderr))
+        return stdout.encode("utf-8"), b"".join(stderr)
+
+    def close(self):
+        pass
+
+
+def entry_data(name, folder="/volume1/condivisa"):
+    return json.dumps({
+        "private_data": {"name": name, "path": f"{folder}/{name}"},
+        "protect_gids": [100],
+        "protect_uids": None,
+    })
+
+
+class EntryMirrorSyncTest(unittest.TestCase):
+    sha3 = True
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.folder.name, "sharing.db")
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("CREATE TABLE entry (id INTEGER PRIMARY KEY, hash TEXT, owner_uid INTEGER, data TEXT)")
+            conn.executemany(
+                "INSERT INTO entry VALUES (?, ?, 1000, ?)",
+                [(rowid, f"h{rowid}", entry_data(f"documento_{rowid}.pdf")) for rowid in range(1, 11)]
+            )
+        config = {
+            "hostname": "nas-test", "port": 22, "username": "admin", "password": "password",
+            "BASE_URL": "https://nas.example/sharing/", "transfer_compression": "none",
+        }
+        self.engine = SharingEngine(config, data_dir=self.folder.name, log=lambda msg: None,
+                                    ssh=SqliteExecutor(self.db_path, sha3=self.sha3))
+
+    def tearDown(self):
+        self.engine.close()
+        self.folder.cleanup()
+
+    def rename(self, rowid, name):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("UPDATE entry SET data = ? WHERE rowid = ?", (entry_data(name), rowid))
+
+    def test_same_length_rename_is_synced(self):
+        self.engine.sync_entry_mirror()
+        self.assertEqual([rec.rowid for rec in self.engine.entry_mirror.search("documento_7.pdf")], [7])
+
+        # Stessa lunghezza del JSON e stessi permessi: cambia solo il nome
+        self.rename(7, "documento_X.pdf")
+        self.engine.sync_entry_mirror()
+
+        self.assertEqual(self.engine.entry_mirror.search("documento_7.pdf"), [])
+        renamed = self.engine.entry_mirror.search("documento_X.pdf")
+        self.assertEqual([(rec.rowid, rec.path) for rec in renamed], [(7, "/volume1/condivisa/documento_X.pdf")])
+
+    def test_pipe_in_path_keeps_rows_parseable(self):
+        self.rename(3, "a|b.pdf")
+        self.engine.sync_entry_mirror()
+        self.assertEqual([rec.path for rec in self.engine.entry_mirror.search("a|b")], ["/volume1/condivisa/a|b.pdf"])
+
+        # Nessuna modifica: la seconda sincronizzazione non riscarica la riga
+        fingerprints = self.engine.entry_mirror.fingerprints()
+        self.engine.sync_entry_mirror()
+        self.assertEqual(self.engine.entry_mirror.fingerprints(), fingerprints)
+
+    def test_fingerprint_expression(self):
+        self.engine.sync_entry_mirror()
+        self.assertEqual(self.engine.fingerprint_sql(), ENTRY_FINGERPRINT_SQL)
+        # Nessun nome o percorso nell'elenco delle impronte
+        fingerprint = self.engine.entry_mirror.fingerprints()[1]
+        self.assertRegex(fingerprint, r"^\d+:[0-9A-F]{16}$")
+
+
+class FallbackFingerprintSyncTest(EntryMirrorSyncTest):
+    """Stessi controlli con una shell sqlite3 senza sha3(): si usa l'impronta di riserva."""
+    sha3 = False
+
+    def test_fingerprint_expression(self):
+        self.engine.sync_entry_mirror()
+        self.assertEqual(self.engine.fingerprint_sql(), ENTRY_FINGERPRINT_FALLBACK_SQL)
+        self.assertIn("documento_1.pdf", self.engine.entry_mirror.fingerprints()[1])
+
+
+
+class SharedCacheFileTest(unittest.TestCase):
+    """Mirror e cache dei nomi nello stesso file: ognuno ha i propri metadati."""
+
+    def test_principal_cache_reset_keeps_mirror_meta(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "cache.db")
+            mirror = EntryMirror(path, "nas-a")
+            mirror.set_meta("snapshot_signature", "123 456")
+            # Una cache dei nomi di un altro server si azzera senza toccare il mirror
+            PrincipalCache(path, "nas-b").close()
+            self.assertEqual(mirror.get_meta("mirror_host"), "nas-a")
+            self.assertEqual(mirror.get_meta("snapshot_signature"), "123 456")
+            mirror.close()
+
+    def test_open_errors_go_to_log(self):
+        messages = []
+        with tempfile.TemporaryDirectory() as folder:
+            # Una cartella non è un database: si ripiega sulla memoria e si segnala nel log
+            EntryMirror(folder, "nas-a", log=messages.append).close()
+            PrincipalCache(folder, "nas-a", log=messages.append).close()
+        self.assertEqual(len(messages), 2)
+        self.assertTrue(all(msg.startswith("Impossibile aprire") for msg in messages))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,191 @@
+"""Piani di permessi: lettura del manifest, risoluzione dei nomi e diff."""
+import json
+import os
+import tempfile
+import unittest
+
+from sslm.plan import PermissionPlan, PlanRule, load_manifest
+from sslm.records import ShareRecord
+
+
+class FakeEngine:
+    """Risolve i nomi come SharingEngine.resolve_principal, da un elenco fisso (nome esatto o ID)."""
+
+    def __init__(self, groups=None, users=None):
+        self.principals = {"protect_gids": groups or {}, "protect_uids": users or {}}
+
+    def resolve_principal(self, field, value):
+        mapping = self.principals[field]
+        value = str(value).strip()
+        if value.isdigit():
+            if value not in mapping:
+                raise ValueError(f"Nessun ID: {value}")
+            return value, mapping[value]
+        candidates = [(principal_id, name) for principal_id, name in mapping.items() if name.lower() == value.lower()]
+        if len(candidates) != 1:
+            raise ValueError(f"Nome non univoco o assente: {value}")
+        return candidates[0]
+
+
+ENGINE = FakeEngine(
+    groups={"100": "gruppo5", "101": "gruppo50", "102": "doppio", "103": "doppio"},
+    users={"1000": "mario"},
+)
+
+
+class PlanResolutionTest(unittest.TestCase):
+
+    def test_all_unresolved_names_are_reported(self):
+        rules = [
+            PlanRule("/volume1/a/*", add_groups=["gruppo5", "gruppo"]),
+            PlanRule("progetto", remove_groups=["doppio"], add_users=["mario"]),
+        ]
+        with self.assertRaises(ValueError) as ctx:
+            PermissionPlan(rules, ENGINE)
+        message = str(ctx.exception)
+        self.assertIn("gruppo", message)
+        self.assertIn("doppio", message)
+        self.assertNotIn("mario", message)
+
+    def test_names_resolve_exactly(self):
+        plan = PermissionPlan([PlanRule("*", add_groups=["GRUPPO5"])], ENGINE)
+        self.assertEqual(plan.names, {("protect_gids", 100): "gruppo5"})
+
+
+def applied(records, changes):
+    """Record come risultano dopo le modifiche del diff."""
+    by_rowid = {change.record.rowid: change for change in changes}
+    result = []
+    for rec in records:
+        change = by_rowid.get(rec.rowid)
+        if change is None:
+            result.append(rec)
+            continue
+        ids = {}
+        for field in ("protect_gids", "protect_uids"):
+            removed = set(change.removed.get(field, ()))
+            ids[field] = [i for i in rec.principal_ids(field) if i not in removed] + change.added.get(field, [])
+        result.append(ShareRecord(rec.rowid, rec.name, rec.path, ids["protect_gids"], ids["protect_uids"]))
+    return result
+
+
+class PlanRuleTest(unittest.TestCase):
+
+    def test_glob_is_anchored_to_the_whole_path(self):
+        rule = PlanRule("/volume1/condivisa/*.pdf")
+        self.assertTrue(rule.matches("/volume1/condivisa/a.pdf"))
+        self.assertTrue(rule.matches("/VOLUME1/Condivisa/sotto/b.PDF"))
+        self.assertFalse(rule.matches("/volume2/volume1/condivisa/a.pdf"))
+        self.assertFalse(rule.matches("/volume1/condivisa/a.pdf.bak"))
+
+    def test_pattern_without_wildcards_is_a_substring(self):
+        rule = PlanRule("Progetto1/")
+        self.assertTrue(rule.matches("/volume1/progetto1/a.pdf"))
+        self.assertTrue(rule.matches("/volume1/x/PROGETTO1/"))
+        self.assertFalse(rule.matches("/volume1/progetto10/a.pdf"))
+
+    def test_question_mark_and_brackets_are_globs(self):
+        self.assertTrue(PlanRule("*/progetto?/*").matches("/v/progetto7/a"))
+        self.assertFalse(PlanRule("*/progetto?/*").matches("/v/progetto10/a"))
+        self.assertTrue(PlanRule("*/reparto[12]/*").matches("/v/reparto2/a"))
+        self.assertFalse(PlanRule("*/reparto[12]/*").matches("/v/reparto3/a"))
+
+    def test_empty_pattern_is_rejected(self):
+        with self.assertRaises(ValueError):
+            PlanRule("")
+
+
+class LoadManifestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.folder.name, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_csv(self):
+        path = self.write("piano.csv", (
+            "\ufeffpattern,add_groups,remove_groups,add_users,remove_users\n"
+            "/volume1/a/*,gruppo5; 101 ,,mario,\n"
+            ",,,,\n"
+            "progetto,,doppio,,\n"
+        ))
+        rules = load_manifest(path)
+        self.assertEqual([rule.pattern for rule in rules], ["/volume1/a/*", "progetto"])
+        self.assertEqual(rules[0].principals["add_groups"], ["gruppo5", "101"])
+        self.assertEqual(rules[0].principals["add_users"], ["mario"])
+        self.assertEqual(rules[1].principals["remove_groups"], ["doppio"])
+
+    def test_json_list_and_rules_object(self):
+        rules = [{"pattern": "*.pdf", "add_groups": ["gruppo5"], "remove_users": "mario;1000"}]
+        for data in (rules, {"rules": rules}):
+            loaded = load_manifest(self.write("piano.json", json.dumps(data)))
+            self.assertEqual(len(loaded), 1)
+            self.assertEqual(loaded[0].principals["add_groups"], ["gruppo5"])
+            self.assertEqual(loaded[0].principals["remove_users"], ["mario", "1000"])
+
+    def test_unknown_column_is_rejected(self):
+        with self.assertRaises(ValueError):
+            load_manifest(self.write("piano.json", json.dumps([{"pattern": "*", "add_group": "x"}])))
+        with self.assertRaises(ValueError):
+            load_manifest(self.write("piano.json", json.dumps({"pattern": "*"})))
+
+
+class PlanDiffTest(unittest.TestCase):
+
+    def setUp(self):
+        self.records = [
+            ShareRecord(1, "a.pdf", "/volume1/a/a.pdf", gids=[101], uids=[]),
+            ShareRecord(2, "b.pdf", "/volume1/a/sotto/b.pdf", gids=[100], uids=["1000"]),
+            ShareRecord(3, "c.pdf", "/volume1/b/progetto/c.pdf", gids=[102], uids=[]),
+            ShareRecord(4, "d.pdf", "/volume1/b/d.pdf", gids=[], uids=[]),
+        ]
+
+    def test_diff_contains_only_net_changes(self):
+        plan = PermissionPlan([
+            PlanRule("/volume1/a/*", add_groups=["gruppo5"], remove_groups=["gruppo50"]),
+            PlanRule("progetto", add_users=["mario"]),
+        ], ENGINE)
+        changes = {change.record.rowid: change for change in plan.diff(self.records)}
+
+        self.assertEqual(sorted(changes), [1, 3])
+        self.assertEqual(changes[1].added, {"protect_gids": [100]})
+        self.assertEqual(changes[1].removed, {"protect_gids": [101]})
+        self.assertEqual(changes[3].added, {"protect_uids": [1000]})
+        self.assertEqual(changes[3].removed, {})
+        self.assertEqual(
+            plan.describe(changes[1]),
+            "rowid=1 /volume1/a/a.pdf: +gruppo gruppo5 (ID: 100), -gruppo gruppo50 (ID: 101)"
+        )
+
+    def test_later_rules_win(self):
+        plan = PermissionPlan([
+            PlanRule("*", add_groups=["gruppo5"]),
+            PlanRule("*/b/*", remove_groups=["gruppo5"]),
+        ], ENGINE)
+        self.assertEqual(sorted(change.record.rowid for change in plan.diff(self.records)), [1])
+
+    def test_rediff_after_apply_is_empty(self):
+        plan = PermissionPlan([
+            PlanRule("*.pdf", add_groups=["gruppo5", "101"], remove_users=["mario"]),
+            PlanRule("progetto", remove_groups=["102"]),
+        ], ENGINE)
+        changes = plan.diff(self.records)
+        self.assertTrue(changes)
+        self.assertEqual(plan.diff(applied(self.records, changes)), [])
+
+    def test_batch_groups_rowids_by_principal(self):
+        plan = PermissionPlan([PlanRule("*.pdf", add_groups=["gruppo5"])], ENGINE)
+        batch = plan.build_batch(plan.diff(self.records))
+        self.assertEqual(len(batch), 3)
+        self.assertEqual(batch.rowids(), [1, 3, 4])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+"""RecordStore: ordine dei risultati e indice dei rowid per GID/UID."""
+import unittest
+
+from sslm.records import RecordStore, ShareRecord
+
+
+def record(rowid, gids=(), uids=()):
+    return ShareRecord(rowid, f"f{rowid}", f"/v/f{rowid}", gids, uids)
+
+
+class RecordStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = RecordStore([
+            record(1, [100], ["1000"]),
+            record(2, [100, 101], []),
+            record(3),
+            # Un rowid ripetuto non cambia l'ordine: vale l'ultima versione
+            record(1, [100, 102], ["1000"]),
+        ])
+
+    def test_order_and_index(self):
+        self.assertEqual(self.store.order, [1, 2, 3])
+        self.assertEqual(self.store.index_of, {1: 0, 2: 1, 3: 2})
+        self.assertEqual(list(self.store.at(0).gids), [100, 102])
+
+    def test_rowids_with_principal(self):
+        self.assertEqual(self.store.rowids_with("protect_gids", 100), {1, 2})
+        self.assertEqual(self.store.rowids_with("protect_gids", "102"), {1})
+        self.assertEqual(self.store.rowids_with("protect_uids", 1000), {1})
+        self.assertEqual(self.store.rowids_with("protect_gids", 999), set())
+
+    def test_update_moves_rowid_between_principals(self):
+        self.assertTrue(self.store.update(record(2, [101, 103], ["1001"])))
+        self.assertEqual(self.store.rowids_with("protect_gids", 100), {1})
+        self.assertEqual(self.store.rowids_with("protect_gids", 103), {2})
+        self.assertEqual(self.store.rowids_with("protect_uids", 1001), {2})
+        # Un rowid assente non viene aggiunto
+        self.assertFalse(self.store.update(record(9, [100])))
+        self.assertNotIn(9, self.store)
+        self.assertEqual(self.store.rowids_with("protect_gids", 100), {1})
+
+    def test_extend_appends_only_new_records(self):
+        self.store.extend([record(2, [999]), record(4, [101]), record(5)])
+        self.assertEqual(self.store.order, [1, 2, 3, 4, 5])
+        self.assertEqual(self.store.index_of[4], 3)
+        self.assertEqual(self.store.rowids_with("protect_gids", 101), {2, 4})
+        self.assertEqual(self.store.rowids_with("protect_gids", 999), set())
+
+    def test_sort_keeps_index_in_sync(self):
+        self.store.sort(lambda rec: len(rec.gids), reverse=True)
+        self.assertEqual(self.store.order, [1, 2, 3])
+        self.store.sort(lambda rec: rec.rowid, reverse=True)
+        self.assertEqual([rec.rowid for rec in self.store.slice(0, 3)], [3, 2, 1])
+        self.assertEqual(self.store.index_of, {3: 0, 2: 1, 1: 2})
+
+
+if __name__ == "__main__":
+    unittest.main()
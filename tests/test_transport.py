@@ -0,0 +1,37 @@
+"""iter_lines: righe ricomposte dai blocchi di stdout, anche compressi con gzip."""
+import gzip
+import unittest
+
+from sslm.transport import iter_lines
+
+
+def split(data, size):
+    """Blocchi di size byte, come arrivano dal canale SSH."""
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class IterLinesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.lines = [f"{rowid}|{rowid}:ABCDEF|{{\"path\": \"/volume1/à è/{rowid}\"}}" for rowid in range(1, 200)]
+        self.stdout = ("\n".join(self.lines) + "\n").encode("utf-8")
+
+    def test_plain_lines_across_chunks(self):
+        self.assertEqual(list(iter_lines(split(self.stdout, 7))), self.lines)
+
+    def test_gzip_stream_across_chunks(self):
+        compressed = gzip.compress(self.stdout, compresslevel=1)
+        # Blocchi piccoli: l'intestazione gzip e i caratteri UTF-8 vengono spezzati tra un blocco e l'altro
+        for size in (1, 5, 4096):
+            self.assertEqual(list(iter_lines(split(compressed, size), gzipped=True)), self.lines)
+
+    def test_gzip_last_line_without_newline(self):
+        compressed = gzip.compress(b"1|a|x\r\n2|b|y")
+        self.assertEqual(list(iter_lines(split(compressed, 3), gzipped=True)), ["1|a|x", "2|b|y"])
+
+    def test_empty_gzip_stream(self):
+        self.assertEqual(list(iter_lines([gzip.compress(b"")], gzipped=True)), [])
+
+
+if __name__ == "__main__":
+    unittest.main()